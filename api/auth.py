@@ -0,0 +1,268 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+import database
+import response_cache
+from broadcast import shared_backend_configured
+from models import User
+
+log = logging.getLogger(__name__)
+
+
+# Stateless access tokens (HS256 JWTs, signed with AUTH_SECRET_KEY) plus a
+# small TTL/LRU cache of principals, so an authenticated request normally
+# costs no database round trip. The cache is what makes approval changes and
+# deletions take effect: those routes invalidate the user's entry, on this
+# worker at once and on the others through the response cache's invalidation
+# channel. That channel only reaches other workers with
+# CHAT_BROADCAST_BACKEND=postgres; without it they notice within the
+# (then much shorter) PRINCIPAL_CACHE_TTL_SECONDS.
+#
+# Admin routes (require_admin) always need an admin token. Elsewhere,
+# AUTH_REQUIRED=1 rejects requests without a token. Until every client sends
+# one, tokens are verified when present and legacy requests still pass; a bad
+# token on such a request is a 401 marked with AUTH_OPTIONAL_HEADER, so the
+# client can drop the token instead of logging the user out.
+#
+# Every process must sign with the same AUTH_SECRET_KEY. Without one no tokens
+# are issued (and AUTH_REQUIRED=1 refuses to start), except for local dev with
+# AUTH_RANDOM_DEV_KEY=1 and a single process: never on Vercel or with
+# WEB_CONCURRENCY > 1, where each instance would reject the others' tokens.
+
+AUTH_TOKEN_TTL_SECONDS = int(os.getenv("AUTH_TOKEN_TTL_SECONDS", str(12 * 3600)))
+PRINCIPAL_CACHE_TTL_SECONDS = float(
+    os.getenv("PRINCIPAL_CACHE_TTL_SECONDS") or ("60" if shared_backend_configured() else "5")
+)
+PRINCIPAL_CACHE_SIZE = 10_000
+SUPERADMIN_ID = 0  # hardcoded login in router.login, no users row
+AUTH_OPTIONAL_HEADER = "X-Auth-Optional"
+
+
+def _auth_required() -> bool:
+    return os.getenv("AUTH_REQUIRED") == "1"
+
+
+_secret: Optional[bytes] = None
+
+
+def _random_key_allowed() -> bool:
+    if os.getenv("VERCEL") == "1" or int(os.getenv("WEB_CONCURRENCY") or "1") > 1:
+        return False
+    return os.getenv("AUTH_RANDOM_DEV_KEY") == "1"
+
+
+def tokens_enabled() -> bool:
+    return bool(os.getenv("AUTH_SECRET_KEY")) or _random_key_allowed()
+
+
+def check_configuration():
+    """Startup check: refuse to run AUTH_REQUIRED=1 without a shared key."""
+    if tokens_enabled():
+        return
+    if _auth_required():
+        raise RuntimeError("AUTH_REQUIRED=1 needs AUTH_SECRET_KEY")
+    log.error("AUTH_SECRET_KEY not set: no access tokens are issued")
+
+
+def _signing_key() -> bytes:
+    global _secret
+    if _secret is None:
+        configured = os.getenv("AUTH_SECRET_KEY")
+        if configured:
+            _secret = configured.encode()
+        elif _random_key_allowed():
+            log.warning("AUTH_SECRET_KEY not set, using a random per-process key (local dev only)")
+            _secret = secrets.token_bytes(32)
+        else:
+            raise RuntimeError("AUTH_SECRET_KEY is not set")
+    return _secret
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+_HEADER = _b64encode(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+
+
+def create_access_token(user_id: int, role: str) -> str:
+    now = int(time.time())
+    claims = {"sub": str(user_id), "role": role, "iat": now, "exp": now + AUTH_TOKEN_TTL_SECONDS}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    signing_input = f"{_HEADER}.{payload}".encode()
+    signature = hmac.new(_signing_key(), signing_input, hashlib.sha256).digest()
+    return f"{_HEADER}.{payload}.{_b64encode(signature)}"
+
+
+def decode_access_token(token: str) -> dict:
+    try:
+        header, payload, signature = token.split(".")
+        expected = hmac.new(_signing_key(), f"{header}.{payload}".encode(), hashlib.sha256).digest()
+        if header != _HEADER or not hmac.compare_digest(expected, _b64decode(signature)):
+            raise ValueError("bad signature")
+        claims = json.loads(_b64decode(payload))
+        int(claims["sub"])
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid token", headers={"WWW-Authenticate": "Bearer"})
+    if claims.get("exp", 0) < time.time():
+        raise HTTPException(status_code=401, detail="Token expired", headers={"WWW-Authenticate": "Bearer"})
+    return claims
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    role: str
+    is_approved: bool
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == "admin"
+
+
+class PrincipalCache:
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL_SECONDS, max_size: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def put(self, principal: Principal):
+        with self._lock:
+            self._entries[principal.id] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        """Drop the user's entry here and on every other worker."""
+        response_cache.invalidate(user_tag(user_id))
+
+    def _on_invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                if tag.startswith(USER_TAG_PREFIX):
+                    self._entries.pop(int(tag[len(USER_TAG_PREFIX):]), None)
+
+
+USER_TAG_PREFIX = "user:"
+
+
+def user_tag(user_id: int) -> str:
+    return f"{USER_TAG_PREFIX}{user_id}"
+
+
+principal_cache = PrincipalCache()
+response_cache.cache.on_invalidate(principal_cache._on_invalidate)
+
+
+def load_principal(user_id: int) -> Optional[Principal]:
+    if user_id == SUPERADMIN_ID:
+        return Principal(SUPERADMIN_ID, "admin", True)
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    db = database.SessionLocal()
+    try:
+        row = db.query(User.role, User.is_approved).filter(User.id == user_id).first()
+    finally:
+        db.close()
+    if row is None:
+        return None
+    principal = Principal(user_id, row.role, row.is_approved is not False)
+    principal_cache.put(principal)
+    return principal
+
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+def current_principal(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer),
+) -> Optional[Principal]:
+    """The caller, or None for a legacy request without a token (when allowed)."""
+    if credentials is None:
+        if _auth_required():
+            raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+        return None
+    try:
+        return principal_from_token(credentials.credentials)
+    except HTTPException as e:
+        if _auth_required():
+            raise
+        # this request would pass without the token; tell the client it may drop it
+        raise HTTPException(status_code=e.status_code, detail=e.detail,
+                            headers={**(e.headers or {}), AUTH_OPTIONAL_HEADER: "1"})
+
+
+def principal_from_token(token: str) -> Principal:
+    claims = decode_access_token(token)
+    principal = load_principal(int(claims["sub"]))
+    if principal is None:
+        raise HTTPException(status_code=401, detail="User no longer exists")
+    return principal
+
+
+def require_admin(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer),
+) -> Principal:
+    """Admin routes always need an admin token, AUTH_REQUIRED or not."""
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    principal = principal_from_token(credentials.credentials)
+    if not principal.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return principal
+
+
+def ensure_self(principal: Optional[Principal], user_id: Optional[int]):
+    """403 if a token is present and names someone else (admins may act for anyone)."""
+    if principal is None or user_id is None or principal.is_admin:
+        return
+    if principal.id != int(user_id):
+        raise HTTPException(status_code=403, detail="Token does not match the requested user")
+
+
+def ensure_approved_volunteer(principal: Optional[Principal]):
+    if principal is None or principal.is_admin:
+        return
+    if principal.role != "volunteer" or not principal.is_approved:
+        raise HTTPException(status_code=403, detail="Only approved volunteers can do this")
+
+
+def ensure_one_of(principal: Optional[Principal], user_ids, detail: str = "Not authorized for this incident"):
+    """403 if a token is present and names none of `user_ids` (admins pass)."""
+    if principal is None or principal.is_admin:
+        return
+    if principal.id not in {int(i) for i in user_ids if i is not None}:
+        raise HTTPException(status_code=403, detail=detail)
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+from typing import Awaitable, Callable, Optional
+
+log = logging.getLogger(__name__)
+
+
+# Pluggable fan-out for chat broadcasts.
+# ConnectionManager delivers to its own sockets first and then publishes to a
+# backend for everyone else. The in-process backend has no one else; with
+# Postgres LISTEN/NOTIFY every worker subscribed to the channel receives it,
+# so a message reaches all sockets of an incident regardless of which worker
+# holds them.
+
+Handler = Callable[[int, dict], Awaitable[None]]
+
+
+class BroadcastBackend:
+    async def start(self, handler: Handler):
+        raise NotImplementedError
+
+    async def publish(self, room: int, message: dict):
+        raise NotImplementedError
+
+    async def stop(self):
+        pass
+
+
+class InProcessBroadcast(BroadcastBackend):
+    """Single-worker backend: publish delivers straight to the local handler."""
+
+    def __init__(self):
+        self._handler: Optional[Handler] = None
+
+    async def start(self, handler: Handler):
+        self._handler = handler
+
+    async def publish(self, room: int, message: dict):
+        if self._handler is not None:
+            await self._handler(room, message)
+
+
+class PostgresBroadcast(BroadcastBackend):
+    """Cross-worker backend over PostgreSQL LISTEN/NOTIFY.
+
+    Needs a direct (session-mode) connection: PgBouncer in transaction mode,
+    e.g. the Supabase pooler on port 6543, does not support LISTEN. `connect`
+    can be swapped for a factory returning a fake psycopg2-style connection
+    (fileno/poll/notifies/cursor) in tests.
+    """
+
+    NOTIFY_PAYLOAD_LIMIT = 7999  # Postgres rejects payloads of 8000 bytes or more
+    RECONNECT_DELAY_SECONDS = 2.0
+
+    def __init__(self, dsn: Optional[str] = None, channel: str = "safetracker_chat",
+                 connect: Optional[Callable] = None):
+        self.dsn = dsn
+        self.channel = channel
+        self._connect = connect or self._psycopg2_connect
+        self._handler: Optional[Handler] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listen_conn = None
+        self._publish_conn = None
+        self._publish_lock = threading.Lock()
+
+    def _psycopg2_connect(self):
+        import psycopg2
+
+        # libpq doesn't know SQLAlchemy's "postgresql+psycopg2://" driver suffix
+        return psycopg2.connect(re.sub(r"^(postgres(?:ql)?)\+\w+://", r"\1://", self.dsn))
+
+    # --- subscribe side ---
+
+    async def start(self, handler: Handler):
+        self._handler = handler
+        self._loop = asyncio.get_running_loop()
+        await self._listen()
+
+    async def _listen(self):
+        self._listen_conn = await self._loop.run_in_executor(None, self._open_listener)
+        self._loop.add_reader(self._listen_conn.fileno(), self._on_readable)
+
+    def _open_listener(self):
+        conn = self._connect()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f'LISTEN "{self.channel}"')
+        return conn
+
+    def _on_readable(self):
+        try:
+            self._listen_conn.poll()
+        except Exception:
+            log.exception("broadcast listener lost connection")
+            self._loop.remove_reader(self._listen_conn.fileno())
+            self._loop.create_task(self._reconnect())
+            return
+
+        while self._listen_conn.notifies:
+            notify = self._listen_conn.notifies.pop(0)
+            try:
+                data = json.loads(notify.payload)
+            except ValueError:
+                continue
+            self._loop.create_task(self._handler(data["room"], data["message"]))
+
+    async def _reconnect(self):
+        self._close(self._listen_conn)
+        while True:
+            await asyncio.sleep(self.RECONNECT_DELAY_SECONDS)
+            try:
+                await self._listen()
+                return
+            except Exception:
+                log.exception("broadcast listener reconnect failed")
+
+    # --- publish side ---
+
+    async def publish(self, room: int, message: dict):
+        # raw UTF-8 rather than \u escapes: up to 3x smaller for non-Latin text
+        payload = json.dumps({"room": room, "message": message}, default=str, ensure_ascii=False)
+        if len(payload.encode()) > self.NOTIFY_PAYLOAD_LIMIT:
+            raise ValueError("Broadcast payload too large for NOTIFY")
+        await asyncio.get_running_loop().run_in_executor(None, self._notify, payload)
+
+    def _notify(self, payload: str):
+        # psycopg2 connections are not safe for concurrent use; serialize publishers
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publish_conn is None or self._publish_conn.closed:
+                        self._publish_conn = self._connect()
+                        self._publish_conn.autocommit = True
+                    with self._publish_conn.cursor() as cur:
+                        cur.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+                    return
+                except Exception:
+                    self._close(self._publish_conn)
+                    self._publish_conn = None
+                    if attempt:
+                        raise
+
+    async def stop(self):
+        if self._listen_conn is not None and self._loop is not None:
+            try:
+                self._loop.remove_reader(self._listen_conn.fileno())
+            except Exception:
+                pass
+        self._close(self._listen_conn)
+        self._close(self._publish_conn)
+        self._listen_conn = self._publish_conn = None
+
+    @staticmethod
+    def _close(conn):
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+def shared_backend_configured() -> bool:
+    """Whether backend_from_env reaches other workers (otherwise: this process only)."""
+    return os.getenv("CHAT_BROADCAST_BACKEND", "memory").lower() == "postgres"
+
+
+def backend_from_env(channel: str = "safetracker_chat") -> BroadcastBackend:
+    """CHAT_BROADCAST_BACKEND=postgres enables cross-worker fan-out.
+
+    BROADCAST_DATABASE_URL should point at a direct Postgres connection; it
+    falls back to DATABASE_URL.
+    """
+    if shared_backend_configured():
+        dsn = os.getenv("BROADCAST_DATABASE_URL") or os.getenv("DATABASE_URL")
+        return PostgresBroadcast(dsn, channel=channel)
+    return InProcessBroadcast()
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import deque
+from itertools import chain
+from typing import Deque, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import cast, event, func, select
+from sqlalchemy.dialects.postgresql import REGCLASS
+from sqlalchemy.orm import Session
+
+from models import (
+    ChangeVersion, ChatMessage, Incident, INCIDENT_STREAM, CHAT_STREAM, VERSION_SEQUENCES,
+)
+
+
+# Delta feed support for GET /users/incidents/changes.
+# A token is "<incident version>.<chat version>": the positions in both change
+# streams that the client has already seen.
+
+HEAD_TTL_SECONDS = 1.0
+MAX_UNSETTLED_HEADS = 32
+
+
+def encode_token(incident_version: int, chat_version: int) -> str:
+    return f"{incident_version}.{chat_version}"
+
+
+def decode_token(token: str) -> Tuple[int, int]:
+    try:
+        incident_version, chat_version = token.split(".")
+        return int(incident_version), int(chat_version)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid change token")
+
+
+class HeadCache:
+    """Process-local copy of the stream heads, refreshed at most every `ttl` seconds.
+
+    Lets an idle poll (token == current heads) answer without touching the
+    database. A token that is ahead of the cached heads forces a refresh, so
+    a client never gets a token older than one it already holds.
+    """
+
+    def __init__(self, ttl: float = HEAD_TTL_SECONDS):
+        self.ttl = ttl
+        self._heads: Optional[Tuple[int, int]] = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        # Postgres: (sequence heads, snapshot xmax) read but not yet settled
+        self._unsettled: Deque[Tuple[Tuple[int, int], int]] = deque()
+        self._settled: Tuple[int, int] = (0, 0)
+
+    def peek(self) -> Optional[Tuple[int, int]]:
+        if self._heads is not None and time.monotonic() - self._fetched_at < self.ttl:
+            return self._heads
+        return None
+
+    def refresh(self, db: Session) -> Tuple[int, int]:
+        if db.get_bind().dialect.name == "postgresql":
+            heads = self._settled_heads(db)
+        else:
+            rows: Dict[str, int] = dict(db.query(ChangeVersion.name, ChangeVersion.version).all())
+            heads = (rows.get(INCIDENT_STREAM, 0), rows.get(CHAT_STREAM, 0))
+        with self._lock:
+            self._heads = heads
+            self._fetched_at = time.monotonic()
+        return heads
+
+    def invalidate(self):
+        with self._lock:
+            self._heads = None
+
+    def _settled_heads(self, db: Session) -> Tuple[int, int]:
+        """The newest sequence heads no in-flight transaction can still commit under.
+
+        A writer takes its xid before its version (models.bump_version), so
+        every version <= the heads read here belongs to an xid below the xmax
+        of a snapshot taken afterwards. Once the oldest running xid (xmin)
+        passes that xmax, all of them have committed or rolled back. Usually
+        that is already true of the same snapshot; otherwise the heads settle
+        on a later refresh and the previous settled heads are served ((0, 0)
+        right after start-up, which only costs a client one full resync).
+        """
+        latest = tuple(db.execute(select(*(
+            func.coalesce(func.pg_sequence_last_value(cast(sequence.name, REGCLASS)), 0)
+            for sequence in (VERSION_SEQUENCES[INCIDENT_STREAM], VERSION_SEQUENCES[CHAT_STREAM])
+        ))).one())
+        # separate statement: its snapshot must be taken after the heads were read
+        snapshot = func.txid_current_snapshot()
+        xmin, xmax = db.execute(
+            select(func.txid_snapshot_xmin(snapshot), func.txid_snapshot_xmax(snapshot))
+        ).one()
+        with self._lock:
+            if len(self._unsettled) < MAX_UNSETTLED_HEADS:
+                self._unsettled.append((latest, xmax))
+            else:
+                # full: replace the newest candidate, never the oldest (the one
+                # closest to settling), or long-running writers keep every
+                # candidate from ever settling
+                self._unsettled[-1] = (latest, xmax)
+            while self._unsettled and self._unsettled[0][1] <= xmin:
+                heads = self._unsettled.popleft()[0]
+                # concurrent refreshes may append out of order; never move back
+                self._settled = (max(self._settled[0], heads[0]), max(self._settled[1], heads[1]))
+            return self._settled
+
+
+head_cache = HeadCache()
+
+
+# Writes made by this worker drop the cached heads as soon as they commit, so
+# a client never waits out the TTL to see its own changes. Other workers'
+# writes become visible within HEAD_TTL_SECONDS.
+
+def mark_heads_dirty(session: Session):
+    """For bulk UPDATE/DELETE statements, which bypass the flush hooks below."""
+    session.info["heads_dirty"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _note_versioned_writes(session, flush_context):
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, (Incident, ChatMessage)):
+            mark_heads_dirty(session)
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_heads(session):
+    if session.info.pop("heads_dirty", False):
+        head_cache.invalidate()
@@ -0,0 +1,428 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import changes
+import database
+from models import ChatMessage, ChatReadMark, Incident, User, CHAT_STREAM, bump_version
+from pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor
+
+log = logging.getLogger(__name__)
+
+
+# Blocking chat persistence used by the WebSocket handler.
+# These functions open their own short-lived session so they can run on a
+# worker thread (run_in_threadpool) without sharing a Session across threads.
+
+
+def load_username(user_id: int) -> str:
+    db = database.SessionLocal()
+    try:
+        username = db.query(User.username).filter(User.id == user_id).scalar()
+        return username or "Unknown"
+    finally:
+        db.close()
+
+
+def load_participants(incident_id: int) -> Optional[tuple]:
+    """(reporter_id, volunteer_id) of the incident, or None if it doesn't exist."""
+    db = database.SessionLocal()
+    try:
+        row = db.query(Incident.reporter_id, Incident.volunteer_id).filter(Incident.id == incident_id).first()
+        return tuple(row) if row else None
+    finally:
+        db.close()
+
+
+def message_payload(msg_id: int, incident_id: int, sender_id: int, sender_name: str,
+                    message: str, timestamp: datetime, is_read: Optional[bool]) -> dict:
+    # frontend ku send panna data
+    return {
+        "id": msg_id,
+        "incident_id": int(incident_id),
+        "sender_id": int(sender_id),
+        "sender_name": sender_name,
+        "message": message,
+        "timestamp": timestamp.isoformat(),
+        "is_read": bool(is_read),
+    }
+
+
+def save_message(incident_id: int, sender_id: int, message: str, sender_name: str) -> dict:
+    db = database.SessionLocal()
+    try:
+        db_msg = ChatMessage(incident_id=incident_id, sender_id=sender_id, message=message)
+        db.add(db_msg)
+        db.commit()
+        # load server defaults (id, timestamp) before the session closes
+        db.refresh(db_msg)
+        return message_payload(
+            db_msg.id, incident_id, sender_id, sender_name,
+            db_msg.message, db_msg.timestamp, db_msg.is_read,
+        )
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# --- History pages and read watermarks ---
+# Messages are ordered by (timestamp, id); cursors are the usual opaque
+# pagination cursors over that pair. Both the pages and the unread counts
+# are range scans on ix_chat_messages_incident_timestamp_id.
+#
+# Timestamps are stamped before commit, so a message can become visible
+# behind an (timestamp, id) cursor a poller already moved past. Polls
+# therefore follow the chat change stream instead: ?since= takes a position
+# in it (see encode_position) and only reads up to the settled chat head
+# (changes.HeadCache), below which no transaction can still commit.
+
+BEFORE_CURSOR_HEADER = "X-Before-Cursor"  # pass as ?before= for older messages
+AFTER_CURSOR_HEADER = "X-After-Cursor"  # newest message shown; the read watermark
+SINCE_HEADER = "X-Chat-Since"  # pass as ?since= to poll for newer ones
+
+
+def _order_key():
+    return tuple_(ChatMessage.timestamp, ChatMessage.id)
+
+
+def _message_query(db: Session, incident_id: int):
+    return (
+        db.query(
+            ChatMessage.id,
+            ChatMessage.incident_id,
+            ChatMessage.sender_id,
+            ChatMessage.message,
+            ChatMessage.timestamp,
+            ChatMessage.version,
+            User.username.label("sender_name"),
+        )
+        .outerjoin(User, ChatMessage.sender_id == User.id)
+        .filter(ChatMessage.incident_id == incident_id)
+    )
+
+
+def encode_position(version: int, msg_id: Optional[int] = None) -> str:
+    """"<version>" once every message up to that version was read, else "<version>.<id>"."""
+    return str(version) if msg_id is None else f"{version}.{msg_id}"
+
+
+def decode_position(position: str) -> Tuple[int, Optional[int]]:
+    try:
+        version, _, msg_id = position.partition(".")
+        return int(version), int(msg_id) if msg_id else None
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid chat position")
+
+
+def poll_page(db: Session, incident_id: int, since: str, head: int, limit: Optional[int] = None):
+    """Messages past the `since` position, up to the settled chat `head`.
+
+    Returns (rows ordered by (timestamp, id), next position). Rows are read in
+    (version, id) order, so a page cut short by `limit` resumes where it
+    stopped. A message that is rewritten gets a new version and comes back;
+    clients dedupe by id.
+    """
+    version, msg_id = decode_position(since)
+    if msg_id is None:
+        past = ChatMessage.version > version
+    else:
+        past = tuple_(ChatMessage.version, ChatMessage.id) > tuple_(version, msg_id)
+    query = (
+        _message_query(db, incident_id)
+        .filter(past, ChatMessage.version <= head)
+        .order_by(ChatMessage.version.asc(), ChatMessage.id.asc())
+    )
+    if limit:
+        limit = min(limit, MAX_PAGE_SIZE)
+        query = query.limit(limit + 1)
+
+    rows = query.all()
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        position = encode_position(rows[-1].version, rows[-1].id)
+    elif head >= version:
+        # read everything up to the head; nothing can still commit at or below it
+        position = encode_position(head)
+    else:
+        position = since  # another worker's head was further along
+    rows.sort(key=lambda row: (row.timestamp, row.id))
+    return rows, position
+
+
+def history_page(db: Session, incident_id: int, before: Optional[str] = None,
+                 after: Optional[str] = None, limit: Optional[int] = None):
+    """One page of message rows (columns plus sender_name), oldest first.
+
+    No cursor: the newest `limit` messages (everything without a limit).
+    `after`: the oldest `limit` messages after it. `before`: the newest
+    `limit` messages before it. Returns (rows, has_more), where has_more says
+    whether the window was cut short on its far side. Not for polling; see
+    poll_page.
+    """
+    query = _message_query(db, incident_id)
+    if after:
+        query = query.filter(_order_key() > tuple_(*decode_cursor(after)))
+    if before:
+        query = query.filter(_order_key() < tuple_(*decode_cursor(before)))
+
+    # read from the end the page grows towards, one extra row to see if there is more
+    newest_first = not after
+    order = (ChatMessage.timestamp.desc(), ChatMessage.id.desc()) if newest_first else (
+        ChatMessage.timestamp.asc(), ChatMessage.id.asc())
+    query = query.order_by(*order)
+    if limit:
+        limit = min(limit, MAX_PAGE_SIZE)
+        query = query.limit(limit + 1)
+
+    rows = query.all()
+    has_more = bool(limit) and len(rows) > limit
+    rows = rows[:limit] if limit else rows
+    if newest_first:
+        rows.reverse()
+    return rows, has_more
+
+
+def page_cursors(rows, has_more: bool, after: Optional[str] = None) -> dict:
+    """Response headers for a history page."""
+    headers = {}
+    if rows:
+        oldest, newest = rows[0], rows[-1]
+        headers[AFTER_CURSOR_HEADER] = encode_cursor(newest.timestamp, newest.id)
+        if has_more and not after:
+            # only when older messages exist past this page
+            headers[BEFORE_CURSOR_HEADER] = encode_cursor(oldest.timestamp, oldest.id)
+    elif after:
+        headers[AFTER_CURSOR_HEADER] = after  # nothing new: keep polling from here
+    return headers
+
+
+def read_marks(db: Session, incident_id: int) -> list:
+    return db.query(ChatReadMark.user_id, ChatReadMark.last_read_at, ChatReadMark.last_read_id).filter(
+        ChatReadMark.incident_id == incident_id
+    ).all()
+
+
+def read_by_others(marks, msg) -> bool:
+    """True once someone other than the sender has read up to this message."""
+    return any(
+        user_id != msg.sender_id and (last_at, last_id) >= (msg.timestamp, msg.id)
+        for user_id, last_at, last_id in marks
+    )
+
+
+def mark_read(db: Session, incident_id: int, user_id: int, up_to: Optional[str] = None) -> bool:
+    """Move the user's watermark forward (never back) with a single upsert.
+
+    up_to: cursor of the newest message the client has shown; defaults to
+    the newest message in the incident. Returns False if there is nothing
+    to mark.
+    """
+    if up_to:
+        last_at, last_id = decode_cursor(up_to)
+    else:
+        newest = (
+            db.query(ChatMessage.timestamp, ChatMessage.id)
+            .filter(ChatMessage.incident_id == incident_id)
+            .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+            .first()
+        )
+        if newest is None:
+            return False
+        last_at, last_id = newest
+
+    conn = db.connection()
+    table = ChatReadMark.__table__
+    values = dict(user_id=user_id, incident_id=incident_id, last_read_at=last_at,
+                  last_read_id=last_id, version=bump_version(conn, CHAT_STREAM))
+    upsert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(conn.dialect.name)
+    if upsert is not None:
+        stmt = upsert(table).values(**values)
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.incident_id],
+            set_={c: stmt.excluded[c] for c in ("last_read_at", "last_read_id", "version")},
+            where=tuple_(table.c.last_read_at, table.c.last_read_id)
+            < tuple_(stmt.excluded.last_read_at, stmt.excluded.last_read_id),
+        ))
+    else:
+        mark = (
+            db.query(ChatReadMark)
+            .filter(ChatReadMark.user_id == user_id, ChatReadMark.incident_id == incident_id)
+            .with_for_update()
+            .first()
+        )
+        if mark is None:
+            db.add(ChatReadMark(**values))
+        elif (mark.last_read_at, mark.last_read_id) < (last_at, last_id):
+            mark.last_read_at, mark.last_read_id, mark.version = last_at, last_id, values["version"]
+    return True
+
+
+def unread_count_column(user_id: int, incident_id_col, mark):
+    """Correlated count of the user's unread messages for a listing row.
+
+    `mark` is a ChatReadMark alias outer-joined on (incident, user). Each
+    listed incident costs one index range scan past the watermark.
+    """
+    return (
+        select(func.count(ChatMessage.id))
+        .where(
+            ChatMessage.incident_id == incident_id_col,
+            ChatMessage.sender_id != user_id,
+            (mark.last_read_id.is_(None))
+            | (_order_key() > tuple_(mark.last_read_at, mark.last_read_id)),
+        )
+        .scalar_subquery()
+    )
+
+
+# --- Group-commit writer ---
+
+CHAT_BATCH_MAX_MESSAGES = 100
+CHAT_BATCH_WINDOW_SECONDS = 0.005
+CHAT_BATCH_MAX_PENDING = 1000
+
+
+@dataclass
+class PendingMessage:
+    incident_id: int
+    sender_id: int
+    message: str
+    sender_name: str
+
+
+def insert_messages(items: List[PendingMessage]) -> List[dict]:
+    """Insert a batch in one transaction with a single multi-row INSERT ... RETURNING."""
+    now = datetime.utcnow()
+    table = ChatMessage.__table__
+    with database.engine.begin() as conn:
+        # one chat-stream version for the whole batch (Core insert skips the mapper hook)
+        version = bump_version(conn, CHAT_STREAM)
+        rows = conn.execute(
+            insert(table).returning(
+                table.c.id, table.c.timestamp, table.c.is_read, sort_by_parameter_order=True
+            ),
+            [
+                {
+                    "incident_id": item.incident_id,
+                    "sender_id": item.sender_id,
+                    "message": item.message,
+                    "timestamp": now,
+                    "updated_at": now,
+                    "is_read": False,
+                    "version": version,
+                }
+                for item in items
+            ],
+        ).all()
+    changes.head_cache.invalidate()
+
+    return [
+        message_payload(
+            row.id, item.incident_id, item.sender_id, item.sender_name,
+            item.message, row.timestamp, row.is_read,
+        )
+        for item, row in zip(items, rows)
+    ]
+
+
+class ChatBatchWriter:
+    """Write-behind chat writer that group-commits concurrent messages.
+
+    Messages are collected for up to `window` seconds or `max_messages`,
+    whichever comes first, and flushed in one transaction on a worker thread.
+
+    Durability: `submit` resolves only after the transaction holding the
+    message has committed, so a message is never acknowledged (or
+    broadcast) before it is durable. If a batch fails, its messages are
+    retried one transaction each, so only a message that fails on its own
+    (e.g. for a deleted incident) gets the exception. Messages still queued
+    when the process dies were never acknowledged.
+
+    The queue is bounded by `max_pending`; when full, `submit` waits, which
+    pushes back on the senders instead of growing memory without limit.
+    """
+
+    def __init__(self, max_messages: int = CHAT_BATCH_MAX_MESSAGES,
+                 window: float = CHAT_BATCH_WINDOW_SECONDS,
+                 max_pending: int = CHAT_BATCH_MAX_PENDING):
+        self.max_messages = max_messages
+        self.window = window
+        self.max_pending = max_pending
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Own flush thread: HTTP senders block request threads while waiting
+        # for their ack, so flushing must not compete for the shared threadpool.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-flush")
+
+    def _ensure_running(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, incident_id: int, sender_id: int, message: str, sender_name: str) -> dict:
+        self._ensure_running()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((PendingMessage(incident_id, sender_id, message, sender_name), future))
+        return await future
+
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_messages:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            await self._write(await self._collect())
+
+    async def _write(self, batch: list):
+        try:
+            payloads = await asyncio.get_running_loop().run_in_executor(
+                self._executor, insert_messages, [item for item, _ in batch]
+            )
+        except Exception as e:
+            if len(batch) > 1:
+                # one bad row aborts the whole transaction; isolate it
+                log.warning("chat batch flush failed, retrying one by one",
+                            exc_info=True, extra={"messages": len(batch)})
+                for entry in batch:
+                    await self._write([entry])
+                return
+            item, future = batch[0]
+            log.exception("chat message insert failed", extra={"incident_id": item.incident_id})
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        for (_, future), payload in zip(batch, payloads):
+            if not future.done():
+                future.set_result(payload)
+
+
+# Opt-in: CHAT_BATCH_WRITER=1 routes chat writes through the group-commit writer
+batch_writer: Optional[ChatBatchWriter] = (
+    ChatBatchWriter() if os.getenv("CHAT_BATCH_WRITER") == "1" else None
+)
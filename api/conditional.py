@@ -0,0 +1,43 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+# Conditional GET support for the polled endpoints.
+# ETags are derived from cheap version data (stream heads, max id + count)
+# plus the query string, never from the serialized body, so a matching
+# If-None-Match lets us skip both the row query and serialization.
+
+
+def make_etag(request: Request, *version_parts) -> str:
+    raw = "|".join(str(part) for part in (request.url.path, request.url.query, *version_parts))
+    return 'W/"' + hashlib.sha1(raw.encode()).hexdigest()[:20] + '"'
+
+
+def _matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison: ignore W/ prefixes on either side
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def check_etag(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Return a 304 response if the client already holds `etag`.
+
+    Otherwise stamp the outgoing response with the tag and return None so the
+    endpoint carries on building the body.
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
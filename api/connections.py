@@ -0,0 +1,138 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import Dict, List, Optional
+
+from fastapi import WebSocket
+
+from broadcast import BroadcastBackend, InProcessBroadcast
+
+log = logging.getLogger(__name__)
+
+
+# Per-socket outbound queue size. A subscriber that falls this many
+# messages behind is treated as dead and evicted instead of slowing the room.
+OUTBOX_SIZE = 64
+SEND_TIMEOUT_SECONDS = 5.0
+# 1013 "Try Again Later": the client may reconnect and reload history
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class Subscriber:
+    """One socket plus its bounded outbox and writer task.
+
+    Broadcasts only enqueue pre-serialized text; the writer task does the
+    actual send with a timeout, so one slow client never delays the others.
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: Optional[int], room, manager):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.room = room
+        # anything with evict(subscriber): ConnectionManager, IncidentEventHub
+        self._manager = manager
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=OUTBOX_SIZE)
+        self._writer = asyncio.create_task(self._drain())
+
+    def offer(self, text: str) -> bool:
+        try:
+            self._queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _drain(self):
+        try:
+            while True:
+                text = await self._queue.get()
+                await asyncio.wait_for(self.websocket.send_text(text), SEND_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # send failed or timed out: drop this socket, nobody else is affected
+            self._manager.evict(self)
+
+    async def close(self, code: int = SLOW_CONSUMER_CLOSE_CODE):
+        self._writer.cancel()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+
+# WebSocket connection manager (chat users manage panna)
+class ConnectionManager:
+
+    def __init__(self, backend: Optional[BroadcastBackend] = None):
+        # incident_id based ah subscribers store pannum
+        self.active_connections: Dict[int, List[Subscriber]] = {}
+        # messages also go out through the backend so other workers see them
+        self.backend = backend or InProcessBroadcast()
+        self._origin = uuid.uuid4().hex  # skip our own messages coming back
+        self._started = False
+        self._start_lock = asyncio.Lock()
+
+    async def _ensure_started(self):
+        if self._started:
+            return
+        async with self._start_lock:
+            if not self._started:
+                await self.backend.start(self._on_remote)
+                self._started = True
+
+    async def connect(self, websocket: WebSocket, incident_id: int, user_id: int) -> Subscriber:
+        await self._ensure_started()
+
+        # user connect aana websocket accept pannum
+        await websocket.accept()
+
+        subscriber = Subscriber(websocket, user_id, incident_id, self)
+        self.active_connections.setdefault(incident_id, []).append(subscriber)
+        return subscriber
+
+    def _remove(self, incident_id: int, websocket: WebSocket) -> List[Subscriber]:
+        room = self.active_connections.get(incident_id)
+        if not room:
+            return []
+        removed = [sub for sub in room if sub.websocket is websocket]
+        room[:] = [sub for sub in room if sub.websocket is not websocket]
+        if not room:
+            del self.active_connections[incident_id]
+        return removed
+
+    def disconnect(self, websocket: WebSocket, incident_id: int):
+        # disconnected user remove pannum
+        for subscriber in self._remove(incident_id, websocket):
+            subscriber._writer.cancel()
+
+    def evict(self, subscriber: Subscriber):
+        if self._remove(subscriber.room, subscriber.websocket):
+            asyncio.get_running_loop().create_task(subscriber.close())
+
+    async def broadcast(self, message: dict, incident_id: int):
+        await self._ensure_started()
+        # this worker's sockets never wait on (or depend on) the backend
+        await self.deliver_local(int(incident_id), message)
+        if isinstance(self.backend, InProcessBroadcast):
+            return
+        try:
+            await self.backend.publish(int(incident_id), {"origin": self._origin, "message": message})
+        except Exception:
+            # the message is already stored; a fan-out failure must not drop the sender
+            log.exception("broadcast publish failed", extra={"incident_id": incident_id})
+
+    async def _on_remote(self, incident_id: int, envelope: dict):
+        if envelope.get("origin") != self._origin:
+            await self.deliver_local(incident_id, envelope["message"])
+
+    async def deliver_local(self, incident_id: int, message: dict):
+        room = self.active_connections.get(incident_id)
+        if not room:
+            return
+
+        # serialize once, enqueue everywhere; never awaits a client
+        text = json.dumps(message, default=str)
+        for subscriber in list(room):
+            if not subscriber.offer(text):
+                self.evict(subscriber)
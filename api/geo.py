@@ -0,0 +1,176 @@
+import bisect
+import math
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+# Geohash-based spatial helpers.
+# Incidents store a geohash of their position; a "nearby" search covers the
+# query point's cell plus its 8 neighbours with prefix lookups, then ranks the
+# (small) candidate set by exact haversine distance.
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+
+GEOHASH_PRECISION = 9  # ~5m cells, plenty for storage
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+
+def encode_geohash(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True  # geohash interleaves starting with longitude
+
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
+
+
+def decode_bbox(geohash: str) -> Tuple[float, float, float, float]:
+    """Return (min_lat, min_lng, max_lat, max_lng) of a geohash cell."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for c in geohash:
+        cd = _DECODE[c]
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (cd >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def geohash_for(lat: Optional[float], lng: Optional[float]) -> Optional[str]:
+    if lat is None or lng is None:
+        return None
+    return encode_geohash(lat, lng)
+
+
+def cell_size_km(precision: int, lat: float) -> Tuple[float, float]:
+    """Approximate (height, width) in km of a geohash cell at `lat`."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    height = 180.0 / (2 ** lat_bits) * KM_PER_DEGREE
+    width = 360.0 / (2 ** lng_bits) * KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01)
+    return height, width
+
+
+def precision_for_radius(lat: float, radius_km: float) -> int:
+    """Finest precision whose cells are still at least `radius_km` wide,
+    so the 3x3 block around the query point covers the whole circle."""
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size_km(precision, lat)
+        if height >= radius_km and width >= radius_km:
+            return precision
+    return 1
+
+
+def covering_cells(lat: float, lng: float, radius_km: float) -> Set[str]:
+    precision = precision_for_radius(lat, radius_km)
+    center = encode_geohash(lat, lng, precision)
+    min_lat, min_lng, max_lat, max_lng = decode_bbox(center)
+    d_lat = max_lat - min_lat
+    d_lng = max_lng - min_lng
+    mid_lat = (min_lat + max_lat) / 2
+    mid_lng = (min_lng + max_lng) / 2
+
+    cells = set()
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            n_lat = min(max(mid_lat + dy * d_lat, -89.999999), 89.999999)
+            n_lng = (mid_lng + dx * d_lng + 180.0) % 360.0 - 180.0
+            cells.add(encode_geohash(n_lat, n_lng, precision))
+    return cells
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    d_lat = math.radians(lat2 - lat1)
+    d_lng = math.radians(lng2 - lng1)
+    a = (
+        math.sin(d_lat / 2) ** 2
+        + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(d_lng / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def rank_by_distance(candidates: Iterable, lat: float, lng: float, radius_km: float,
+                     limit: int, position=lambda c: (c.latitude, c.longitude)) -> List[Tuple[object, float]]:
+    """Exact-distance filter + sort of a candidate set, nearest first."""
+    ranked = []
+    for candidate in candidates:
+        c_lat, c_lng = position(candidate)
+        if c_lat is None or c_lng is None:
+            continue
+        distance = haversine_km(lat, lng, c_lat, c_lng)
+        if distance <= radius_km:
+            ranked.append((candidate, distance))
+    ranked.sort(key=lambda pair: pair[1])
+    return ranked[:limit]
+
+
+class InMemoryGeoIndex:
+    """Pure-Python grid index with the same cell scheme as the database column.
+
+    Used where no database is available (tests, scripts); keeps points in
+    per-cell buckets at storage precision and answers the same covering-cell
+    prefix lookups that the SQL path issues.
+    """
+
+    def __init__(self):
+        self._cells: Dict[str, Dict[int, Tuple[float, float]]] = {}
+        self._sorted_cells: List[str] = []  # for prefix range scans
+        self._where: Dict[int, str] = {}
+
+    def upsert(self, key: int, lat: float, lng: float):
+        self.remove(key)
+        cell = encode_geohash(lat, lng)
+        if cell not in self._cells:
+            self._cells[cell] = {}
+            bisect.insort(self._sorted_cells, cell)
+        self._cells[cell][key] = (lat, lng)
+        self._where[key] = cell
+
+    def remove(self, key: int):
+        cell = self._where.pop(key, None)
+        if cell is not None:
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self._cells[cell]
+                    self._sorted_cells.pop(bisect.bisect_left(self._sorted_cells, cell))
+
+    def __len__(self):
+        return len(self._where)
+
+    def nearby(self, lat: float, lng: float, radius_km: float, limit: int) -> List[Tuple[int, float]]:
+        candidates = []
+        for prefix in covering_cells(lat, lng, radius_km):
+            i = bisect.bisect_left(self._sorted_cells, prefix)
+            while i < len(self._sorted_cells) and self._sorted_cells[i].startswith(prefix):
+                candidates.extend(self._cells[self._sorted_cells[i]].items())
+                i += 1
+        ranked = rank_by_distance(candidates, lat, lng, radius_km, limit, position=lambda c: c[1])
+        return [(key, distance) for (key, _), distance in ranked]
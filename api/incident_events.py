@@ -0,0 +1,143 @@
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from fastapi import WebSocket
+
+from broadcast import BroadcastBackend, InProcessBroadcast, backend_from_env
+from connections import Subscriber
+
+log = logging.getLogger(__name__)
+
+
+# Server push for incident status changes (/ws/incidents).
+# Mutating routes emit a compact event after commit; every worker delivers it
+# to its own sockets whose subscription matches. Dashboards refetch (or apply
+# the delta feed) only when something relevant actually changed.
+# emit() only schedules the publish on the app's event loop: the route never
+# waits for the NOTIFY, and a failed publish can't fail a committed write.
+
+EVENT_ROOM = 0  # single logical room; filtering happens per subscriber
+
+
+def event_for(incident, action: str, previous_volunteer_id: Optional[int] = None) -> dict:
+    event = {
+        "type": "incident",
+        "action": action,
+        "id": incident.id,
+        "status": incident.status,
+        "reporter_id": incident.reporter_id,
+        "volunteer_id": incident.volunteer_id,
+        "geohash": incident.geohash,
+    }
+    if previous_volunteer_id is not None:
+        # unassigned volunteers still need to drop it from their list
+        event["previous_volunteer_id"] = previous_volunteer_id
+    return event
+
+
+@dataclass
+class IncidentSubscription:
+    """What one socket wants to hear about.
+
+    admin: everything. user: incidents they reported. volunteer: incidents
+    assigned to them plus activity in `cells` (all cells if none given).
+    `reporter_id` and `cells` narrow any role further.
+    """
+
+    role: str
+    user_id: Optional[int] = None
+    reporter_id: Optional[int] = None
+    cells: Tuple[str, ...] = field(default_factory=tuple)
+
+    def _in_cells(self, event: dict) -> bool:
+        if not self.cells:
+            return True
+        geohash = event.get("geohash") or ""
+        return any(geohash.startswith(cell) for cell in self.cells)
+
+    def matches(self, event: dict) -> bool:
+        if self.reporter_id is not None and event["reporter_id"] != self.reporter_id:
+            return False
+
+        if self.role == "admin":
+            return self._in_cells(event)
+        if self.role == "volunteer":
+            if self.user_id is not None and self.user_id in (
+                event["volunteer_id"], event.get("previous_volunteer_id")
+            ):
+                return True
+            return self._in_cells(event)
+        # reporters only follow their own incidents
+        return self.user_id is not None and event["reporter_id"] == self.user_id
+
+
+class IncidentEventHub:
+    def __init__(self, backend: Optional[BroadcastBackend] = None):
+        self.subscribers: Dict[WebSocket, Tuple[Subscriber, IncidentSubscription]] = {}
+        self.backend = backend or InProcessBroadcast()
+        self._started = False
+        self._start_lock = asyncio.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def _ensure_started(self):
+        if self._started:
+            return
+        async with self._start_lock:
+            if not self._started:
+                await self.backend.start(self.deliver_local)
+                self._started = True
+
+    async def start(self):
+        """Take the app's event loop for emit() and subscribe (app lifespan)."""
+        self._loop = asyncio.get_running_loop()
+        await self._ensure_started()
+
+    async def connect(self, websocket: WebSocket, subscription: IncidentSubscription) -> Subscriber:
+        await self._ensure_started()
+        await websocket.accept()
+        subscriber = Subscriber(websocket, subscription.user_id, EVENT_ROOM, self)
+        self.subscribers[websocket] = (subscriber, subscription)
+        return subscriber
+
+    def disconnect(self, websocket: WebSocket):
+        entry = self.subscribers.pop(websocket, None)
+        if entry:
+            entry[0]._writer.cancel()
+
+    def evict(self, subscriber: Subscriber):
+        if self.subscribers.pop(subscriber.websocket, None):
+            asyncio.get_running_loop().create_task(subscriber.close())
+
+    async def publish(self, event: dict):
+        try:
+            await self._ensure_started()
+            await self.backend.publish(EVENT_ROOM, event)
+        except Exception:
+            # the change is committed; clients still catch up via the delta feed
+            log.exception("incident event publish failed")
+
+    async def deliver_local(self, room: int, event: dict):
+        text = None
+        for subscriber, subscription in list(self.subscribers.values()):
+            if not subscription.matches(event):
+                continue
+            if text is None:
+                text = json.dumps(event, default=str)
+            if not subscriber.offer(text):
+                self.evict(subscriber)
+
+
+# separate NOTIFY channel so chat and incident events never share a handler
+hub = IncidentEventHub(backend_from_env(channel="safetracker_incidents"))
+
+
+def emit(event: dict):
+    """Publish from a sync route (runs in the threadpool) without waiting for it."""
+    loop = hub._loop
+    if loop is None or loop.is_closed():
+        return  # app not running (scripts, tests): nobody to notify
+    # fire and forget; clients that miss it catch up via the delta feed
+    asyncio.run_coroutine_threadsafe(hub.publish(event), loop)
@@ -1,16 +1,18 @@
 import os
 import sys
 import json
-import traceback
+import logging
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List
 from sqlalchemy import text
 from sqlalchemy.orm import Session
+from typing import Optional
 from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 
 # Project root path setup
 is_vercel = os.environ.get("VERCEL") == "1"
@@ -19,95 +21,65 @@ root_path = Path(__file__).resolve().parent
 if str(root_path) not in sys.path:
     sys.path.append(str(root_path))
 
+# Structured logging first, so import-time messages go through it too
+import logs
+logs.configure()
+log = logging.getLogger("index")
+
 # Import project modules using absolute paths for Vercel reliability
 try:
     import models
     import database
     import router
-    print("DEBUG: Project modules imported successfully")
-except ImportError as e:
-    print(f"CRITICAL ERROR: Failed to import project modules: {e}")
-    print(f"PYTHONPATH: {sys.path}")
+    import schemas
+    import geo
+    import broadcast
+    import chat
+    import incident_events
+    import migrate
+    import auth
+    import storage
+    import response_cache
+    import profiling
+    from connections import ConnectionManager
+    log.debug("project modules imported")
+except ImportError:
+    log.critical("failed to import project modules", exc_info=True, extra={"pythonpath": sys.path})
     raise
 
-# Database tables create
-# Run this ONLY if configured, to avoid blocking startup if DB is down
-try:
-    if os.environ.get("DATABASE_URL"):
-        print("DEBUG: Attempting database migration/init...")
-        models.Base.metadata.create_all(bind=database.engine)
-
-        # Manual database migration (new columns add panna)
-        with database.engine.connect() as conn:
-
-            # users table la is_approved column iruka nu check
-            res = conn.execute(text(
-                "SELECT column_name FROM information_schema.columns WHERE table_name='users' AND column_name='is_approved'"
-            ))
-            if not res.fetchone():
-                conn.execute(text(
-                    "ALTER TABLE users ADD COLUMN is_approved BOOLEAN DEFAULT TRUE"
-                ))
-                conn.commit()
-
-            # chat_messages table la is_read column check
-            res3 = conn.execute(text(
-                "SELECT column_name FROM information_schema.columns WHERE table_name='chat_messages' AND column_name='is_read'"
-            ))
-            if not res3.fetchone():
-                conn.execute(text(
-                    "ALTER TABLE chat_messages ADD COLUMN is_read BOOLEAN DEFAULT FALSE"
-                ))
-                conn.commit()
-        print("DEBUG: Database migration/init completed")
-    else:
-        print("DEBUG: Skipping DB init - DATABASE_URL not set")
-
-except Exception as e:
-    print(f"Database creation/migration skipped or failed: {e}")
-    # Don't raise here, allow the app to start so we can see errors in /api/health
-
-
-# WebSocket connection manager (chat users manage panna)
-class ConnectionManager:
-
-    def __init__(self):
-        # incident_id based ah users store pannum
-        self.active_connections: Dict[int, List[tuple]] = {}
-
-    async def connect(self, websocket: WebSocket, incident_id: int, user_id: int):
-        # user connect aana websocket accept pannum
-        await websocket.accept()
-
-        if incident_id not in self.active_connections:
-            self.active_connections[incident_id] = []
-
-        # user connection store pannum
-        self.active_connections[incident_id].append((user_id, websocket))
-
-    def disconnect(self, websocket: WebSocket, incident_id: int):
-
-        if incident_id in self.active_connections:
-            # disconnected user remove pannum
-            self.active_connections[incident_id] = [
-                conn for conn in self.active_connections[incident_id]
-                if conn[1] != websocket
-            ]
-
-    async def broadcast(self, message: dict, incident_id: int):
-
-        if incident_id in self.active_connections:
-
-            # incident chat la iruka ellarukum message send pannum
-            for _, websocket in self.active_connections[incident_id]:
-                await websocket.send_json(message)
+# Manager object create
+manager = ConnectionManager(broadcast.backend_from_env())
 
+# Startup: one cheap schema version check instead of running migrations.
+# MIGRATE_ON_STARTUP=1 applies pending migrations (single-instance deploys).
+@asynccontextmanager
+async def lifespan(app):
+    auth.check_configuration()
+    if os.environ.get("DATABASE_URL"):
+        try:
+            if os.environ.get("MIGRATE_ON_STARTUP") == "1":
+                await run_in_threadpool(migrate.upgrade)
+            status = await run_in_threadpool(migrate.schema_status)
+            if not status["up_to_date"]:
+                log.warning("schema at version %s, code expects %s; run `python api/migrate.py`",
+                            status["current"], status["latest"])
+        except Exception:
+            log.exception("schema version check failed")
+    try:
+        await response_cache.cache.start()
+    except Exception:
+        # workers still invalidate their own caches; others fall back to the TTL
+        log.exception("response cache invalidation listener failed")
+    try:
+        await incident_events.hub.start()
+    except Exception:
+        # emit() still schedules publishes; each one retries the subscription
+        log.exception("incident event listener failed")
+    yield
 
-# Manager object create
-manager = ConnectionManager()
 
 # FastAPI app create
-app = FastAPI(title="SafeTracker API")
+app = FastAPI(title="SafeTracker API", lifespan=lifespan)
 
 
 # Health check API (server working ah nu check panna)
@@ -141,35 +113,86 @@ async def health_check(db: Session = Depends(database.get_db)):
         "status": "online",
         "database": db_status,
         "database_url_info": db_info,
+        "pool": database.pool_status(),
+        "response_cache": response_cache.cache.stats(),
         "is_vercel": os.environ.get("VERCEL") == "1",
         "timestamp": datetime.now().isoformat()
     }
 
 
+# Prometheus scrape endpoint (per worker process)
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def metrics():
+    cache = response_cache.cache.stats()
+    pool = database.pool_status()
+    samples = {
+        "safetracker_response_cache_hits_total": ("counter", cache["hits"]),
+        "safetracker_response_cache_misses_total": ("counter", cache["misses"]),
+        "safetracker_response_cache_evictions_total": ("counter", cache["evictions"]),
+        "safetracker_response_cache_invalidations_total": ("counter", cache["invalidations"]),
+        "safetracker_response_cache_entries": ("gauge", cache["entries"]),
+        "safetracker_response_cache_bytes": ("gauge", cache["bytes"]),
+        "safetracker_log_records_dropped_total": ("counter", logs.dropped_records()),
+    }
+    for key in ("checked_out", "idle", "overflow"):
+        if key in pool:
+            samples[f"safetracker_db_pool_{key}"] = ("gauge", pool[key])
+    return PlainTextResponse(
+        profiling.metrics.render() + profiling.render_samples(samples),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
 # Global error handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-
-    error_details = traceback.format_exc()
-
-    print(f"GLOBAL ERROR: {error_details}")
-
+    # the traceback stays in the server log; the client gets the id to quote
+    request_id = request.scope.get("request_id")
+    log.error(
+        "unhandled error on %s %s", request.method, request.url.path,
+        exc_info=(type(exc), exc, exc.__traceback__), extra={"request_id": request_id},
+    )
     return JSONResponse(
         status_code=500,
-        content={
-            "detail": f"Internal Server Error: {str(exc)}",
-            "traceback": error_details,
-        },
+        content={"detail": "Internal Server Error", "request_id": request_id},
     )
 
 
 # WebSocket chat API
-@app.websocket("/ws/chat/{incident_id}/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, incident_id: int, user_id: int):
+MESSAGE_TOO_BIG_CLOSE_CODE = 1009
 
-    db = database.SessionLocal()
 
+async def socket_principal(token: Optional[str]):
+    """The token's principal, or None (no token, or a bad one)."""
+    if not token:
+        return None
     try:
+        return await run_in_threadpool(auth.principal_from_token, token)
+    except Exception:
+        # same as a bad token on an HTTP route: anonymous unless AUTH_REQUIRED=1
+        return None
+
+
+# /ws/chat/{incident_id}/{user_id}?token=... : with a token the sender is the
+# token's user, and only the incident's reporter, volunteer or an admin may join
+@app.websocket("/ws/chat/{incident_id}/{user_id}")
+async def websocket_endpoint(websocket: WebSocket, incident_id: int, user_id: int, token: Optional[str] = None):
+
+    principal = await socket_principal(token)
+    if principal:
+        participants = await run_in_threadpool(chat.load_participants, int(incident_id))
+        if participants is None or not (principal.is_admin or principal.id in participants):
+            await websocket.close(code=1008)
+            return
+        user_id = principal.id
+    elif os.environ.get("AUTH_REQUIRED") == "1":
+        await websocket.close(code=1008)
+        return
+
+    try:
+        # sender name: looked up once per connection, not per message
+        sender_name = await run_in_threadpool(chat.load_username, int(user_id))
+
         # user connect
         await manager.connect(websocket, int(incident_id), int(user_id))
 
@@ -179,31 +202,20 @@ async def websocket_endpoint(websocket: WebSocket, incident_id: int, user_id: in
             data = await websocket.receive_text()
 
             message_data = json.loads(data)
-
-            # database la message save pannum
-            db_msg = models.ChatMessage(
-                incident_id=incident_id,
-                sender_id=user_id,
-                message=message_data["message"],
-            )
-
-            db.add(db_msg)
-            db.commit()
-            db.refresh(db_msg)
-
-            # sender name
-            sender_name = db_msg.sender.username if db_msg.sender else "Unknown"
-
-            # frontend ku send panna data
-            broadcast_data = {
-                "id": db_msg.id,
-                "incident_id": int(incident_id),
-                "sender_id": int(user_id),
-                "sender_name": sender_name,
-                "message": db_msg.message,
-                "timestamp": db_msg.timestamp.isoformat(),
-                "is_read": db_msg.is_read,
-            }
+            if len(message_data["message"]) > schemas.MAX_CHAT_MESSAGE_LENGTH:
+                manager.disconnect(websocket, incident_id)
+                await websocket.close(code=MESSAGE_TOO_BIG_CLOSE_CODE)
+                return
+
+            # database la message save pannum (worker thread, keeps the event loop free)
+            if chat.batch_writer:
+                broadcast_data = await chat.batch_writer.submit(
+                    int(incident_id), int(user_id), message_data["message"], sender_name
+                )
+            else:
+                broadcast_data = await run_in_threadpool(
+                    chat.save_message, int(incident_id), int(user_id), message_data["message"], sender_name
+                )
 
             # chat users ellarukum broadcast pannum
             await manager.broadcast(broadcast_data, incident_id)
@@ -211,12 +223,53 @@ async def websocket_endpoint(websocket: WebSocket, incident_id: int, user_id: in
     except WebSocketDisconnect:
         manager.disconnect(websocket, incident_id)
 
-    except Exception as e:
-        print(f"WS Error: {traceback.format_exc()}")
+    except Exception:
+        log.exception("chat websocket error", extra={"incident_id": incident_id})
         manager.disconnect(websocket, incident_id)
 
-    finally:
-        db.close()
+
+# WebSocket incident status push (dashboards listen here instead of polling)
+# e.g. /ws/incidents?token=...&lat=13.08&lng=80.27&radius_km=50
+# (browsers can't set headers on a websocket, so the token rides in the query)
+@app.websocket("/ws/incidents")
+async def incident_events_endpoint(
+    websocket: WebSocket,
+    role: str = "user",
+    user_id: Optional[int] = None,
+    reporter_id: Optional[int] = None,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    radius_km: float = 50.0,
+    token: Optional[str] = None,
+):
+    principal = await socket_principal(token)
+    if principal:
+        # the token decides who this is, not the query string
+        role, user_id = principal.role, principal.id
+    elif role == "admin" or os.environ.get("AUTH_REQUIRED") == "1":
+        # the admin feed (every incident) is never open to legacy sockets
+        await websocket.close(code=1008)
+        return
+
+    cells = ()
+    if lat is not None and lng is not None:
+        cells = tuple(sorted(geo.covering_cells(lat, lng, min(max(radius_km, 0.1), 500.0))))
+    subscription = incident_events.IncidentSubscription(
+        role=role, user_id=user_id, reporter_id=reporter_id, cells=cells
+    )
+
+    try:
+        await incident_events.hub.connect(websocket, subscription)
+        while True:
+            # nothing expected from the client; this just notices the disconnect
+            await websocket.receive_text()
+
+    except WebSocketDisconnect:
+        incident_events.hub.disconnect(websocket)
+
+    except Exception:
+        log.exception("incident websocket error")
+        incident_events.hub.disconnect(websocket)
 
 
 # Static files setup (uploads folder)
@@ -227,7 +280,8 @@ if not is_vercel:
     if not uploads_path.exists():
         os.makedirs(uploads_path)
 
-    app.mount("/api/uploads", StaticFiles(directory=str(uploads_path)), name="uploads")
+    # content-addressed: immutable cache headers, range requests
+    app.mount("/api/uploads", storage.UploadFiles(directory=str(uploads_path)), name="uploads")
 
     # frontend folder serve panna
     frontend_path = root_path.parent / "frontend"
@@ -243,7 +297,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Next-Cursor", "X-Before-Cursor", "X-After-Cursor", "X-Chat-Since", "ETag",
+        auth.AUTH_OPTIONAL_HEADER, logs.REQUEST_ID_HEADER,
+    ],
 )
+# times the whole request (see profiling.py)
+app.add_middleware(profiling.ProfilingMiddleware)
+# outermost: the profiler's warnings carry the request id too
+app.add_middleware(logs.RequestIdMiddleware)
 
 # Router include
 app.include_router(router.router, prefix="/api")
@@ -254,4 +316,9 @@ if __name__ == "__main__":
 
     import uvicorn
 
+    # local dev convenience; deployments run `python api/migrate.py` explicitly
+    migrate.run_migrations()
+    # one process: tokens may be signed with a throwaway key unless one is configured
+    os.environ.setdefault("AUTH_RANDOM_DEV_KEY", "1")
+
     uvicorn.run(app, host="0.0.0.0", port=8500)
\ No newline at end of file
@@ -0,0 +1,258 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, select, update
+
+import changes
+import database
+import response_cache
+import tracks
+from geo import geohash_for
+from models import Incident, INCIDENT_STREAM, bump_version
+
+log = logging.getLogger(__name__)
+
+
+# Live-location ingestion.
+# GPS fixes land in an in-memory buffer keyed by incident (latest fix wins) and
+# a background thread writes them out with one executemany UPDATE per interval,
+# instead of one ORM load + commit per fix. Reads overlay the buffered
+# position so callers never see a position older than the last accepted fix.
+# Every fix (not just the latest) is also appended to the incident's track.
+#
+# On Vercel (VERCEL=1, see vercel.json) an instance can be frozen or recycled
+# as soon as the response is sent, taking a write-behind buffer with it, so
+# there the default is an inline write (interval 0): each request writes its
+# own fixes before it answers, and a failed write fails the request so the
+# client retries. LOCATION_FLUSH_SECONDS overrides either default.
+
+LOCATION_FLUSH_SECONDS = float(
+    os.getenv("LOCATION_FLUSH_SECONDS") or ("0" if os.environ.get("VERCEL") == "1" else "1.0")
+)
+# A failed batch is put back for the next flush, at most this many times in
+# a row, and with at most this many unflushed track points per incident.
+LOCATION_FLUSH_MAX_RETRIES = 10
+MAX_BUFFERED_TRACK_POINTS = 3600
+# incidents known to exist, with their reporter (least recently used dropped first)
+MAX_KNOWN_IDS = 10_000
+
+Fix = Tuple[float, float]
+
+
+class LocationBuffer:
+    def __init__(self, interval: float = LOCATION_FLUSH_SECONDS):
+        # interval <= 0 writes inline on every put (serverless hosts)
+        self.interval = interval
+        self._pending: Dict[int, Fix] = {}
+        # fixes taken by an in-progress flush; still served to readers until committed
+        self._flushing: Dict[int, Fix] = {}
+        self._track: Dict[int, List[tracks.Point]] = {}
+        self._track_flushing: Dict[int, List[tracks.Point]] = {}
+        self._known_ids: "OrderedDict[int, Optional[int]]" = OrderedDict()  # id -> reporter_id
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.coalesced = 0
+        self.flushed = 0
+        self.failures = 0  # consecutive failed flushes
+        self.dropped = 0
+        # moves whenever a served position changes without a stream head
+        # moving (buffered fix, dropped batch); listing ETags include it
+        self.generation = 0
+
+    # --- write side ---
+
+    def reporters(self, incident_ids: Iterable[int]) -> Dict[int, Optional[int]]:
+        """Reporter of each incident that exists; cached so steady-state fixes skip the lookup."""
+        wanted = set(incident_ids)
+        with self._lock:
+            known = {}
+            for incident_id in wanted:
+                if incident_id in self._known_ids:
+                    self._known_ids.move_to_end(incident_id)
+                    known[incident_id] = self._known_ids[incident_id]
+        unknown = wanted - set(known)
+        if unknown:
+            db = database.SessionLocal()
+            try:
+                found = dict(db.execute(
+                    select(Incident.id, Incident.reporter_id).where(Incident.id.in_(unknown))
+                ).all())
+            finally:
+                db.close()
+            with self._lock:
+                self._known_ids.update(found)
+                while len(self._known_ids) > MAX_KNOWN_IDS:
+                    self._known_ids.popitem(last=False)
+            known.update(found)
+        return known
+
+    def _forget_ids(self, incident_ids: Iterable[int]):
+        with self._lock:
+            for incident_id in incident_ids:
+                self._known_ids.pop(incident_id, None)
+
+    def put(self, fixes: Dict[int, Fix], at: Optional[float] = None):
+        """Buffer fixes for the next flush; with interval <= 0, write them now.
+
+        Inline writes raise on failure: the caller must not acknowledge fixes
+        that only live in the memory of an instance that may be frozen next.
+        """
+        at = time.time() if at is None else at
+        if self.interval <= 0:
+            self._write_inline(fixes, at)
+            return
+        with self._lock:
+            for incident_id, fix in fixes.items():
+                if incident_id in self._pending:
+                    self.coalesced += 1
+                self._pending[incident_id] = fix
+                self._track.setdefault(incident_id, []).append((at, fix[0], fix[1]))
+            self.generation += 1
+        # cached responses baked in the previous position; only this worker
+        # has the fix until the flush, which tells the others
+        response_cache.invalidate(*(response_cache.incident_tag(i) for i in fixes), shared=False)
+        self._ensure_thread()
+
+    def _write_inline(self, fixes: Dict[int, Fix], at: float):
+        # straight to the database; nothing is kept back for a retry here
+        if not fixes:
+            return
+        missing = write_positions(fixes, {i: [(at, lat, lng)] for i, (lat, lng) in fixes.items()})
+        self.flushed += len(fixes) - len(missing)
+        self._forget_ids(missing)
+
+    def forget(self, incident_id: int):
+        """Drop buffered state after the row was rewritten or deleted through the ORM."""
+        with self._lock:
+            self._known_ids.pop(incident_id, None)
+            self._pending.pop(incident_id, None)
+            self._track.pop(incident_id, None)
+            self.generation += 1
+
+    # --- read side ---
+
+    def latest(self, incident_id: int) -> Optional[Fix]:
+        with self._lock:
+            return self._pending.get(incident_id) or self._flushing.get(incident_id)
+
+    def unflushed_track(self, incident_id: int) -> List[tracks.Point]:
+        with self._lock:
+            return self._track_flushing.get(incident_id, []) + self._track.get(incident_id, [])
+
+    def position(self, incident) -> Tuple[Optional[float], Optional[float]]:
+        fix = self.latest(incident.id)
+        return fix if fix else (incident.latitude, incident.longitude)
+
+    # --- flush ---
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._flushing, self._pending = self._pending, {}
+                self._track_flushing, self._track = self._track, {}
+                batch = dict(self._flushing)
+                trail = dict(self._track_flushing)
+            try:
+                missing = write_positions(batch, trail)
+                self.flushed += len(batch) - len(missing)
+                self.failures = 0
+                # deleted since their ids were cached (bulk delete, another worker)
+                self._forget_ids(missing)
+            except Exception:
+                self.failures += 1
+                log.exception("live location flush failed", extra={
+                    "fixes": len(batch), "consecutive_failures": self.failures,
+                })
+                if self.failures > LOCATION_FLUSH_MAX_RETRIES:
+                    self.failures = 0  # whatever arrives next gets its own retries
+                    with self._lock:
+                        # along with anything put for these incidents while it was
+                        # retried, so fixes and trail points are dropped together
+                        for incident_id in batch:
+                            self._pending.pop(incident_id, None)
+                            self._track.pop(incident_id, None)
+                        self.dropped += len(batch)
+                        self.generation += 1  # readers fall back to the stored positions
+                    log.error("dropping unflushable live locations", extra={"fixes": len(batch)})
+                    return 0
+                with self._lock:
+                    # keep the fixes unless newer ones arrived meanwhile
+                    for incident_id, fix in batch.items():
+                        self._pending.setdefault(incident_id, fix)
+                    for incident_id, points in trail.items():
+                        points = points + self._track.get(incident_id, [])
+                        self._track[incident_id] = points[-MAX_BUFFERED_TRACK_POINTS:]
+            finally:
+                with self._lock:
+                    self._flushing = {}
+                    self._track_flushing = {}
+            return len(batch)
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="location-flush", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+
+def write_positions(fixes: Dict[int, Fix], trail: Optional[Dict[int, List[tracks.Point]]] = None) -> Set[int]:
+    """One transaction, one version bump, one executemany UPDATE, plus the track append.
+
+    Bulk statements skip the mapper hooks, so geohash and version are set here.
+    Returns the ids skipped because their incident no longer exists.
+    """
+    table = Incident.__table__
+    now = datetime.utcnow()
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("_id"))
+        .values(
+            latitude=bindparam("_lat"),
+            longitude=bindparam("_lng"),
+            geohash=bindparam("_geohash"),
+            version=bindparam("_version"),
+            updated_at=now,
+        )
+    )
+    with database.engine.begin() as conn:
+        # Lock the rows (in id order, so concurrent flushes can't deadlock) and
+        # skip deleted incidents: a track chunk for one would fail its FK and
+        # with it the whole batch.
+        present = set(conn.execute(
+            select(table.c.id).where(table.c.id.in_(fixes)).order_by(table.c.id).with_for_update()
+        ).scalars())
+        if present:
+            version = bump_version(conn, INCIDENT_STREAM)
+            rows: List[dict] = [
+                {"_id": incident_id, "_lat": lat, "_lng": lng,
+                 "_geohash": geohash_for(lat, lng), "_version": version}
+                for incident_id, (lat, lng) in fixes.items()
+                if incident_id in present
+            ]
+            conn.execute(stmt, rows)
+            trail = {i: points for i, points in (trail or {}).items() if i in present}
+            if trail:
+                tracks.append_points(conn, trail)
+    changes.head_cache.invalidate()
+    response_cache.invalidate(*(response_cache.incident_tag(i) for i in present))
+    return set(fixes) - present
+
+
+buffer = LocationBuffer()
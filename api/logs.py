@@ -0,0 +1,186 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+
+# Structured logging.
+# Every record becomes one JSON line with the level, logger, message, the
+# request's correlation id and any `extra={...}` fields. Callers only pay
+# for a level check and a queue put: a QueueHandler hands records to a
+# QueueListener thread that does the JSON encoding and the stdout write.
+# Tracebacks go to the log (as "exc"), never into a response.
+#
+#   LOG_LEVEL=DEBUG|INFO|WARNING...   default INFO
+#   LOG_FORMAT=json|text              text is easier to read in local dev
+#   LOG_SAMPLE_EVERY=100              keep 1 in N records of sampled events
+#
+# Usage: log = logging.getLogger(__name__); log.info("incident created",
+# extra={"incident_id": 5}). Use %-args, not f-strings, so disabled levels
+# cost nothing.
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_SAMPLE_EVERY = max(1, int(os.getenv("LOG_SAMPLE_EVERY", "100")))
+LOG_QUEUE_SIZE = 10_000  # past this records are dropped rather than blocking requests
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# LogRecord attributes that are not user fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+
+def request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+class _RequestIdFilter(logging.Filter):
+    """Stamp the correlation id while still on the caller's thread/context."""
+
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = _request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s [%(request_id)s] %(message)s")
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Never blocks: a full queue drops the record and counts it."""
+
+    dropped = 0
+
+    def prepare(self, record):
+        # Runs on the caller's thread: resolve the message and traceback
+        # here (the args/exc_info may not survive the hand-off), keep the
+        # rest of the record for the formatter on the listener thread.
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            type(self).dropped += 1
+
+
+def dropped_records() -> int:
+    return _QueueHandler.dropped
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_configure_lock = threading.Lock()
+
+
+def configure():
+    """Route the root logger through the queue; idempotent."""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+
+        handler = _QueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        handler.addFilter(_RequestIdFilter())
+
+        root = logging.getLogger()
+        root.handlers = [handler]
+        root.setLevel(LOG_LEVEL)
+
+        _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)  # flush what is still queued
+
+
+# --- sampling ---
+
+class Sampler:
+    """Keep 1 in `every` occurrences of each high-volume event."""
+
+    def __init__(self, every: int = LOG_SAMPLE_EVERY):
+        self.every = every
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event: str) -> bool:
+        with self._lock:
+            n = self._counts.get(event, 0)
+            self._counts[event] = n + 1
+        return n % self.every == 0
+
+
+sampled = Sampler()
+
+
+# --- correlation id ---
+
+class RequestIdMiddleware:
+    """Take X-Request-ID from the caller (or make one), expose it to logs and echo it back."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        rid = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-id":
+                rid = value.decode("latin-1")
+                break
+        if not rid or not _VALID_REQUEST_ID.match(rid):
+            rid = uuid.uuid4().hex
+        # the 500 handler runs outside this middleware; it reads the id from the scope
+        scope["request_id"] = rid
+        token = _request_id.set(rid)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", rid.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request_id.reset(token)
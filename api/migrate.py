@@ -0,0 +1,272 @@
+import argparse
+import logging
+import os
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from sqlalchemy import cast, func, insert, inspect, select, text
+from sqlalchemy.dialects.postgresql import REGCLASS
+
+sys.path.append(str(Path(__file__).resolve().parent))
+
+import database
+import geo
+import models
+import summary
+from models import SchemaVersion
+
+log = logging.getLogger(__name__)
+
+
+# Versioned schema migrations.
+#   python api/migrate.py            apply everything pending
+#   python api/migrate.py status     show applied / pending
+#   python api/migrate.py --to 4     stop at a given version
+#
+# Each migration runs once, in order, and is recorded in schema_version. All
+# pending migrations run in one transaction holding a Postgres advisory lock,
+# so concurrent deploys/workers serialize and the loser finds nothing to do.
+# Steps are written to be idempotent because databases created before this
+# runner already have some of the columns and indexes.
+
+MIGRATION_LOCK_KEY = 72_741_015  # arbitrary, app-wide
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    apply: Callable
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str):
+    def register(fn):
+        assert not MIGRATIONS or MIGRATIONS[-1].version < version, "migrations must be ordered"
+        MIGRATIONS.append(Migration(version, name, fn))
+        return fn
+    return register
+
+
+def _has_column(conn, table: str, column: str) -> bool:
+    return column in {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def _add_column(conn, table: str, column: str, ddl: str) -> bool:
+    if _has_column(conn, table, column):
+        return False
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    return True
+
+
+# --- migrations (append only; never edit one that has shipped) ---
+
+@migration(1, "create_tables")
+def _create_tables(conn):
+    # new databases get the full current schema here; later steps become no-ops
+    models.Base.metadata.create_all(bind=conn)
+
+
+@migration(2, "users_is_approved")
+def _users_is_approved(conn):
+    _add_column(conn, "users", "is_approved", "BOOLEAN DEFAULT TRUE")
+
+
+@migration(3, "chat_messages_is_read")
+def _chat_messages_is_read(conn):
+    _add_column(conn, "chat_messages", "is_read", "BOOLEAN DEFAULT FALSE")
+
+
+@migration(4, "incidents_geohash")
+def _incidents_geohash(conn):
+    _add_column(conn, "incidents", "geohash", "VARCHAR(12)")
+    rows = conn.execute(text(
+        "SELECT id, latitude, longitude FROM incidents "
+        "WHERE geohash IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL"
+    )).fetchall()
+    if rows:
+        conn.execute(
+            text("UPDATE incidents SET geohash = :gh WHERE id = :id"),
+            [{"gh": geo.geohash_for(r.latitude, r.longitude), "id": r.id} for r in rows],
+        )
+
+
+@migration(5, "change_tracking_columns")
+def _change_tracking_columns(conn):
+    for table, column, ddl in (
+        ("incidents", "updated_at", "TIMESTAMP"),
+        ("incidents", "version", "BIGINT DEFAULT 0"),
+        ("chat_messages", "updated_at", "TIMESTAMP"),
+        ("chat_messages", "version", "BIGINT DEFAULT 0"),
+    ):
+        _add_column(conn, table, column, ddl)
+
+
+@migration(6, "listing_indexes")
+def _listing_indexes(conn):
+    # create_all skips indexes on tables that already existed
+    for index in (*models.Incident.__table__.indexes, *models.ChatMessage.__table__.indexes):
+        index.create(bind=conn, checkfirst=True)
+
+
+@migration(7, "stored_objects")
+def _stored_objects(conn):
+    models.StoredObject.__table__.create(bind=conn, checkfirst=True)
+
+
+@migration(8, "summary_counters")
+def _summary_counters(conn):
+    models.SummaryCounter.__table__.create(bind=conn, checkfirst=True)
+    summary.recount(conn)  # one-off scan; kept incrementally from here on
+
+
+@migration(9, "chat_read_marks")
+def _chat_read_marks(conn):
+    models.ChatReadMark.__table__.create(bind=conn, checkfirst=True)
+    for index in models.ChatMessage.__table__.indexes:
+        index.create(bind=conn, checkfirst=True)
+
+    # Carry the old is_read flags over: for each participant, read up to the
+    # newest message someone else sent that was flagged read
+    participants = {
+        r.id: {r.reporter_id, r.volunteer_id} - {None}
+        for r in conn.execute(text("SELECT id, reporter_id, volunteer_id FROM incidents"))
+    }
+    marks = {}
+    chat = models.ChatMessage.__table__
+    for m in conn.execute(
+        select(chat.c.id, chat.c.incident_id, chat.c.sender_id, chat.c.timestamp)
+        .where(chat.c.is_read.is_(True), chat.c.timestamp.isnot(None))
+        .order_by(chat.c.timestamp, chat.c.id)
+    ):
+        for user_id in participants.get(m.incident_id, ()):
+            if user_id != m.sender_id:
+                marks[(user_id, m.incident_id)] = (m.timestamp, m.id)
+    if marks:
+        conn.execute(insert(models.ChatReadMark.__table__), [
+            {"user_id": u, "incident_id": i, "last_read_at": ts, "last_read_id": mid, "version": 0}
+            for (u, i), (ts, mid) in marks.items()
+        ])
+
+
+@migration(10, "change_version_sequences")
+def _change_version_sequences(conn):
+    if conn.dialect.name != "postgresql":
+        return  # other databases keep using the change_versions rows
+    counters = dict(conn.execute(select(models.ChangeVersion.name, models.ChangeVersion.version)).all())
+    for stream, sequence in models.VERSION_SEQUENCES.items():
+        sequence.create(bind=conn, checkfirst=True)
+        # carry on from the counter row so versions keep increasing
+        if counters.get(stream):
+            conn.execute(select(func.setval(cast(sequence.name, REGCLASS), counters[stream])))
+
+
+@migration(11, "chat_messages_version_index")
+def _chat_messages_version_index(conn):
+    for index in models.ChatMessage.__table__.indexes:
+        index.create(bind=conn, checkfirst=True)
+
+
+@migration(12, "summary_counter_slots")
+def _summary_counter_slots(conn):
+    # the counters are derived data: rebuild the table keyed by (name, slot)
+    if _has_column(conn, "summary_counters", "slot"):
+        return
+    models.SummaryCounter.__table__.drop(bind=conn)
+    models.SummaryCounter.__table__.create(bind=conn)
+    summary.recount(conn)
+
+
+# --- runner ---
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def _lock(conn):
+    if conn.dialect.name == "postgresql":
+        # backfills and index builds outlast DB_STATEMENT_TIMEOUT_MS; lift it
+        # for this transaction only (the lock wait included)
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+        # transaction-scoped: released on commit/rollback, safe behind PgBouncer
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+
+def current_version(conn) -> int:
+    if not inspect(conn).has_table(SchemaVersion.__tablename__):
+        return 0
+    return conn.execute(select(func.max(SchemaVersion.version))).scalar() or 0
+
+
+def schema_status(engine=None) -> dict:
+    """The cheap startup check: one indexed max() query."""
+    engine = engine or database.get_engine()
+    with engine.connect() as conn:
+        try:
+            current = conn.execute(select(func.max(SchemaVersion.version))).scalar() or 0
+        except Exception:
+            current = 0  # schema_version not created yet
+    return {"current": current, "latest": LATEST_VERSION, "up_to_date": current >= LATEST_VERSION}
+
+
+def upgrade(engine=None, target: Optional[int] = None) -> List[int]:
+    engine = engine or database.get_engine()
+    applied = []
+    with engine.begin() as conn:
+        _lock(conn)
+        SchemaVersion.__table__.create(bind=conn, checkfirst=True)
+        # read after taking the lock: another process may have just finished
+        current = current_version(conn)
+        for m in MIGRATIONS:
+            if m.version <= current or (target is not None and m.version > target):
+                continue
+            log.info("applying migration %03d %s", m.version, m.name)
+            m.apply(conn)
+            conn.execute(
+                insert(SchemaVersion.__table__).values(
+                    version=m.version, name=m.name, applied_at=datetime.utcnow()
+                )
+            )
+            applied.append(m.version)
+    return applied
+
+
+def run_migrations():
+    """Used by `python api/index.py` for local dev; never raises."""
+    if not os.environ.get("DATABASE_URL"):
+        log.info("skipping migrations: DATABASE_URL not set")
+        return
+    try:
+        applied = upgrade()
+        log.info("database migrations applied: %s", applied or "none pending")
+    except Exception:
+        log.exception("database migration failed")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SafeTracker schema migrations")
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "status"])
+    parser.add_argument("--to", type=int, default=None, help="stop at this version")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    engine = database.get_engine()
+    if args.command == "status":
+        with engine.connect() as conn:
+            current = current_version(conn)
+        for m in MIGRATIONS:
+            state = "applied" if m.version <= current else "pending"
+            print(f"{m.version:03d} {m.name:<28} {state}")
+        return 0
+
+    applied = upgrade(engine, args.to)
+    print(f"Schema at version {schema_status(engine)['current']} ({len(applied)} applied)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
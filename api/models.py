@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, DateTime, Float, Boolean, Index, LargeBinary, UniqueConstraint
+from sqlalchemy import Sequence, event, func, insert, select, update
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
+from geo import geohash_for
 
 
 class User(Base):
@@ -34,10 +36,13 @@ class Incident(Base):
     full_address = Column(String)
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
+    geohash = Column(String(12), nullable=True)  # kept in sync with lat/lng
     status = Column(
         String, default="reported"
     )  # 'reported', 'accepted', 'in_progress', 'awaiting_confirmation', 'closed'
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(BigInteger, default=0, index=True)  # "incidents" change stream position
 
     reporter_id = Column(Integer, ForeignKey("users.id"))
     volunteer_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -51,6 +56,40 @@ class Incident(Base):
     messages = relationship(
         "ChatMessage", back_populates="incident", cascade="all, delete-orphan"
     )
+    # passive: the database cascade drops the blobs without loading them
+    track_chunks = relationship(
+        "LocationTrackChunk", cascade="all, delete-orphan", passive_deletes=True
+    )
+    read_marks = relationship(
+        "ChatReadMark", cascade="all, delete-orphan", passive_deletes=True
+    )
+
+    # Composite indexes backing the keyset-paginated listings
+    __table_args__ = (
+        Index("ix_incidents_status_created_at", "status", "created_at"),
+        Index("ix_incidents_reporter_created_at", "reporter_id", "created_at"),
+        Index("ix_incidents_volunteer_created_at", "volunteer_id", "created_at"),
+        # pattern ops so LIKE 'prefix%' cell scans use the index on Postgres
+        Index(
+            "ix_incidents_geohash",
+            "geohash",
+            postgresql_ops={"geohash": "varchar_pattern_ops"},
+        ),
+    )
+
+
+@event.listens_for(Incident, "before_insert")
+@event.listens_for(Incident, "before_update")
+def _before_incident_write(mapper, connection, target):
+    # Spatial cell for the "nearby" lookups; recomputed whenever the position moves
+    target.geohash = geohash_for(target.latitude, target.longitude)
+    # Position in the delta feed
+    target.version = bump_version(connection, INCIDENT_STREAM)
+
+
+@event.listens_for(Incident, "before_delete")
+def _record_incident_tombstone(mapper, connection, target):
+    record_incident_deletions(connection, [target.id])
 
 
 class ChatMessage(Base):
@@ -61,11 +100,62 @@ class ChatMessage(Base):
     sender_id = Column(Integer, ForeignKey("users.id"))
     message = Column(String)
     timestamp = Column(DateTime, default=datetime.utcnow)
-    is_read = Column(Boolean, default=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    is_read = Column(Boolean, default=False)  # legacy; read state lives in chat_read_marks
+    version = Column(BigInteger, default=0, index=True)  # "chat" change stream position
 
     incident = relationship("Incident", back_populates="messages")
     sender = relationship("User")
 
+    # History pages and unread counts are range scans within one incident
+    __table_args__ = (
+        Index("ix_chat_messages_incident_timestamp_id", "incident_id", "timestamp", "id"),
+        # polls read by chat-stream position (chat.poll_page)
+        Index("ix_chat_messages_incident_version_id", "incident_id", "version", "id"),
+    )
+
+
+@event.listens_for(ChatMessage, "before_insert")
+@event.listens_for(ChatMessage, "before_update")
+def _stamp_chat_version(mapper, connection, target):
+    target.version = bump_version(connection, CHAT_STREAM)
+
+
+class ChatReadMark(Base):
+    """How far one user has read one incident's chat.
+
+    A watermark on the message order (timestamp, id): everything at or before
+    it counts as read for this user. Replaces the per-message is_read flag.
+    """
+
+    __tablename__ = "chat_read_marks"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    incident_id = Column(Integer, ForeignKey("incidents.id", ondelete="CASCADE"), primary_key=True)
+    last_read_at = Column(DateTime, nullable=False)
+    last_read_id = Column(Integer, nullable=False)
+    version = Column(BigInteger, nullable=False, default=0, index=True)  # "chat" change stream position
+
+
+class LocationTrackChunk(Base):
+    """Reporter trail for one incident and one time bucket.
+
+    `data` holds delta-encoded (time, lat, lng) columns; see tracks.py.
+    """
+
+    __tablename__ = "location_track_chunks"
+
+    id = Column(Integer, primary_key=True)
+    incident_id = Column(Integer, ForeignKey("incidents.id", ondelete="CASCADE"), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    point_count = Column(Integer, nullable=False, default=0)
+    last_ts = Column(Float, nullable=False, default=0.0)  # epoch seconds of the newest point
+    data = Column(LargeBinary, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("incident_id", "bucket_start", name="uq_track_chunk_bucket"),
+    )
+
 
 class Complaint(Base):
     __tablename__ = "complaints"
@@ -76,3 +166,121 @@ class Complaint(Base):
     subject = Column(String)
     message = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class StoredObject(Base):
+    """One uploaded document, stored once per distinct content (see storage.py).
+
+    ref_count is the number of users whose profile_image points at it.
+    """
+
+    __tablename__ = "stored_objects"
+
+    sha256 = Column(String(64), primary_key=True)
+    key = Column(String, nullable=False)  # sharded path inside the backend
+    backend = Column(String, nullable=False)  # 'local' or 'supabase'
+    url = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String, nullable=True)
+    ref_count = Column(Integer, nullable=False, default=0)
+    stored = Column(Boolean, nullable=False, default=False)  # bytes are in the backend
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+# --- Change tracking (delta feed) ---
+
+INCIDENT_STREAM = "incidents"
+CHAT_STREAM = "chat"
+
+
+# Postgres hands out versions from one sequence per stream: nextval never
+# waits, so writers in different incidents and chat rooms don't queue behind
+# each other. Versions are then issued in nextval order, not commit order;
+# changes.HeadCache only publishes a head once every transaction that could
+# still commit a version at or below it has ended.
+VERSION_SEQUENCES = {
+    stream: Sequence(f"change_seq_{stream}", metadata=Base.metadata)
+    for stream in (INCIDENT_STREAM, CHAT_STREAM)
+}
+
+
+class ChangeVersion(Base):
+    """One counter row per change stream, for databases without sequences.
+
+    Bumping it takes the row lock until the writing transaction commits, so
+    versions become visible in commit order. That only suits SQLite (local
+    dev, tests), which serializes writers anyway; Postgres uses
+    VERSION_SEQUENCES.
+    """
+
+    __tablename__ = "change_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+class IncidentTombstone(Base):
+    __tablename__ = "incident_tombstones"
+
+    id = Column(Integer, primary_key=True)
+    incident_id = Column(Integer, nullable=False)
+    version = Column(BigInteger, nullable=False, index=True)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+
+def bump_version(connection, stream: str) -> int:
+    if connection.dialect.name == "postgresql":
+        # txid_current() is evaluated first, so the transaction holds an xid
+        # before it holds a version; HeadCache's settle check relies on that
+        return connection.execute(
+            select(func.txid_current(), VERSION_SEQUENCES[stream].next_value())
+        ).one()[1]
+
+    table = ChangeVersion.__table__
+    version = connection.execute(
+        update(table)
+        .where(table.c.name == stream)
+        .values(version=table.c.version + 1)
+        .returning(table.c.version)
+    ).scalar()
+    if version is None:
+        connection.execute(insert(table).values(name=stream, version=1))
+        version = 1
+    return version
+
+
+def record_incident_deletions(connection, incident_ids):
+    """Tombstone deleted incidents; needed for bulk deletes that skip mapper events."""
+    incident_ids = list(incident_ids)
+    if not incident_ids:
+        return
+    version = bump_version(connection, INCIDENT_STREAM)
+    connection.execute(
+        insert(IncidentTombstone.__table__),
+        [{"incident_id": i, "version": version, "deleted_at": datetime.utcnow()} for i in incident_ids],
+    )
+
+
+# --- Admin summary ---
+
+class SummaryCounter(Base):
+    """One slot of a running count kept up to date by summary.py (e.g.
+    incidents.status.closed); the count is the sum of its slots."""
+
+    __tablename__ = "summary_counters"
+
+    name = Column(String, primary_key=True)
+    slot = Column(Integer, primary_key=True, default=0)
+    value = Column(BigInteger, nullable=False, default=0)
+
+
+# --- Migrations ---
+
+class SchemaVersion(Base):
+    """One row per applied migration (see migrate.py)."""
+
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,70 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_
+
+
+# Keyset pagination over (created_at, id), newest first.
+# The cursor is opaque to clients: base64("<created_at iso>|<id>").
+
+MAX_PAGE_SIZE = 500
+# listings page by default, so a client that sends no limit still gets a bounded response
+DEFAULT_PAGE_SIZE = 100
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def keyset_page(query, created_col, id_col, cursor: Optional[str], limit: Optional[int]):
+    """Order `query` newest first and apply the cursor/limit window.
+
+    Fetches one extra row so the caller can tell whether another page exists.
+    Without a limit the full (cursor-filtered) result is returned; routes pass
+    DEFAULT_PAGE_SIZE when the client sends none.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                created_col < created_at,
+                and_(created_col == created_at, id_col < row_id),
+            )
+        )
+
+    query = query.order_by(created_col.desc(), id_col.desc())
+    if limit:
+        query = query.limit(min(limit, MAX_PAGE_SIZE) + 1)
+    return query
+
+
+def split_page(rows, limit: Optional[int], key, response: Optional[Response] = None):
+    """Trim the look-ahead row and publish the next cursor as a response header.
+
+    `key(row)` must return the (created_at, id) pair of a row.
+    """
+    if not limit:
+        return rows, None
+
+    limit = min(limit, MAX_PAGE_SIZE)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*key(rows[-1]))
+
+    if response is not None and next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rows, next_cursor
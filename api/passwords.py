@@ -0,0 +1,70 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+
+from fastapi import HTTPException
+
+
+# Password hashing off the request threadpool.
+# pbkdf2 costs tens of ms of CPU per call; running it inline let a login burst
+# occupy every AnyIO worker thread. Hashes run on a small dedicated pool
+# instead (hashlib's pbkdf2 releases the GIL, so threads are enough), with
+# a cap on queued work: beyond it callers get a 503 instead of piling up.
+
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "29000"))  # passlib's default
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    # passlib is only needed by signup/login; build it on first use
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["pbkdf2_sha256"],
+        deprecated="auto",
+        pbkdf2_sha256__default_rounds=PASSWORD_HASH_ROUNDS,
+        # hashes below the configured cost are flagged by needs_update and upgraded on login
+        pbkdf2_sha256__min_rounds=PASSWORD_HASH_ROUNDS,
+    )
+
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="pwhash")
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+
+
+def _submit(fn, *args) -> Future:
+    if not _slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+    future = _executor.submit(fn, *args)
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def _hash(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+
+def _verify(password: str, hashed: str) -> bool:
+    return get_pwd_context().verify(password, hashed)
+
+
+# await without holding a worker thread
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(_submit(_hash, password))
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await asyncio.wrap_future(_submit(_verify, password, hashed))
+
+
+def needs_update(hashed: str) -> bool:
+    """Cheap: only parses the stored hash (scheme, rounds), no hashing."""
+    return get_pwd_context().needs_update(hashed)
@@ -0,0 +1,377 @@
+import cProfile
+import functools
+import inspect
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import pyinstrument
+except ImportError:  # optional: X-Profile falls back to cProfile
+    pyinstrument = None
+
+log = logging.getLogger(__name__)
+
+
+# Request-level profiling.
+# ProfilingMiddleware times every HTTP request; SQLAlchemy cursor hooks add
+# the DB time, query count and slowest statement of the request they run in
+# (found through a context variable, which also follows sync routes into
+# the threadpool). Totals per route feed GET /api/metrics (Prometheus text
+# format, per worker process).
+#
+# X-Profile: cprofile | pyinstrument returns a profile of the endpoint
+# instead of its body. Only honoured with PROFILING_ALLOWED=1.
+# PROFILE_N_PLUS_ONE=1 counts statements per request and flags any that
+# runs N_PLUS_ONE_THRESHOLD times or more (classic N+1 loop).
+
+PROFILING_ALLOWED = os.getenv("PROFILING_ALLOWED") == "1"
+DETECT_N_PLUS_ONE = os.getenv("PROFILE_N_PLUS_ONE") == "1"
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+PROFILE_HEADER = "x-profile"
+PROFILE_TOP_FUNCTIONS = 30
+STATEMENT_PREVIEW_CHARS = 300
+
+# Prometheus' default buckets, seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "unmatched"  # 404s etc.; keeps label cardinality bounded
+
+
+@dataclass
+class RequestProfile:
+    method: str
+    path: str
+    profile_mode: Optional[str] = None  # "cprofile" / "pyinstrument" when X-Profile asked
+    count_statements: bool = DETECT_N_PLUS_ONE
+    started: float = field(default_factory=time.perf_counter)
+    wall: Optional[float] = None  # set when the last body chunk is sent
+    db_time: float = 0.0
+    queries: int = 0
+    slowest: Tuple[float, str] = (0.0, "")
+    statements: Counter = field(default_factory=Counter)
+    profilers: list = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.wall is not None
+
+    def record_query(self, statement: str, elapsed: float):
+        with self._lock:
+            self.db_time += elapsed
+            self.queries += 1
+            if elapsed > self.slowest[0]:
+                self.slowest = (elapsed, statement)
+            if self.count_statements or self.profile_mode:
+                self.statements[statement] += 1
+
+    def repeated_statements(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        return [(s, n) for s, n in self.statements.most_common() if n >= threshold]
+
+    def finish(self):
+        if self.wall is None:
+            self.wall = time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        total = (time.perf_counter() - self.started) * 1000
+        return f"db;dur={self.db_time * 1000:.1f};desc=\"{self.queries} queries\", app;dur={total:.1f}"
+
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+# --- SQL instrumentation (every engine) ---
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    if profile is not None and not profile.finished:
+        conn.info.setdefault("profiling_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("profiling_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    profile = _current.get()
+    if profile is not None:
+        profile.record_query(statement, elapsed)
+
+
+# --- per-route totals ---
+
+@dataclass
+class RouteStats:
+    buckets: List[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+    count: int = 0
+    wall: float = 0.0
+    db_time: float = 0.0
+    queries: int = 0
+    slowest_query: float = 0.0
+    n_plus_one: int = 0
+    statuses: Counter = field(default_factory=Counter)
+
+
+class Metrics:
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], RouteStats] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route: str, profile: RequestProfile, status: int, n_plus_one: bool):
+        with self._lock:
+            stats = self._routes.setdefault((profile.method, route), RouteStats())
+            index = bisect_left(LATENCY_BUCKETS, profile.wall)
+            if index < len(stats.buckets):
+                stats.buckets[index] += 1
+            stats.count += 1
+            stats.wall += profile.wall
+            stats.db_time += profile.db_time
+            stats.queries += profile.queries
+            stats.slowest_query = max(stats.slowest_query, profile.slowest[0])
+            stats.n_plus_one += int(n_plus_one)
+            stats.statuses[status] += 1
+
+    def render(self) -> str:
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = []
+
+            def family(name, kind, help_text):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+            family("safetracker_http_requests_total", "counter", "HTTP requests by route and status.")
+            for (method, route), s in routes:
+                for status, n in sorted(s.statuses.items()):
+                    lines.append(f"safetracker_http_requests_total{{{_labels(method, route)},status=\"{status}\"}} {n}")
+
+            name = "safetracker_http_request_duration_seconds"
+            family(name, "histogram", "Wall time per request, until the last body byte.")
+            for (method, route), s in routes:
+                labels = _labels(method, route)
+                cumulative = 0
+                for bound, n in zip(LATENCY_BUCKETS, s.buckets):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{{{labels},le=\"{bound}\"}} {cumulative}")
+                lines.append(f"{name}_bucket{{{labels},le=\"+Inf\"}} {s.count}")
+                lines.append(f"{name}_sum{{{labels}}} {s.wall:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {s.count}")
+
+            for name, kind, help_text, attr in (
+                ("safetracker_http_request_db_seconds_total", "counter",
+                 "Time spent in SQL statements.", "db_time"),
+                ("safetracker_http_request_queries_total", "counter",
+                 "SQL statements executed.", "queries"),
+                ("safetracker_http_request_slowest_query_seconds", "gauge",
+                 "Slowest single SQL statement seen.", "slowest_query"),
+                ("safetracker_http_request_n_plus_one_total", "counter",
+                 "Requests that repeated one statement N_PLUS_ONE_THRESHOLD+ times.", "n_plus_one"),
+            ):
+                family(name, kind, help_text)
+                for (method, route), s in routes:
+                    value = getattr(s, attr)
+                    value = f"{value:.6f}" if isinstance(value, float) else value
+                    lines.append(f"{name}{{{_labels(method, route)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(method: str, route: str) -> str:
+    return f'method="{method}",route="{_escape(route)}"'
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_samples(samples: Dict[str, Tuple[str, float]]) -> str:
+    """Extra gauges/counters for /api/metrics: {name: (kind, value)}."""
+    lines = []
+    for name, (kind, value) in samples.items():
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+# --- endpoint profiling (X-Profile) ---
+
+def _profile_call(profile: RequestProfile, fn, *args, **kwargs):
+    """Run a sync endpoint under the requested profiler (it is per thread)."""
+    if profile.profile_mode == "pyinstrument":
+        profiler = pyinstrument.Profiler(async_mode="disabled")
+        profiler.start()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.stop()
+            profile.profilers.append(profiler)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profiler.disable()
+        profile.profilers.append(profiler)
+
+
+class ProfiledRoute(APIRoute):
+    """Route class that can profile its endpoint where it actually runs.
+
+    Sync endpoints run in a threadpool thread, out of reach of a profiler
+    started in the middleware, so the endpoint itself is wrapped. The
+    wrapper is a pass-through unless the request asked for X-Profile.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if getattr(endpoint, "__profiled__", False):
+            # include_router rebuilds routes from the already wrapped endpoint
+            super().__init__(path, endpoint, **kwargs)
+            return
+        if inspect.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def wrapped(*args, **kw):
+                profile = _current.get()
+                if profile is None or not profile.profile_mode:
+                    return await endpoint(*args, **kw)
+                profiler = cProfile.Profile()  # event loop thread: other tasks show up too
+                profiler.enable()
+                try:
+                    return await endpoint(*args, **kw)
+                finally:
+                    profiler.disable()
+                    profile.profilers.append(profiler)
+        else:
+            @functools.wraps(endpoint)
+            def wrapped(*args, **kw):
+                profile = _current.get()
+                if profile is None or not profile.profile_mode:
+                    return endpoint(*args, **kw)
+                return _profile_call(profile, endpoint, *args, **kw)
+        wrapped.__profiled__ = True
+        super().__init__(path, wrapped, **kwargs)
+
+
+def _report(profile: RequestProfile, status: int) -> str:
+    out = io.StringIO()
+    slowest_s, slowest_sql = profile.slowest
+    out.write(f"{profile.method} {profile.path} -> {status}\n")
+    out.write(f"wall {profile.wall * 1000:.1f} ms | db {profile.db_time * 1000:.1f} ms "
+              f"in {profile.queries} queries | slowest {slowest_s * 1000:.1f} ms\n")
+    if slowest_sql:
+        out.write(f"slowest statement: {_preview(slowest_sql)}\n")
+    repeated = profile.repeated_statements(threshold=2)
+    if repeated:
+        out.write("\nrepeated statements (possible N+1):\n")
+        for statement, n in repeated:
+            out.write(f"  {n:>4}x  {_preview(statement)}\n")
+
+    if not profile.profilers:
+        out.write("\n(no endpoint profile: route is not a ProfiledRoute)\n")
+    for profiler in profile.profilers:
+        if pyinstrument is not None and isinstance(profiler, pyinstrument.Profiler):
+            out.write("\n--- pyinstrument ---\n")
+            out.write(profiler.output_text(unicode=False, color=False))
+        else:
+            out.write(f"\n--- cProfile (top {PROFILE_TOP_FUNCTIONS} by cumulative time) ---\n")
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    return out.getvalue()
+
+
+def _preview(statement: str) -> str:
+    flat = " ".join(statement.split())
+    return flat if len(flat) <= STATEMENT_PREVIEW_CHARS else flat[:STATEMENT_PREVIEW_CHARS] + "..."
+
+
+def _requested_mode(scope) -> Optional[str]:
+    if not PROFILING_ALLOWED:
+        return None
+    for name, value in scope.get("headers", ()):
+        if name == PROFILE_HEADER.encode():
+            wanted = value.decode().strip().lower()
+            if wanted == "pyinstrument" and pyinstrument is not None:
+                return "pyinstrument"
+            return "cprofile" if wanted not in ("", "0") else None
+    return None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI, so the context variable is set in the request's own task."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = _requested_mode(scope)
+        profile = RequestProfile(scope["method"], scope["path"], profile_mode=mode)
+        token = _current.set(profile)
+        status = 500
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if mode:
+                    return  # the profile report replaces the response
+                message.setdefault("headers", [])
+                message["headers"] = [
+                    *message["headers"],
+                    (b"server-timing", profile.server_timing().encode()),
+                ]
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                # background tasks run after this; they are not the request's time
+                profile.finish()
+                if mode:
+                    return
+            elif mode:
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            _current.reset(token)
+            profile.finish()
+            self._observe(scope, profile, status)
+
+        if mode:
+            body = _report(profile, status).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/plain; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"x-profile-status", str(status).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+
+    def _observe(self, scope, profile: RequestProfile, status: int):
+        route = scope.get("route")
+        route = getattr(route, "path", None) or UNMATCHED_ROUTE
+        repeated = profile.repeated_statements() if profile.count_statements else []
+        for statement, n in repeated:
+            log.warning("possible N+1 in %s %s", profile.method, route, extra={
+                "repeats": n, "statement": _preview(statement),
+            })
+        metrics.observe(route, profile, status, bool(repeated))
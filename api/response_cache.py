@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import Request, Response
+
+from broadcast import BroadcastBackend, InProcessBroadcast, backend_from_env, shared_backend_configured
+from conditional import check_etag
+
+log = logging.getLogger(__name__)
+
+
+# Server-side cache for hot, rarely-changing reads (available incidents,
+# incident status, complaints).
+# Entries hold the already-serialized JSON body, so a hit skips the database
+# and Pydantic entirely. Each entry carries tags naming what it was built
+# from ("incidents", "incident:<id>", "complaints"); the mutating routes call
+# invalidate() with the tags they touched right after commit.
+#
+# Bounded by entry count and by total body bytes, least recently used first.
+# With CHAT_BROADCAST_BACKEND=postgres invalidations are also published on
+# their own NOTIFY channel so every worker drops its copy, and the TTL (30s)
+# is only a safety net for writers that bypass the routes (scripts, manual
+# SQL). Without it an invalidation reaches this worker only, so the TTL is
+# what bounds how stale the other workers can be and defaults to 2s.
+
+RESPONSE_CACHE_TTL_SECONDS = float(  # 0 disables
+    os.getenv("RESPONSE_CACHE_TTL_SECONDS") or ("30" if shared_backend_configured() else "2")
+)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+ENTRY_OVERHEAD_BYTES = 256  # key, headers and bookkeeping, roughly
+INVALIDATION_ROOM = 0
+
+
+def incident_tag(incident_id: int) -> str:
+    return f"incident:{incident_id}"
+
+
+INCIDENTS_TAG = "incidents"  # membership of incident listings
+COMPLAINTS_TAG = "complaints"
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    tags: Tuple[str, ...]
+    expires_at: float
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + ENTRY_OVERHEAD_BYTES
+
+    def respond(self, request: Request) -> Response:
+        etag = self.headers.get("ETag")
+        if etag:
+            not_modified = check_etag(request, Response(), etag)
+            if not_modified:
+                return not_modified
+        return Response(self.body, media_type="application/json", headers=self.headers)
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        backend: Optional[BroadcastBackend] = None,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.backend = backend or InProcessBroadcast()
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._by_tag: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        # bumped by every invalidation; a fill that started before one is dropped
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self._origin = uuid.uuid4().hex
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listeners: List[Callable[[List[str]], None]] = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    @property
+    def epoch(self) -> int:
+        """Read before querying; pass to put() so a racing write can't be cached over."""
+        return self._epoch
+
+    # --- reads ---
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(
+        self,
+        key: str,
+        body: bytes,
+        tags: Iterable[str],
+        epoch: int,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> CachedResponse:
+        entry = CachedResponse(
+            body=body,
+            tags=tuple(set(tags)),
+            expires_at=time.monotonic() + self.ttl,
+            headers=dict(headers or {}),
+        )
+        if not self.enabled or entry.size > self.max_bytes:
+            return entry
+        with self._lock:
+            if epoch != self._epoch:
+                # something was invalidated while this body was being built
+                return entry
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            for tag in entry.tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    # --- invalidation ---
+
+    def invalidate_local(self, tags: Iterable[str]) -> int:
+        tags = list(tags)
+        with self._lock:
+            self._epoch += 1
+            keys = set()
+            for tag in tags:
+                keys |= self._by_tag.get(tag, set())
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+        for listener in self._listeners:
+            listener(tags)
+        return len(keys)
+
+    def on_invalidate(self, listener: Callable[[List[str]], None]):
+        """Also hand every invalidation, local or from another worker, to `listener`.
+
+        Lets other per-process caches (auth principals) share this channel.
+        """
+        self._listeners.append(listener)
+
+    def invalidate(self, *tags: str, shared: bool = True):
+        """Drop entries built from `tags`; safe to call from any thread.
+
+        shared=False keeps it to this worker (state that only lives here,
+        like the location buffer).
+        """
+        tags = [t for t in tags if t]
+        if not tags:
+            return
+        self.invalidate_local(tags)
+        if shared and self._loop is not None and not isinstance(self.backend, InProcessBroadcast):
+            message = {"tags": tags, "origin": self._origin}
+            # fire and forget; the TTL bounds a lost message
+            asyncio.run_coroutine_threadsafe(self._publish(message), self._loop)
+
+    async def _publish(self, message: dict):
+        try:
+            await self.backend.publish(INVALIDATION_ROOM, message)
+        except Exception:
+            log.exception("response cache invalidation publish failed")
+
+    async def _on_remote(self, room: int, message: dict):
+        if message.get("origin") != self._origin:
+            self.invalidate_local(message.get("tags") or [])
+
+    async def start(self):
+        """Subscribe to other workers' invalidations (app lifespan)."""
+        self._loop = asyncio.get_running_loop()
+        await self.backend.start(self._on_remote)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._by_tag.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "shared": not isinstance(self.backend, InProcessBroadcast),
+            }
+
+
+def key_for(request: Request) -> str:
+    """Endpoint plus its query parameters, in a canonical order."""
+    params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{params}"
+
+
+# separate NOTIFY channel: invalidations never share a handler with chat/incidents
+cache = ResponseCache(backend=backend_from_env(channel="safetracker_cache"))
+invalidate = cache.invalidate
@@ -1,29 +1,46 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, UploadFile, File, Form, HTTPException, Query, Request, Response
+from sqlalchemy import and_, case, func, literal, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
 from typing import List, Optional
-import shutil
-import os
-from database import get_db, supabase_client
-from models import User, Incident, Complaint, ChatMessage
+from datetime import datetime, timezone
+import anyio
+import logging
+from database import SessionLocal, get_db
+from models import (
+    User, Incident, Complaint, ChatMessage, ChatReadMark, IncidentTombstone,
+    INCIDENT_STREAM, bump_version, record_incident_deletions,
+)
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, keyset_page, split_page
+import geo
+import changes
+import chat as chat_store
+import incident_events
+import locations
+import tracks
+import storage
+import summary
+import response_cache
+import serialization
+import profiling
+import logs
+from response_cache import COMPLAINTS_TAG, INCIDENTS_TAG, incident_tag
+from conditional import check_etag, make_etag
 from schemas import IncidentUpdate
 import schemas
-from passlib.context import CryptContext
-
-
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
-
-def hash_password(password: str):
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+import passwords
+import auth
+from auth import Principal, current_principal, require_admin
+from starlette.concurrency import run_in_threadpool
 
 
-router = APIRouter(prefix="/users", tags=["Users"])
+router = APIRouter(prefix="/users", tags=["Users"], route_class=profiling.ProfiledRoute)
+log = logging.getLogger(__name__)
 
 
 @router.post("/signup")
-def signup(
+async def signup(
+    background_tasks: BackgroundTasks,
     username: str = Form(...),
     Mobile: str = Form(...),
     email: str = Form(...),
@@ -53,108 +70,105 @@ def signup(
                 status_code=400, detail="User should not provide address"
             )
 
-    image_path = None
+    # hash first: a 503 from a busy hash pool shouldn't leave a spooled upload behind.
+    # Awaited like login's verify, so no worker thread waits on the hash pool
+    hashed_password = await passwords.hash_password_async(password)
+    return await run_in_threadpool(
+        _create_user, background_tasks, db, username, Mobile, email, role,
+        hashed_password, image if is_file else None, address,
+    )
+
+
+def _create_user(background_tasks, db, username, mobile, email, role, hashed_password, image, address):
+    """Spool the upload and insert the user (blocking I/O, runs on the threadpool)."""
+    pending_upload = None
 
-    if role == "volunteer" and is_file:
+    if role == "volunteer" and image is not None:
         if image.content_type != "application/pdf":
             raise HTTPException(
                 status_code=400, detail="Only PDF files are allowed for Aadhar card"
             )
 
-        # PRO-LEVEL: Clean the filename
-        original_name = image.filename
-        clean_name = "".join(
-            c if c.isalnum() or c in "._-" else "_" for c in original_name
-        )
-        file_name = f"profile_{email}_{clean_name}"
-
-        if supabase_client:
-            # Upload to Supabase Storage
-            try:
-                # Ensure we are at the start of the file
-                image.file.seek(0)
-                file_content = image.file.read()
-                
-                # Upload to 'safetracker' bucket
-                supabase_client.storage.from_("safetracker").upload(
-                    path=file_name,
-                    file=file_content,
-                    file_options={"content-type": image.content_type, "upsert": "true"},
-                )
-                
-                # Get public URL
-                image_path = supabase_client.storage.from_(
-                    "safetracker"
-                ).get_public_url(file_name)
-                
-            except Exception as e:
-                print(f"Supabase upload error: {e}")
-                # ONLY fallback to local if NOT on Vercel
-                if os.environ.get("VERCEL"):
-                    raise HTTPException(
-                        status_code=500, 
-                        detail=f"Deployment Storage Error: Could not upload to Supabase. Reason: {str(e)}"
-                    )
-                
-                # Local dev fallback
-                try:
-                    os.makedirs("uploads", exist_ok=True)
-                    image_path = f"uploads/{clean_name}"
-                    with open(image_path, "wb") as buffer:
-                        image.file.seek(0)
-                        shutil.copyfileobj(image.file, buffer)
-                except Exception as local_e:
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Local Storage Error: {str(local_e)}"
-                    )
-        else:
-            # No Supabase configured
-            if os.environ.get("VERCEL"):
-                 raise HTTPException(status_code=500, detail="Cloud Storage (Supabase) not configured on Vercel.")
-            
-            os.makedirs("uploads", exist_ok=True)
-            image_path = f"uploads/{clean_name}"
-            with open(image_path, "wb") as buffer:
-                image.file.seek(0)
-                shutil.copyfileobj(image.file, buffer)
-
-    from sqlalchemy.exc import IntegrityError
+        # Only spooled here (chunked, size-capped, hashed); stored under its
+        # sha256, and the transfer to storage runs after the response
+        pending_upload = storage.receive(image)
 
     user = User(
         username=username,
-        mobile=Mobile,
+        mobile=mobile,
         email=email,
         role=role,
-        password=hash_password(password),
-        profile_image=image_path,
+        password=hashed_password,
+        profile_image=None,
         address=address,
         is_approved=(role != "volunteer"),  # Volunteers need admin approval
     )
 
     try:
+        if pending_upload:
+            # same transaction as the user: a failed signup takes no reference
+            user.profile_image = storage.acquire(db, pending_upload)
         db.add(user)
         db.commit()
         db.refresh(user)
     except IntegrityError:
         db.rollback()
+        if pending_upload:
+            pending_upload.discard()
         raise HTTPException(status_code=400, detail="Username or email already exists")
-    except Exception as e:
+    except Exception:
         db.rollback()
-        print(f"DEBUG Signup Error: {e}")
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+        if pending_upload:
+            pending_upload.discard()
+        log.exception("signup failed", extra={"username": username})
+        raise HTTPException(status_code=500, detail="Internal Server Error")
 
-    return {
+    if pending_upload and pending_upload.needs_transfer:
+        background_tasks.add_task(_store_document, pending_upload, user.id)
+    elif pending_upload:
+        pending_upload.discard()  # identical document already stored
+
+    result = {
         "message": "Signup successful",
         "user_id": user.id,
         "role": user.role,
         "user": schemas.UserResponse.model_validate(user),
     }
+    if user.is_approved:
+        # approved accounts are logged in straight away
+        result.update(_token_for(user.id, user.role))
+    return result
+
+
+def _store_document(pending_upload, user_id: int):
+    url = storage.transfer(pending_upload)
+    log.info("stored document", extra={
+        "user_id": user_id, "bytes": pending_upload.size, "sha256": pending_upload.sha256[:12], "url": url,
+    })
+    if url == pending_upload.url:
+        return
+    # fell back to local storage, or failed: don't leave a dead link on the user
+    db = SessionLocal()
+    try:
+        db.query(User).filter(User.id == user_id).update({"profile_image": url})
+        orphan = storage.release(db, pending_upload.url) if url is None else None
+        db.commit()
+    finally:
+        db.close()
+    if orphan:
+        storage.collect(orphan)
+
+
+def _token_for(user_id: int, role: str) -> dict:
+    if not auth.tokens_enabled():
+        return {}  # no shared signing key: the client stays on legacy requests
+    token = schemas.Token(access_token=auth.create_access_token(user_id, role), token_type="bearer")
+    return token.model_dump()
 
 
 
 @router.post("/login")
-def login(
+async def login(
     username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)
 ):
     # HARDCODED SUPERADMIN LOGIN
@@ -171,14 +185,15 @@ def login(
                 "is_approved": True,
                 "profile_image": None
             },
+            **_token_for(auth.SUPERADMIN_ID, "admin"),
         }
 
-    user = (
-        db.query(User)
-        .filter(User.username == username)
-        .first()
+    # async route: DB work goes to the threadpool, hashing to passwords' own pool,
+    # so a login burst never ties up the worker threads other endpoints need
+    user = await run_in_threadpool(
+        lambda: db.query(User).filter(User.username == username).first()
     )
-    if not user or not verify_password(password, user.password):
+    if not user or not await passwords.verify_password_async(password, user.password):
         raise HTTPException(status_code=400, detail="User or volunteer not found. Please sign up first.")
 
     # Prevent accidental admin role from database if not using superadmin credentials
@@ -191,9 +206,26 @@ def login(
             detail="Your account is pending admin approval. Please check back later.",
         )
 
+    user_data = schemas.UserResponse.model_validate(user)
+
+    # stored hash predates the current PASSWORD_HASH_ROUNDS: upgrade it transparently
+    if passwords.needs_update(user.password):
+        new_hash = await passwords.hash_password_async(password)
+        user_id = user.id
+
+        def save_rehash():
+            db.query(User).filter(User.id == user_id).update({"password": new_hash})
+            db.commit()
+
+        try:
+            await run_in_threadpool(save_rehash)
+        except Exception:
+            log.exception("password rehash failed", extra={"user_id": user_id})
+
     return {
         "message": "Login successful",
-        "user": schemas.UserResponse.model_validate(user),
+        "user": user_data,
+        **_token_for(user_data.id, user_data.role),
     }
 
 
@@ -201,9 +233,13 @@ def login(
 
 
 @router.post("/incidents", response_model=schemas.IncidentResponse)
-def create_incident(incident: schemas.IncidentCreate, db: Session = Depends(get_db)):
+def create_incident(
+    incident: schemas.IncidentCreate,
+    principal: Optional[Principal] = Depends(current_principal),
+    db: Session = Depends(get_db),
+):
+    auth.ensure_self(principal, incident.reporter_id)
     payload_data = incident.model_dump()
-    print(f"DEBUG BACKEND: POST /incidents triggered. Payload: {payload_data}")
     try:
         # Explicitly map fields to avoid any Pydantic/SQLAlchemy mismatch
         new_incident = Incident(
@@ -217,11 +253,11 @@ def create_incident(incident: schemas.IncidentCreate, db: Session = Depends(get_
         db.add(new_incident)
         db.commit()
         db.refresh(new_incident)
-        print(f"DEBUG BACKEND: Incident SAVED. ID: {new_incident.id}, Reporter: {new_incident.reporter_id}, Status: {new_incident.status}")
-        
-        # Verify immediately if it's visible for this user
-        db_count = db.query(Incident).filter(Incident.reporter_id == new_incident.reporter_id).count()
-        print(f"DEBUG BACKEND: After save, user {new_incident.reporter_id} now has {db_count} incidents in DB")
+        log.info("incident created", extra={
+            "incident_id": new_incident.id, "reporter_id": new_incident.reporter_id,
+        })
+        response_cache.invalidate(INCIDENTS_TAG)
+        incident_events.emit(incident_events.event_for(new_incident, "created"))
 
         return schemas.IncidentResponse(
             id=new_incident.id,
@@ -237,47 +273,81 @@ def create_incident(incident: schemas.IncidentCreate, db: Session = Depends(get_
             volunteer_name="Waiting...",
             unread_count=0
         )
-    except Exception as e:
-        print(f"DEBUG BACKEND ERROR during creation: {e}")
+    except Exception:
+        log.exception("incident create failed", extra={"reporter_id": incident.reporter_id})
         db.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
 @router.get("/incident/me/{incident_id}", response_model=schemas.IncidentStatusResponse)
-def get_incident_status(incident_id: int, db: Session = Depends(get_db)):
-    incident = db.query(Incident).filter(Incident.id == incident_id).first()
+def get_incident_status(
+    incident_id: int,
+    request: Request,
+    _: Optional[Principal] = Depends(current_principal),
+    db: Session = Depends(get_db),
+):
+    key = response_cache.key_for(request)
+    cached = response_cache.cache.get(key)
+    if cached:
+        return cached.respond(request)
+    epoch = response_cache.cache.epoch
+
+    incident = (
+        db.query(Incident.id, Incident.title, Incident.full_address, Incident.latitude,
+                 Incident.longitude, Incident.created_at, Incident.status)
+        .filter(Incident.id == incident_id)
+        .first()
+    )
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
-    return incident
+    latitude, longitude = locations.buffer.position(incident)
+    body = serialization.dumps({
+        "id": incident.id,
+        "title": incident.title,
+        "full_address": incident.full_address,
+        "latitude": latitude,
+        "longitude": longitude,
+        "created_at": incident.created_at,
+        "status": incident.status,
+    })
+    return response_cache.cache.put(key, body, [incident_tag(incident_id)], epoch).respond(request)
 
 
 @router.delete("/incidents/{incident_id}")
 def delete_incident(
-    incident_id: int, user_id: int = Query(...), db: Session = Depends(get_db)
+    incident_id: int,
+    user_id: int = Query(...),
+    principal: Optional[Principal] = Depends(current_principal),
+    db: Session = Depends(get_db),
 ):
-    print(f"DEBUG BACKEND: DELETE /incidents/{incident_id} called by user {user_id}")
+    auth.ensure_self(principal, user_id)
     # Validate user ownership
     incident = db.query(Incident).filter(Incident.id == incident_id).first()
     if not incident:
-        print(f"DEBUG BACKEND: Incident {incident_id} not found")
         raise HTTPException(status_code=404, detail="Incident not found")
 
     # Ensure only the reporter can delete
     if incident.reporter_id != user_id:
-        print(f"DEBUG BACKEND: Unauthorized delete attempt. Incident reporter: {incident.reporter_id}, requester: {user_id}")
+        log.warning("incident delete refused", extra={
+            "incident_id": incident_id, "reporter_id": incident.reporter_id, "user_id": user_id,
+        })
         raise HTTPException(
             status_code=403, detail="Not authorized to delete this incident"
         )
 
     try:
+        event = incident_events.event_for(incident, "deleted")
         db.delete(incident)
         db.commit()
-        print(f"DEBUG BACKEND: Incident {incident_id} successfully deleted")
+        locations.buffer.forget(incident_id)
+        response_cache.invalidate(INCIDENTS_TAG, incident_tag(incident_id))
+        log.info("incident deleted", extra={"incident_id": incident_id, "user_id": user_id})
+        incident_events.emit(event)
         return {"message": "Incident deleted"}
-    except Exception as e:
+    except Exception:
         db.rollback()
-        print(f"DEBUG BACKEND ERROR during deletion: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        log.exception("incident delete failed", extra={"incident_id": incident_id})
+        raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
 @router.put("/incidents/{incident_id}", response_model=schemas.IncidentResponse)
@@ -285,8 +355,10 @@ def update_incident(
     incident_id: int,
     incident_update: IncidentUpdate,
     user_id: int = Query(...),
+    principal: Optional[Principal] = Depends(current_principal),
     db: Session = Depends(get_db),
 ):
+    auth.ensure_self(principal, user_id)
     incident = db.query(Incident).filter(Incident.id == incident_id).first()
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
@@ -306,10 +378,15 @@ def update_incident(
         incident.longitude = incident_update.longitude
 
     db.commit()
+    if incident_update.latitude is not None or incident_update.longitude is not None:
+        # an explicit edit wins over any buffered GPS fix
+        locations.buffer.forget(incident_id)
+    response_cache.invalidate(INCIDENTS_TAG, incident_tag(incident_id))
     db.refresh(incident)
 
     # Manual mapping for response model
     res = schemas.IncidentResponse.model_validate(incident)
+    res.latitude, res.longitude = locations.buffer.position(incident)
     res.reporter_name = incident.reporter.username if incident.reporter else "Unknown"
     res.volunteer_name = (
         incident.volunteer.username if incident.volunteer else "Waiting..."
@@ -317,108 +394,261 @@ def update_incident(
     return res
 
 
+# only what IncidentResponse needs (geohash for the nearby filter lives in SQL)
+INCIDENT_LISTING_COLUMNS = (
+    Incident.id,
+    Incident.title,
+    Incident.full_address,
+    Incident.latitude,
+    Incident.longitude,
+    Incident.status,
+    Incident.created_at,
+    Incident.reporter_id,
+    Incident.volunteer_id,
+)
+
+
+def _incident_listing_query(db: Session, user_id: Optional[int] = None):
+    """Incidents joined with reporter/volunteer names and (optionally) unread counts.
+
+    Rows are plain column tuples (INCIDENT_LISTING_COLUMNS plus reporter_name,
+    volunteer_name, unread_count), so a listing costs a single round trip and
+    no ORM objects, regardless of how many incidents exist.
+    """
+    Reporter = aliased(User)
+    Volunteer = aliased(User)
+
+    if user_id:
+        # messages past the user's read watermark, counted per listed row
+        mark = aliased(ChatReadMark)
+        unread_col = chat_store.unread_count_column(user_id, Incident.id, mark)
+    else:
+        mark = None
+        unread_col = literal(0)
+
+    query = (
+        db.query(
+            *INCIDENT_LISTING_COLUMNS,
+            Reporter.username.label("reporter_name"),
+            Volunteer.username.label("volunteer_name"),
+            unread_col.label("unread_count"),
+        )
+        .outerjoin(Reporter, Incident.reporter_id == Reporter.id)
+        .outerjoin(Volunteer, Incident.volunteer_id == Volunteer.id)
+    )
+    if mark is not None:
+        query = query.outerjoin(
+            mark, and_(mark.incident_id == Incident.id, mark.user_id == user_id)
+        )
+    return query
+
+
+def _incident_response(row) -> dict:
+    """schemas.IncidentResponse as a plain dict (same fields, same order)."""
+    # live GPS fixes may still be buffered; serve the freshest position
+    latitude, longitude = locations.buffer.position(row)
+    return {
+        "title": row.title,
+        "full_address": row.full_address,
+        "latitude": latitude,
+        "longitude": longitude,
+        "id": row.id,
+        "status": row.status,
+        "created_at": row.created_at,
+        "reporter_id": row.reporter_id,
+        "volunteer_id": row.volunteer_id,
+        "reporter_name": row.reporter_name or "Unknown",
+        "volunteer_name": row.volunteer_name or "Waiting...",
+        "unread_count": row.unread_count or 0,
+    }
+
+
+def _incident_row_key(row):
+    return row.created_at, row.id
+
+
+def _participants(db: Session, incident_id: int):
+    """(reporter_id, volunteer_id) of an incident; 404 if it doesn't exist."""
+    row = db.query(Incident.reporter_id, Incident.volunteer_id).filter(Incident.id == incident_id).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Incident not found")
+    return tuple(row)
+
+
 @router.get("/incidents")
-def get_incidents(user_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
+def get_incidents(
+    request: Request,
+    response: Response,
+    user_id: Optional[int] = Query(None),
+    status: Optional[str] = Query(None),
+    reporter_id: Optional[int] = Query(None),
+    volunteer_id: Optional[int] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    principal: Optional[Principal] = Depends(current_principal),
+    db: Session = Depends(get_db),
+):
+    auth.ensure_self(principal, user_id)
+    # Any incident or chat change moves the stream heads, so they version the whole listing;
+    # buffered GPS fixes are overlaid on top and move the buffer generation instead
+    not_modified = check_etag(request, response, make_etag(
+        request, *changes.head_cache.refresh(db), locations.buffer.generation,
+    ))
+    if not_modified:
+        return not_modified
+
     try:
-        incidents = db.query(Incident).order_by(Incident.created_at.desc()).all()
-        print(f"DEBUG: Found {len(incidents)} total incidents in DB")
-        response = []
-        for inc in incidents:
-            try:
-                unread_count = 0
-                if user_id:
-                    try:
-                        unread_count = (
-                            db.query(ChatMessage)
-                            .filter(
-                                ChatMessage.incident_id == inc.id,
-                                ChatMessage.sender_id != user_id,
-                                (ChatMessage.is_read.is_(False)) | (ChatMessage.is_read.is_(None)),
-                            )
-                            .count()
-                        )
-                    except Exception as e:
-                        print(f"Unread count error: {e}")
-
-                inc_data = schemas.IncidentResponse.model_validate(inc)
-                inc_data.reporter_name = (
-                    inc.reporter.username if inc.reporter else "Unknown"
-                )
-                inc_data.volunteer_name = (
-                    inc.volunteer.username if inc.volunteer else "Waiting..."
-                )
-                inc_data.unread_count = unread_count
-                response.append(inc_data)
-            except Exception as inner_e:
-                print(
-                    f"DEBUG Error processing incident #{getattr(inc, 'id', '?')}: {inner_e}"
-                )
-        return response
-    except Exception as e:
-        print(f"DEBUG Error in GET /incidents: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        query = _incident_listing_query(db, user_id)
+        if status:
+            query = query.filter(Incident.status.in_(status.split(",")))
+        if reporter_id is not None:
+            query = query.filter(Incident.reporter_id == reporter_id)
+        if volunteer_id is not None:
+            query = query.filter(Incident.volunteer_id == volunteer_id)
+
+        rows = keyset_page(query, Incident.created_at, Incident.id, cursor, limit).all()
+        rows, _ = split_page(rows, limit, _incident_row_key, response)
+        log.debug("listed %d incidents", len(rows))
+        return serialization.respond([_incident_response(row) for row in rows], response)
+    except HTTPException:
+        raise
+    except Exception:
+        log.exception("incident listing failed")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
 @router.get("/incidents/user/{user_id}", response_model=List[schemas.IncidentResponse])
-def get_user_incidents(user_id: int, db: Session = Depends(get_db)):
-    print(f"DEBUG BACKEND: Fetching incidents for user_id={user_id} (Type: {type(user_id)})")
+def get_user_incidents(
+    user_id: int,
+    request: Request,
+    response: Response,
+    status: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    principal: Optional[Principal] = Depends(current_principal),
+    db: Session = Depends(get_db),
+):
+    auth.ensure_self(principal, user_id)
+    not_modified = check_etag(request, response, make_etag(
+        request, *changes.head_cache.refresh(db), locations.buffer.generation,
+    ))
+    if not_modified:
+        return not_modified
+
     try:
-        # Check if user exists
-        user_obj = db.query(User).filter(User.id == user_id).first()
-        if not user_obj:
-            print(f"DEBUG BACKEND: User {user_id} NOT FOUND in database.")
-            # Fallback: try filtering directly just in case user table is weirdly indexed
-            incidents = db.query(Incident).filter(Incident.reporter_id == user_id).order_by(Incident.created_at.desc()).all()
-        else:
-            print(f"DEBUG BACKEND: User {user_obj.username} found. Fetching their incidents...")
-            incidents = db.query(Incident).filter(Incident.reporter_id == user_id).order_by(Incident.created_at.desc()).all()
-        
-        print(f"DEBUG BACKEND: Query returned {len(incidents)} incidents for user {user_id}")
-        
-        response_list = []
-        for inc in incidents:
-            try:
-                unread_count = 0
-                try:
-                    unread_count = (
-                        db.query(ChatMessage)
-                        .filter(
-                            ChatMessage.incident_id == inc.id,
-                            ChatMessage.sender_id != user_id,
-                            (ChatMessage.is_read.is_(False)) | (ChatMessage.is_read.is_(None)),
-                        )
-                        .count()
-                    )
-                except Exception as e:
-                    print(f"Unread count error for inc {inc.id}: {e}")
-
-                # Manual mapping to ensure stability
-                inc_data = schemas.IncidentResponse(
-                    id=inc.id,
-                    title=inc.title,
-                    full_address=inc.full_address,
-                    latitude=inc.latitude,
-                    longitude=inc.longitude,
-                    status=inc.status,
-                    created_at=inc.created_at,
-                    reporter_id=inc.reporter_id,
-                    volunteer_id=inc.volunteer_id,
-                    reporter_name=inc.reporter.username if inc.reporter else "Unknown",
-                    volunteer_name=inc.volunteer.username if inc.volunteer else "Waiting...",
-                    unread_count=unread_count
-                )
-                response_list.append(inc_data)
-            except Exception as inner_e:
-                print(f"DEBUG BACKEND ERROR processing incident {getattr(inc, 'id', '?')}: {inner_e}")
-                
-        return response_list
-    except Exception as e:
-        print(f"DEBUG BACKEND CRITICAL ERROR in GET /incidents/user/{user_id}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        query = _incident_listing_query(db, user_id).filter(Incident.reporter_id == user_id)
+        if status:
+            query = query.filter(Incident.status.in_(status.split(",")))
+
+        rows = keyset_page(query, Incident.created_at, Incident.id, cursor, limit).all()
+        rows, _ = split_page(rows, limit, _incident_row_key, response)
+        log.debug("listed %d incidents for user %s", len(rows), user_id)
+        return serialization.respond([_incident_response(row) for row in rows], response)
+    except HTTPException:
+        raise
+    except Exception:
+        log.exception("user incident listing failed", extra={"user_id": user_id})
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+@router.get("/incidents/changes", response_model=schemas.IncidentChangesResponse)
+def get_incident_changes(
+    since: Optional[str] = Query(None),
+    user_id: Optional[int] = Query(None),
+    reporter_id: Optional[int] = Query(None),
+    principal: Optional[Principal] = Depends(current_principal),
+    db: Session = Depends(get_db),
+):
+    """Incidents changed (or whose chat changed) and deleted since `since`.
+
+    Without `since` only the current token is returned; clients should take
+    it before their initial full load and then poll with it.
+    """
+    auth.ensure_self(principal, user_id)
+    cached = changes.head_cache.peek()
+    if since is None:
+        heads = cached or changes.head_cache.refresh(db)
+        return {"token": changes.encode_token(*heads)}
+
+    since_incidents, since_chat = changes.decode_token(since)
+    # Idle poll: nothing new according to this worker's recent view of the heads
+    if cached is not None and (since_incidents, since_chat) == cached:
+        return {"token": since}
+
+    heads = changes.head_cache.refresh(db)
+    if since_incidents >= heads[0] and since_chat >= heads[1]:
+        return {"token": changes.encode_token(*heads)}
+
+    # new messages, or a read watermark moving (unread counts change)
+    chat_changed = (
+        db.query(ChatMessage.incident_id)
+        .filter(ChatMessage.version > since_chat)
+        .union(db.query(ChatReadMark.incident_id).filter(ChatReadMark.version > since_chat))
+    )
+    query = _incident_listing_query(db, user_id).filter(
+        or_(Incident.version > since_incidents, Incident.id.in_(chat_changed))
+    )
+    if reporter_id is not None:
+        query = query.filter(Incident.reporter_id == reporter_id)
+
+    deleted = [
+        incident_id
+        for (incident_id,) in db.query(IncidentTombstone.incident_id)
+        .filter(IncidentTombstone.version > since_incidents)
+        .distinct()
+    ]
+    return serialization.respond({
+        "token": changes.encode_token(*heads),
+        "changed": [_incident_response(row) for row in query.all()],
+        "deleted": deleted,
+    })
+
+
+OPEN_STATUSES = ("reported", "pending")
+
+
+@router.get("/incidents/nearby", response_model=List[schemas.NearbyIncidentResponse])
+def get_nearby_incidents(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(10.0, gt=0, le=500),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    user_id: Optional[int] = Query(None),
+    principal: Optional[Principal] = Depends(current_principal),
+    db: Session = Depends(get_db),
+):
+    auth.ensure_self(principal, user_id)
+    # Prefix scans on the geohash index narrow the search to the 3x3 block of
+    # cells around the point; exact distances are only computed for those rows.
+    cells = geo.covering_cells(lat, lng, radius_km)
+    rows = (
+        _incident_listing_query(db, user_id)
+        .filter(
+            Incident.status.in_(OPEN_STATUSES),
+            Incident.volunteer_id.is_(None),
+            or_(*[Incident.geohash.like(f"{cell}%") for cell in cells]),
+        )
+        .all()
+    )
+
+    ranked = geo.rank_by_distance(
+        rows, lat, lng, radius_km, limit,
+        position=locations.buffer.position,
+    )
+    return serialization.respond([
+        {**_incident_response(row), "distance_km": round(distance, 3)} for row, distance in ranked
+    ])
 
 
 @router.put("/incidents/{incident_id}/accept")
-def accept_incident(incident_id: int, volunteer_id: int, db: Session = Depends(get_db)):
+def accept_incident(
+    incident_id: int,
+    volunteer_id: int,
+    principal: Optional[Principal] = Depends(current_principal),
+    db: Session = Depends(get_db),
+):
+    auth.ensure_self(principal, volunteer_id)
+    auth.ensure_approved_volunteer(principal)
     incident = db.query(Incident).filter(Incident.id == incident_id).first()
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
@@ -426,52 +656,144 @@ def accept_incident(incident_id: int, volunteer_id: int, db: Session = Depends(g
         raise HTTPException(status_code=400, detail="Incident already assigned")
     incident.volunteer_id = volunteer_id
     incident.status = "in_progress"
+    event = incident_events.event_for(incident, "accepted")
     db.commit()
+    response_cache.invalidate(INCIDENTS_TAG, incident_tag(incident_id))
+    incident_events.emit(event)
     return {"message": "Incident accepted and started"}
 
 
 @router.put("/incidents/{incident_id}/start")
-def start_incident(incident_id: int, db: Session = Depends(get_db)):
+def start_incident(
+    incident_id: int,
+    principal: Optional[Principal] = Depends(current_principal),
+    db: Session = Depends(get_db),
+):
     incident = db.query(Incident).filter(Incident.id == incident_id).first()
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
+    auth.ensure_one_of(principal, [incident.volunteer_id], "Only the assigned volunteer can start this incident")
     incident.status = "in_progress"
+    event = incident_events.event_for(incident, "started")
     db.commit()
+    response_cache.invalidate(INCIDENTS_TAG, incident_tag(incident_id))
+    incident_events.emit(event)
     return {"message": "Incident started"}
 
 
+# Live location: fixes are buffered (latest per incident) and written in bulk
+# by locations.buffer, so these routes never hold a DB transaction.
+# Where it writes inline instead (Vercel), a failed write is a 503 to retry.
+# Only an incident's reporter sends its position.
+def _store_fixes(fixes):
+    try:
+        locations.buffer.put(fixes)
+    except Exception:
+        log.exception("live location write failed", extra={"fixes": len(fixes)})
+        raise HTTPException(
+            status_code=503, detail="Location not saved, please retry", headers={"Retry-After": "1"}
+        )
+
+
 @router.put("/incidents/{incident_id}/live-location")
 def update_live_location(
-    incident_id: int, lat: float, lng: float, db: Session = Depends(get_db)
+    incident_id: int,
+    lat: float,
+    lng: float,
+    principal: Optional[Principal] = Depends(current_principal),
 ):
-    incident = db.query(Incident).filter(Incident.id == incident_id).first()
-    if not incident:
+    reporters = locations.buffer.reporters([incident_id])
+    if incident_id not in reporters:
         raise HTTPException(status_code=404, detail="Incident not found")
-    incident.latitude = lat
-    incident.longitude = lng
-    db.commit()
+    auth.ensure_one_of(principal, [reporters[incident_id]], "Only the reporter can share this location")
+    _store_fixes({incident_id: (lat, lng)})
+    if logs.sampled("live_location"):
+        log.info("live location", extra={"incident_id": incident_id, "sample_every": logs.sampled.every})
     return {"message": "Live location updated", "lat": lat, "lng": lng}
 
 
+@router.post("/live-locations")
+def update_live_locations(
+    batch: schemas.LiveLocationBatch,
+    principal: Optional[Principal] = Depends(current_principal),
+):
+    fixes = {fix.incident_id: (fix.lat, fix.lng) for fix in batch.fixes}
+    reporters = locations.buffer.reporters(fixes)
+    for reporter_id in set(reporters.values()):
+        auth.ensure_one_of(principal, [reporter_id], "Only the reporter can share this location")
+    accepted = set(reporters)
+    _store_fixes({i: fixes[i] for i in accepted})
+    if logs.sampled("live_location_batch"):
+        log.info("live location batch", extra={
+            "accepted": len(accepted), "unknown": len(fixes) - len(accepted),
+            "sample_every": logs.sampled.every,
+        })
+    return {"accepted": sorted(accepted), "unknown": sorted(set(fixes) - accepted)}
+
+
+@router.get("/incidents/{incident_id}/track", response_model=schemas.TrackResponse)
+def get_incident_track(
+    incident_id: int,
+    since: Optional[datetime] = Query(None),
+    tolerance_m: float = Query(tracks.DEFAULT_TOLERANCE_M, ge=0, le=10_000),
+    max_points: int = Query(1000, ge=2, le=10_000),
+    principal: Optional[Principal] = Depends(current_principal),
+    db: Session = Depends(get_db),
+):
+    incident = _participants(db, incident_id)
+    auth.ensure_one_of(principal, incident)
+
+    since_ts = tracks.to_epoch(since) if since else None
+    points = tracks.load_track(db, incident_id, since_ts)
+    # fixes still waiting in the buffer are part of the trail too
+    points.extend(p for p in locations.buffer.unflushed_track(incident_id)
+                  if since_ts is None or p[0] >= since_ts)
+
+    simplified = tracks.downsample(points, tolerance_m, max_points)
+    return schemas.TrackResponse(
+        incident_id=incident_id,
+        total_points=len(points),
+        points=[
+            schemas.TrackPoint(t=datetime.fromtimestamp(t, timezone.utc), lat=lat, lng=lng)
+            for t, lat, lng in simplified
+        ],
+    )
+
+
 @router.put("/incidents/{incident_id}/complete")
-def complete_incident(incident_id: int, db: Session = Depends(get_db)):
+def complete_incident(
+    incident_id: int,
+    principal: Optional[Principal] = Depends(current_principal),
+    db: Session = Depends(get_db),
+):
     incident = db.query(Incident).filter(Incident.id == incident_id).first()
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
+    auth.ensure_one_of(principal, [incident.volunteer_id], "Only the assigned volunteer can complete this incident")
 
     # Change status to 'awaiting_confirmation'
     incident.status = "awaiting_confirmation"
+    event = incident_events.event_for(incident, "completed")
     db.commit()
+    response_cache.invalidate(INCIDENTS_TAG, incident_tag(incident_id))
+    incident_events.emit(event)
 
     return {"message": "Incident marked as completed, awaiting user confirmation"}
 
 
 @router.put("/incidents/{incident_id}/confirm")
-def confirm_incident(incident_id: int, confirmed: bool, db: Session = Depends(get_db)):
+def confirm_incident(
+    incident_id: int,
+    confirmed: bool,
+    principal: Optional[Principal] = Depends(current_principal),
+    db: Session = Depends(get_db),
+):
     incident = db.query(Incident).filter(Incident.id == incident_id).first()
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
+    auth.ensure_one_of(principal, [incident.reporter_id], "Only the reporter can confirm this incident")
 
+    previous_volunteer_id = incident.volunteer_id
     if confirmed:
         incident.status = "closed"
     else:
@@ -479,53 +801,181 @@ def confirm_incident(incident_id: int, confirmed: bool, db: Session = Depends(ge
         incident.status = "pending"
         incident.volunteer_id = None
 
+    # built before commit so the response doesn't need a refresh query
+    event = incident_events.event_for(
+        incident, "confirmed" if confirmed else "reopened", previous_volunteer_id
+    )
     db.commit()
-    return {"message": "Response recorded", "status": incident.status}
+    response_cache.invalidate(INCIDENTS_TAG, incident_tag(incident_id))
+    incident_events.emit(event)
+    return {"message": "Response recorded", "status": event["status"]}
 
 
 # Removed verify_incident_email endpoint as it is unused without SMTP configuration.
 
 
 @router.get("/available-incidents", response_model=List[schemas.IncidentResponse])
-def get_available_incidents(db: Session = Depends(get_db)):
+def get_available_incidents(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    _: Optional[Principal] = Depends(current_principal),
+    db: Session = Depends(get_db),
+):
+    # Every volunteer dashboard polls this; serve it from the response cache
+    key = response_cache.key_for(request)
+    cached = response_cache.cache.get(key)
+    if cached:
+        return cached.respond(request)
+    epoch = response_cache.cache.epoch
+
     # Return only reported incidents for volunteers
-    incidents = db.query(Incident).filter(Incident.status == "reported").order_by(Incident.created_at.desc()).all()
-    response = []
-    for inc in incidents:
-        inc_data = schemas.IncidentResponse.model_validate(inc)
-        inc_data.reporter_name = inc.reporter.username if inc.reporter else "Unknown"
-        inc_data.volunteer_name = "Waiting..."
-        response.append(inc_data)
-    return response
+    query = _incident_listing_query(db).filter(Incident.status == "reported")
+    rows = keyset_page(query, Incident.created_at, Incident.id, cursor, limit).all()
+    rows, next_cursor = split_page(rows, limit, _incident_row_key, response)
+    items = [_incident_response(row) for row in rows]
+
+    body = serialization.dumps(items)
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    # tagged per incident too, so a moved position drops only pages showing it
+    tags = [INCIDENTS_TAG, *(incident_tag(item["id"]) for item in items)]
+    return response_cache.cache.put(key, body, tags, epoch, headers).respond(request)
 
 
 # --- Admin Endpoints ---
 
 
-@router.get("/users-raw")
-def get_all_users(db: Session = Depends(get_db)):
+@router.get("/users-raw", response_model=List[schemas.UserResponse])
+def get_all_users(
+    request: Request,
+    response: Response,
+    _: Principal = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    # Users are only ever inserted, approved or deleted
+    version = db.query(
+        func.count(User.id),
+        func.max(User.id),
+        func.sum(case((User.is_approved.is_(True), 1), else_=0)),
+    ).one()
+    not_modified = check_etag(request, response, make_etag(request, *version))
+    if not_modified:
+        return not_modified
     return db.query(User).all()
 
 
 @router.delete("/admin/user/{user_id}")
-def delete_user_admin(user_id: int, db: Session = Depends(get_db)):
+def delete_user_admin(
+    user_id: int,
+    background_tasks: BackgroundTasks,
+    _: Principal = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     # Optional: Delete associated incidents or set them to null
+    # (bulk statements skip mapper events, so record the changes explicitly)
+    reported_ids = [i for (i,) in db.query(Incident.id).filter(Incident.reporter_id == user_id)]
+    record_incident_deletions(db.connection(), reported_ids)
+    summary.adjust(db.connection(), summary.bulk_incident_deltas(
+        db.query(Incident.status, func.count()).filter(Incident.reporter_id == user_id).group_by(Incident.status)
+    ))
     db.query(Incident).filter(Incident.reporter_id == user_id).delete()
+    summary.adjust(db.connection(), summary.bulk_incident_deltas(
+        db.query(Incident.status, func.count()).filter(Incident.volunteer_id == user_id).group_by(Incident.status),
+        new_status="reported",
+    ))
+    reassigned_ids = [i for (i,) in db.query(Incident.id).filter(Incident.volunteer_id == user_id)]
     db.query(Incident).filter(Incident.volunteer_id == user_id).update(
-        {"volunteer_id": None, "status": "reported"}
+        {
+            "volunteer_id": None,
+            "status": "reported",
+            "version": bump_version(db.connection(), INCIDENT_STREAM),
+        }
     )
+    changes.mark_heads_dirty(db)
+
+    # uploaded document: drop this user's reference, collect it if it was the last
+    orphan = storage.release(db, user.profile_image)
 
     db.delete(user)
     db.commit()
+    for incident_id in reported_ids:
+        locations.buffer.forget(incident_id)
+    response_cache.invalidate(
+        INCIDENTS_TAG, *(incident_tag(i) for i in (*reported_ids, *reassigned_ids))
+    )
+    if orphan:
+        background_tasks.add_task(storage.collect, orphan)
+    # outstanding tokens for this user stop working on their next request
+    auth.principal_cache.invalidate(user_id)
     return {"message": "User and their data removed successfully"}
 
 
+RECENT_ACTIVITY_LIMIT = 5
+
+
+@router.get("/admin/summary", response_model=schemas.AdminSummary)
+def get_admin_summary(
+    _: Principal = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    # Counts come from summary_counters (kept up to date on every write) and
+    # recent items from the newest primary keys: nothing here scans a table
+    counters = summary.read_counters(db)
+
+    def grouped(prefix):
+        return {name[len(prefix):]: value for name, value in counters.items()
+                if name.startswith(prefix) and value}
+
+    by_status = grouped("incidents.status.")
+    incidents_total = counters.get("incidents.total", 0)
+
+    recent_incidents = (
+        db.query(Incident.id, Incident.title, Incident.status, Incident.created_at)
+        .order_by(Incident.id.desc()).limit(RECENT_ACTIVITY_LIMIT).all()
+    )
+    recent_complaints = (
+        db.query(Complaint.id, Complaint.subject, Complaint.created_at)
+        .order_by(Complaint.id.desc()).limit(RECENT_ACTIVITY_LIMIT).all()
+    )
+    recent_signups = (
+        db.query(User.id, User.username, User.role)
+        .order_by(User.id.desc()).limit(RECENT_ACTIVITY_LIMIT).all()
+    )
+
+    return schemas.AdminSummary(
+        users=schemas.UserCounts(
+            total=counters.get("users.total", 0),
+            by_role=grouped("users.role."),
+            pending_volunteers=counters.get("users.pending_volunteers", 0),
+        ),
+        incidents=schemas.IncidentCounts(
+            total=incidents_total,
+            open=incidents_total - by_status.get("closed", 0),
+            by_status=by_status,
+        ),
+        complaints=schemas.ComplaintCounts(total=counters.get("complaints.total", 0)),
+        recent_activity=schemas.RecentActivity(
+            incidents=[schemas.RecentItem(id=i, label=t or "", status=st, created_at=c)
+                       for i, t, st, c in recent_incidents],
+            complaints=[schemas.RecentItem(id=i, label=sub or "", created_at=c)
+                        for i, sub, c in recent_complaints],
+            signups=[schemas.RecentItem(id=i, label=u or "", status=role)
+                     for i, u, role in recent_signups],
+        ),
+    )
+
+
 @router.put("/admin/approve/{user_id}")
-def approve_volunteer(user_id: int, db: Session = Depends(get_db)):
+def approve_volunteer(
+    user_id: int,
+    _: Principal = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -535,6 +985,7 @@ def approve_volunteer(user_id: int, db: Session = Depends(get_db)):
 
     user.is_approved = True
     db.commit()
+    auth.principal_cache.invalidate(user_id)
     return {"message": f"Volunteer {user.username} approved successfully"}
 
 
@@ -546,23 +997,57 @@ def create_complaint(complaint: schemas.ComplaintCreate, db: Session = Depends(g
     new_complaint = Complaint(**complaint.model_dump())
     db.add(new_complaint)
     db.commit()
+    response_cache.invalidate(COMPLAINTS_TAG)
     db.refresh(new_complaint)
     return new_complaint
 
 
 @router.get("/complaints", response_model=List[schemas.ComplaintResponse])
-def get_complaints(db: Session = Depends(get_db)):
-    return db.query(Complaint).order_by(Complaint.created_at.desc()).all()
+def get_complaints(
+    request: Request,
+    response: Response,
+    _: Principal = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    # a hit answers 304s too, from the ETag stored with the body
+    key = response_cache.key_for(request)
+    cached = response_cache.cache.get(key)
+    if cached:
+        return cached.respond(request)
+    epoch = response_cache.cache.epoch
+
+    # Complaints are immutable: count + max id changes on every insert/delete
+    version = db.query(func.count(Complaint.id), func.max(Complaint.id)).one()
+    etag = make_etag(request, *version)
+    not_modified = check_etag(request, response, etag)
+    if not_modified:
+        return not_modified
+    complaints = (
+        db.query(Complaint.name, Complaint.email, Complaint.subject, Complaint.message,
+                 Complaint.id, Complaint.created_at)
+        .order_by(Complaint.created_at.desc())
+        .all()
+    )
+
+    # rows are already in ComplaintResponse field order
+    body = serialization.dumps([row._asdict() for row in complaints])
+    headers = {"ETag": etag, "Cache-Control": response.headers["Cache-Control"]}
+    return response_cache.cache.put(key, body, [COMPLAINTS_TAG], epoch, headers).respond(request)
 
 
 @router.delete("/admin/complaint/{complaint_id}")
-def delete_complaint_admin(complaint_id: int, db: Session = Depends(get_db)):
+def delete_complaint_admin(
+    complaint_id: int,
+    _: Principal = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
     complaint = db.query(Complaint).filter(Complaint.id == complaint_id).first()
     if not complaint:
         raise HTTPException(status_code=404, detail="Complaint not found")
 
     db.delete(complaint)
     db.commit()
+    response_cache.invalidate(COMPLAINTS_TAG)
     return {"message": "Complaint removed successfully"}
 
 
@@ -570,28 +1055,81 @@ def delete_complaint_admin(complaint_id: int, db: Session = Depends(get_db)):
 @router.get(
     "/incidents/{incident_id}/chat", response_model=List[schemas.ChatMessageResponse]
 )
-def get_chat_messages(incident_id: int, db: Session = Depends(get_db)):
-    messages = (
-        db.query(ChatMessage)
+def get_chat_messages(
+    incident_id: int,
+    request: Request,
+    response: Response,
+    before: Optional[str] = Query(None),
+    after: Optional[str] = Query(None),
+    since: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    principal: Optional[Principal] = Depends(current_principal),
+    db: Session = Depends(get_db),
+):
+    if principal is not None:
+        auth.ensure_one_of(principal, _participants(db, incident_id))
+    # Every insert stamps a new chat version on the message, every read on the watermark;
+    # the settled chat head decides how far a ?since= poll may read
+    chat_head = changes.head_cache.refresh(db)[1]
+    version = (
+        db.query(func.count(ChatMessage.id), func.max(ChatMessage.version))
         .filter(ChatMessage.incident_id == incident_id)
-        .order_by(ChatMessage.timestamp.asc())
-        .all()
+        .one()
     )
+    mark_version = (
+        db.query(func.max(ChatReadMark.version)).filter(ChatReadMark.incident_id == incident_id).scalar()
+    )
+    not_modified = check_etag(request, response, make_etag(request, *version, mark_version, chat_head))
+    if not_modified:
+        return not_modified
 
-    response = []
-    for msg in messages:
-        m_data = schemas.ChatMessageResponse.model_validate(msg)
-        m_data.sender_name = msg.sender.username if msg.sender else "Unknown"
-        response.append(m_data)
-    return response
+    if since is not None:
+        rows, position = chat_store.poll_page(db, incident_id, since, chat_head, limit)
+        response.headers.update(chat_store.page_cursors(rows, False, after=None))
+    else:
+        # head taken before the page is read: anything past it is left to the polls
+        position = chat_store.encode_position(chat_head)
+        rows, has_more = chat_store.history_page(db, incident_id, before, after, limit)
+        response.headers.update(chat_store.page_cursors(rows, has_more, after))
+    response.headers[chat_store.SINCE_HEADER] = position
+
+    marks = chat_store.read_marks(db, incident_id)
+    return serialization.respond([
+        {
+            "message": msg.message,
+            "incident_id": msg.incident_id,
+            "sender_id": msg.sender_id,
+            "id": msg.id,
+            "timestamp": msg.timestamp,
+            "sender_name": msg.sender_name or "Unknown",
+            "is_read": chat_store.read_by_others(marks, msg),
+        }
+        for msg in rows
+    ], response)
 
 
 @router.post(
     "/incidents/{incident_id}/chat", response_model=schemas.ChatMessageResponse
 )
 def post_chat_message(
-    incident_id: int, chat: schemas.ChatMessageCreate, db: Session = Depends(get_db)
+    incident_id: int,
+    chat: schemas.ChatMessageCreate,
+    principal: Optional[Principal] = Depends(current_principal),
+    db: Session = Depends(get_db),
 ):
+    auth.ensure_self(principal, chat.sender_id)
+    if principal is not None:
+        auth.ensure_one_of(principal, _participants(db, incident_id))
+    if chat_store.batch_writer:
+        # group-commit path: blocks this worker thread until the batch is durable
+        sender_name = db.query(User.username).filter(User.id == chat.sender_id).scalar()
+        db.close()  # hand the connection back before waiting on the flush
+        payload = anyio.from_thread.run(
+            chat_store.batch_writer.submit,
+            incident_id, chat.sender_id, chat.message, sender_name or "Unknown",
+        )
+        return schemas.ChatMessageResponse(**payload)
+
     db_msg = ChatMessage(
         incident_id=incident_id,
         sender_id=chat.sender_id,
@@ -608,18 +1146,15 @@ def post_chat_message(
 
 @router.put("/incidents/{incident_id}/chat/read")
 def mark_chat_as_read(
-    incident_id: int, user_id: int = Query(...), db: Session = Depends(get_db)
+    incident_id: int,
+    user_id: int = Query(...),
+    up_to: Optional[str] = Query(None),
+    principal: Optional[Principal] = Depends(current_principal),
+    db: Session = Depends(get_db),
 ):
-    messages = (
-        db.query(ChatMessage)
-        .filter(
-            ChatMessage.incident_id == incident_id,
-            ChatMessage.sender_id != user_id,
-            ChatMessage.is_read.is_(False),
-        )
-        .all()
-    )
-    for msg in messages:
-        msg.is_read = True
-    db.commit()
+    auth.ensure_self(principal, user_id)
+    # One upsert of the (user, incident) watermark; no message rows are touched
+    if chat_store.mark_read(db, incident_id, user_id, up_to):
+        changes.mark_heads_dirty(db)
+        db.commit()
     return {"message": "Messages marked as read"}
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Dict, List, Optional
 from datetime import datetime
 
 
@@ -43,6 +43,28 @@ class IncidentUpdate(BaseModel):
     longitude: Optional[float] = None
 
 
+class LiveLocationFix(BaseModel):
+    incident_id: int
+    lat: float = Field(..., ge=-90, le=90)
+    lng: float = Field(..., ge=-180, le=180)
+
+
+class LiveLocationBatch(BaseModel):
+    fixes: List[LiveLocationFix] = Field(..., max_length=100)
+
+
+class TrackPoint(BaseModel):
+    t: datetime
+    lat: float
+    lng: float
+
+
+class TrackResponse(BaseModel):
+    incident_id: int
+    total_points: int  # before downsampling
+    points: List[TrackPoint] = []
+
+
 class IncidentResponse(IncidentBase):
     id: int
     status: str
@@ -54,6 +76,16 @@ class IncidentResponse(IncidentBase):
     unread_count: int = 0
 
 
+class NearbyIncidentResponse(IncidentResponse):
+    distance_km: float
+
+
+class IncidentChangesResponse(BaseModel):
+    token: str
+    changed: List[IncidentResponse] = []
+    deleted: List[int] = []
+
+
 class IncidentCreateResponse(BaseModel):
     id: int
     title: str
@@ -99,6 +131,11 @@ class ComplaintResponse(ComplaintCreate):
     created_at: datetime
 
 
+# Long enough for any chat line; keeps every broadcast well under the
+# 8000-byte Postgres NOTIFY limit (see broadcast.PostgresBroadcast)
+MAX_CHAT_MESSAGE_LENGTH = 1000
+
+
 class ChatMessageBase(BaseModel):
     message: str
     incident_id: int
@@ -108,7 +145,7 @@ class ChatMessageBase(BaseModel):
 
 
 class ChatMessageCreate(ChatMessageBase):
-    pass
+    message: str = Field(..., max_length=MAX_CHAT_MESSAGE_LENGTH)
 
 
 class ChatMessageResponse(ChatMessageBase):
@@ -116,4 +153,43 @@ class ChatMessageResponse(ChatMessageBase):
     timestamp: datetime
     sender_name: Optional[str] = None
     is_read: bool
-
\ No newline at end of file
+
+
+
+# --- Admin summary ---
+
+
+class UserCounts(BaseModel):
+    total: int = 0
+    by_role: Dict[str, int] = {}
+    pending_volunteers: int = 0
+
+
+class IncidentCounts(BaseModel):
+    total: int = 0
+    open: int = 0  # anything not closed
+    by_status: Dict[str, int] = {}
+
+
+class ComplaintCounts(BaseModel):
+    total: int = 0
+
+
+class RecentItem(BaseModel):
+    id: int
+    label: str  # incident title, complaint subject or username
+    status: Optional[str] = None  # incident status / user role
+    created_at: Optional[datetime] = None
+
+
+class RecentActivity(BaseModel):
+    incidents: List[RecentItem] = []
+    complaints: List[RecentItem] = []
+    signups: List[RecentItem] = []
+
+
+class AdminSummary(BaseModel):
+    users: UserCounts
+    incidents: IncidentCounts
+    complaints: ComplaintCounts
+    recent_activity: RecentActivity
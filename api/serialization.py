@@ -0,0 +1,52 @@
+import json
+from datetime import date, datetime
+from typing import Any, Optional
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is slower but produces the same body
+    orjson = None
+
+
+# Lean JSON path for the big listings.
+# Routes select plain columns, build dicts in the response model's field
+# order and return them through FastJSONResponse. That skips building a
+# Pydantic model per row and FastAPI validating it again against
+# response_model; the response_model stays on the route for the docs.
+# The bodies are byte-for-byte what the model path produced
+# (benchmarks/bench_serialization.py checks this).
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def respond(content: Any, response: Optional[Response] = None) -> FastJSONResponse:
+    """Return `content` as-is; carries over headers set on the injected Response.
+
+    FastAPI drops the injected Response's headers (ETag, cursors) when a
+    route returns a Response of its own, so they are copied here.
+    """
+    fast = FastJSONResponse(content)
+    if response is not None:
+        fast.headers.update(response.headers)
+    return fast
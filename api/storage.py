@@ -0,0 +1,334 @@
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.staticfiles import StaticFiles
+from sqlalchemy import and_, delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import SessionLocal, get_supabase_client
+from models import StoredObject
+
+log = logging.getLogger(__name__)
+
+
+# Volunteer ID documents.
+# The request only streams the upload into a spool file (fixed-size chunks,
+# size cap, sha256 as it goes); moving the bytes to the storage backend runs
+# as a background task after the response, so signup latency no longer
+# depends on file size or on how slow Supabase is today.
+#
+# STORAGE_BACKEND=local|supabase picks the backend (default: supabase when
+# SUPABASE_URL/SUPABASE_KEY are set, else local). Anything with
+# url_for/put/delete can stand in, e.g. an S3-compatible store.
+#
+# Storage is content-addressed: a file lives at ab/cd/<sha256>.<ext>, once,
+# however many users uploaded it. stored_objects counts the users whose
+# profile_image points at each object; when the count drops to zero the
+# object is garbage collected. Objects never change, so they can be cached
+# forever.
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(5 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 64 * 1024
+UPLOADS_DIR = Path(__file__).resolve().parent / "uploads"
+SUPABASE_BUCKET = "safetracker"
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+# ab/cd/abcd...(64 hex).ext, optionally followed by a query string
+_OBJECT_URL = re.compile(r"([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})(?:\.\w+)?(?:\?|$)")
+
+
+def object_key(sha256: str, content_type: Optional[str]) -> str:
+    ext = mimetypes.guess_extension(content_type or "") or ""
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+
+
+def sha256_of(url: Optional[str]) -> Optional[str]:
+    """The object behind a profile_image URL; None for pre-CAS uploads."""
+    match = _OBJECT_URL.search(url or "")
+    return match.group(3) if match else None
+
+
+class LocalStorage:
+    name = "local"
+
+    def __init__(self, root: Path = UPLOADS_DIR):
+        self.root = root
+
+    def url_for(self, key: str) -> str:
+        # served by the /api/uploads mount
+        return f"uploads/{key}"
+
+    def put(self, key: str, src: str, content_type: str) -> str:
+        target = self.root / key
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(src, target)
+        os.chmod(target, 0o644)  # mkstemp creates 0600
+        return self.url_for(key)
+
+    def delete(self, key: str):
+        target = self.root / key
+        target.unlink(missing_ok=True)
+        # drop the shard directories once they are empty
+        for parent in (target.parent, target.parent.parent):
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+
+
+class SupabaseStorage:
+    name = "supabase"
+
+    def __init__(self, client, bucket: str = SUPABASE_BUCKET):
+        self.client = client
+        self.bucket = bucket
+
+    def url_for(self, key: str) -> str:
+        # pure string building in the client, no network call
+        return self.client.storage.from_(self.bucket).get_public_url(key)
+
+    def put(self, key: str, src: str, content_type: str) -> str:
+        with open(src, "rb") as f:
+            self.client.storage.from_(self.bucket).upload(
+                path=key,
+                file=f,
+                file_options={
+                    "content-type": content_type,
+                    "cache-control": "31536000",
+                    "upsert": "true",
+                },
+            )
+        return self.url_for(key)
+
+    def delete(self, key: str):
+        self.client.storage.from_(self.bucket).remove([key])
+
+
+def get_backend():
+    choice = os.getenv("STORAGE_BACKEND")
+    client = get_supabase_client() if choice != "local" else None
+    if client:
+        return SupabaseStorage(client)
+    if choice == "supabase" or os.environ.get("VERCEL"):
+        # read-only filesystem on Vercel: local storage would lose the file
+        raise HTTPException(status_code=500, detail="Cloud Storage (Supabase) not configured on Vercel.")
+    return LocalStorage()
+
+
+def backend_named(name: str):
+    if name == SupabaseStorage.name:
+        return SupabaseStorage(get_supabase_client())
+    return LocalStorage()
+
+
+@dataclass
+class PendingUpload:
+    """A fully received upload waiting in a spool file for transfer()."""
+    key: str
+    spool_path: str
+    content_type: str
+    size: int
+    sha256: str
+    backend: object
+    url: str  # where the file will live once transfer() succeeds
+    needs_transfer: bool = True  # False when acquire() found the bytes already stored
+
+    def discard(self):
+        try:
+            os.remove(self.spool_path)
+        except FileNotFoundError:
+            pass
+
+
+def receive(upload, backend=None, max_bytes: int = UPLOAD_MAX_BYTES) -> PendingUpload:
+    """Stream an UploadFile into a spool file in chunks; 413 past max_bytes."""
+    backend = backend or get_backend()
+    digest = hashlib.sha256()
+    size = 0
+    fd, spool_path = tempfile.mkstemp(prefix="upload_", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            upload.file.seek(0)
+            while True:
+                chunk = upload.file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large (max {max_bytes / (1024 * 1024):g} MB)",
+                    )
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(spool_path)
+        raise
+
+    sha256 = digest.hexdigest()
+    key = object_key(sha256, upload.content_type)
+    return PendingUpload(
+        key=key,
+        spool_path=spool_path,
+        content_type=upload.content_type,
+        size=size,
+        sha256=sha256,
+        backend=backend,
+        url=backend.url_for(key),
+    )
+
+
+# --- reference counting (callers' transactions) ---
+
+def _upsert(db):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    return None
+
+
+def acquire(db, pending: PendingUpload) -> str:
+    """Take a reference for a new profile_image; returns the URL to store.
+
+    Runs in the caller's transaction, so a signup that rolls back takes no
+    reference. Sets pending.needs_transfer to False when the same bytes are
+    already in storage. A row nobody references is not trusted to have its
+    blob: collect() may have deleted it and died before its commit.
+    """
+    table = StoredObject.__table__
+    values = dict(
+        sha256=pending.sha256, key=pending.key, backend=pending.backend.name, url=pending.url,
+        size=pending.size, content_type=pending.content_type, ref_count=1, stored=False,
+    )
+    upsert = _upsert(db)
+    if upsert is not None:
+        # one statement, so two signups with the same file can't both insert
+        stmt = upsert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.sha256],
+            set_={"ref_count": table.c.ref_count + 1, "stored": and_(table.c.stored, table.c.ref_count > 0)},
+        ).returning(table.c.stored, table.c.url)
+        stored, url = db.execute(stmt).one()
+    else:
+        row = db.execute(
+            select(table.c.stored, table.c.url, table.c.ref_count)
+            .where(table.c.sha256 == pending.sha256).with_for_update()
+        ).first()
+        if row is None:
+            db.execute(insert(table).values(**values))
+            stored, url = False, pending.url
+        else:
+            stored, url = row.stored and row.ref_count > 0, row.url
+            db.execute(update(table).where(table.c.sha256 == pending.sha256)
+                       .values(ref_count=table.c.ref_count + 1, stored=stored))
+
+    pending.needs_transfer = not stored
+    return url
+
+
+def release(db, url: Optional[str]) -> Optional[str]:
+    """Drop a profile_image's reference; returns the sha256 to collect() after commit."""
+    sha256 = sha256_of(url)
+    if sha256 is None:
+        return None
+    table = StoredObject.__table__
+    db.execute(update(table).where(table.c.sha256 == sha256).values(ref_count=table.c.ref_count - 1))
+    return sha256
+
+
+def collect(sha256: str):
+    """Delete an object nobody references any more (background task).
+
+    The blob is deleted while the row is still locked and before the row's
+    delete commits: a signup uploading the same bytes meanwhile waits on the
+    row, then finds it gone and stores the blob again, instead of having its
+    fresh copy deleted from under it.
+    """
+    table = StoredObject.__table__
+    db = SessionLocal()
+    try:
+        # re-checked here: a signup may have taken a new reference since release()
+        row = db.execute(
+            select(table.c.key, table.c.backend)
+            .where(table.c.sha256 == sha256, table.c.ref_count <= 0)
+            .with_for_update()
+        ).first()
+        if row is None:
+            return
+        deleted = db.execute(delete(table).where(table.c.sha256 == sha256, table.c.ref_count <= 0))
+        if deleted.rowcount == 0:
+            return
+        try:
+            backend_named(row.backend).delete(row.key)
+            log.info("garbage collected stored object", extra={"sha256": sha256[:12]})
+        except Exception:
+            # the row goes anyway: a leftover blob is only wasted space, and a
+            # later upload of the same bytes simply overwrites it
+            log.exception("storage delete failed", extra={"sha256": sha256[:12]})
+        db.commit()
+    finally:
+        db.close()
+
+
+def _mark_stored(pending: PendingUpload, url: str, backend_name: str):
+    table = StoredObject.__table__
+    db = SessionLocal()
+    try:
+        db.execute(update(table).where(table.c.sha256 == pending.sha256)
+                   .values(stored=True, url=url, backend=backend_name))
+        db.commit()
+    finally:
+        db.close()
+
+
+def transfer(pending: PendingUpload) -> Optional[str]:
+    """Move the spooled bytes to their backend. Returns the final URL, or None."""
+    try:
+        if not pending.needs_transfer:
+            return pending.url
+        backend = pending.backend
+        try:
+            url = backend.put(pending.key, pending.spool_path, pending.content_type)
+        except Exception:
+            log.exception("storage upload failed", extra={"backend": backend.name})
+            if os.environ.get("VERCEL") or isinstance(backend, LocalStorage):
+                return None
+            # Local dev fallback
+            try:
+                backend = LocalStorage()
+                url = backend.put(pending.key, pending.spool_path, pending.content_type)
+            except Exception:
+                log.exception("local storage fallback failed")
+                return None
+        _mark_stored(pending, url, backend.name)
+        return url
+    finally:
+        pending.discard()
+
+
+class UploadFiles(StaticFiles):
+    """The /api/uploads mount: long-lived caching for content-addressed files.
+
+    Range requests, ETag and Last-Modified come from Starlette's FileResponse.
+    """
+
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 206, 304):
+            if _OBJECT_URL.search(path.replace(os.sep, "/")):
+                response.headers["Cache-Control"] = IMMUTABLE_CACHE
+            else:
+                # pre-CAS files are named after the upload and can be replaced
+                response.headers.setdefault("Cache-Control", "public, max-age=3600")
+        return response
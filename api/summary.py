@@ -0,0 +1,156 @@
+import random
+from collections import Counter
+from typing import Dict, Iterable
+
+from sqlalchemy import event, func, insert, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import Complaint, Incident, SummaryCounter, User
+
+
+# Counters behind GET /users/admin/summary.
+# Every flush that inserts, deletes or changes the role/approval of a user,
+# the status of an incident, or a complaint adds its +1/-1 deltas to
+# summary_counters in the same transaction, so the summary is a read of a
+# few dozen rows instead of three table scans. Bulk UPDATE/DELETE statements
+# skip the flush, so their callers pass the deltas to adjust() themselves.
+#
+# Each counter is split over SUMMARY_COUNTER_SLOTS rows, summed on read. A
+# connection always writes the same slot, so concurrent writers mostly land
+# on different rows instead of queueing on one row lock per counter.
+#
+# Counter names:
+#   users.total, users.role.<role>, users.pending_volunteers
+#   incidents.total, incidents.status.<status>
+#   complaints.total
+
+SUMMARY_COUNTER_SLOTS = 16
+
+
+def user_counters(role, is_approved) -> list:
+    names = ["users.total", f"users.role.{role}"]
+    if role == "volunteer" and is_approved is False:
+        names.append("users.pending_volunteers")
+    return names
+
+
+def incident_counters(status) -> list:
+    return ["incidents.total", f"incidents.status.{status}"]
+
+
+def _counters_for(obj, values) -> list:
+    if isinstance(obj, User):
+        return user_counters(values("role"), values("is_approved"))
+    if isinstance(obj, Incident):
+        return incident_counters(values("status"))
+    if isinstance(obj, Complaint):
+        return ["complaints.total"]
+    return []
+
+
+_TRACKED = {User: ("role", "is_approved"), Incident: ("status",)}
+
+
+def _previous(obj):
+    """Attribute values as they were before this flush."""
+    state = inspect(obj)
+
+    def value(attr):
+        history = state.attrs[attr].history
+        if history.deleted:
+            return history.deleted[0]
+        return getattr(obj, attr)
+
+    return value
+
+
+def _current(obj):
+    return lambda attr: getattr(obj, attr)
+
+
+@event.listens_for(Session, "after_flush")
+def _count_flushed_changes(session, flush_context):
+    deltas = Counter()
+    for obj in session.new:
+        deltas.update(_counters_for(obj, _current(obj)))
+    for obj in session.deleted:
+        deltas.subtract(_counters_for(obj, _previous(obj)))
+    for obj in session.dirty:
+        attrs = _TRACKED.get(type(obj))
+        if not attrs or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[a].history.has_changes() for a in attrs):
+            continue
+        deltas.subtract(_counters_for(obj, _previous(obj)))
+        deltas.update(_counters_for(obj, _current(obj)))
+    adjust(session.connection(), deltas)
+
+
+def _slot(connection) -> int:
+    # connection.info lives as long as the pooled DBAPI connection
+    return connection.info.setdefault("summary_slot", random.randrange(SUMMARY_COUNTER_SLOTS))
+
+
+def adjust(connection, deltas: Dict[str, int]):
+    """Apply counter deltas in the caller's transaction."""
+    table = SummaryCounter.__table__
+    slot = _slot(connection)
+    upsert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(connection.dialect.name)
+    # fixed order: two transactions touching the same counters can't deadlock
+    for name, delta in sorted((n, d) for n, d in deltas.items() if d):
+        if upsert is not None:
+            stmt = upsert(table).values(name=name, slot=slot, value=delta)
+            connection.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.name, table.c.slot], set_={"value": table.c.value + delta}
+            ))
+            continue
+        result = connection.execute(
+            update(table).where(table.c.name == name, table.c.slot == slot)
+            .values(value=table.c.value + delta)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(name=name, slot=slot, value=delta))
+
+
+def bulk_incident_deltas(status_counts: Iterable, new_status=None) -> Counter:
+    """Deltas for a bulk DELETE (new_status None) or status UPDATE of incidents.
+
+    status_counts: (status, count) rows for the affected incidents, taken
+    before the statement runs.
+    """
+    deltas = Counter()
+    for status, count in status_counts:
+        for name in incident_counters(status):
+            deltas[name] -= count
+        if new_status is not None:
+            for name in incident_counters(new_status):
+                deltas[name] += count
+    return deltas
+
+
+def recount(connection):
+    """Rebuild every counter from the tables (migration backfill, drift repair)."""
+    table = SummaryCounter.__table__
+    counts = Counter()
+    for role, approved, n in connection.execute(
+        select(User.role, User.is_approved, func.count()).group_by(User.role, User.is_approved)
+    ):
+        for name in user_counters(role, approved):
+            counts[name] += n
+    for status, n in connection.execute(
+        select(Incident.status, func.count()).group_by(Incident.status)
+    ):
+        for name in incident_counters(status):
+            counts[name] += n
+    counts["complaints.total"] += connection.execute(select(func.count(Complaint.id))).scalar() or 0
+
+    connection.execute(table.delete())
+    if counts:
+        connection.execute(insert(table), [{"name": n, "slot": 0, "value": v} for n, v in counts.items()])
+
+
+def read_counters(db: Session) -> Dict[str, int]:
+    rows = db.query(SummaryCounter.name, func.sum(SummaryCounter.value)).group_by(SummaryCounter.name)
+    return {name: int(value) for name, value in rows}
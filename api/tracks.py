@@ -0,0 +1,193 @@
+import math
+import sys
+import zlib
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.orm import Session
+
+from models import LocationTrackChunk
+
+
+# Location history ("track") store.
+# Fixes are grouped per incident into fixed time buckets. Each bucket is one
+# row whose blob holds three columns (time, lat, lng), quantized to integers
+# and delta-encoded, packed as int64 and zlib-compressed. Consecutive GPS
+# fixes differ by small amounts, so a fix costs a few bytes instead of a row.
+
+TRACK_BUCKET_SECONDS = 600
+TIME_SCALE = 1000          # milliseconds
+COORD_SCALE = 10_000_000   # 1e-7 degrees (~1 cm)
+DEFAULT_TOLERANCE_M = 5.0
+
+Point = Tuple[float, float, float]  # (epoch seconds, lat, lng)
+
+
+# --- encoding ---
+
+def encode_points(points: Sequence[Point]) -> bytes:
+    packed = array("q")
+    for column, scale in ((0, TIME_SCALE), (1, COORD_SCALE), (2, COORD_SCALE)):
+        prev = 0
+        for point in points:
+            value = round(point[column] * scale)
+            packed.append(value - prev)
+            prev = value
+    if sys.byteorder == "big":
+        packed.byteswap()  # blobs are always little-endian
+    return zlib.compress(packed.tobytes())
+
+
+def decode_points(blob: bytes, count: int) -> List[Point]:
+    packed = array("q")
+    packed.frombytes(zlib.decompress(blob))
+    if sys.byteorder == "big":
+        packed.byteswap()
+
+    columns = []
+    for column, scale in ((0, TIME_SCALE), (1, COORD_SCALE), (2, COORD_SCALE)):
+        values = []
+        total = 0
+        for delta in packed[column * count:(column + 1) * count]:
+            total += delta
+            values.append(total / scale)
+        columns.append(values)
+    return list(zip(*columns))
+
+
+def bucket_start(ts: float) -> datetime:
+    start = ts - ts % TRACK_BUCKET_SECONDS
+    return datetime.fromtimestamp(start, timezone.utc).replace(tzinfo=None)
+
+
+def to_epoch(value: datetime) -> float:
+    # naive datetimes are UTC throughout this codebase
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+# --- storage ---
+
+def append_points(conn, points_by_incident: Dict[int, List[Point]]):
+    """Merge new fixes into their bucket rows: one SELECT, then batched UPDATE/INSERT.
+
+    Runs inside the caller's transaction; the bucket rows are locked so
+    concurrent flushes from other workers can't lose each other's points.
+    """
+    grouped: Dict[Tuple[int, datetime], List[Point]] = {}
+    for incident_id, points in points_by_incident.items():
+        for point in points:
+            grouped.setdefault((incident_id, bucket_start(point[0])), []).append(point)
+    if not grouped:
+        return
+
+    table = LocationTrackChunk.__table__
+    existing = {
+        (row.incident_id, row.bucket_start): row
+        for row in conn.execute(
+            select(table)
+            .where(
+                table.c.incident_id.in_({key[0] for key in grouped}),
+                table.c.bucket_start.in_({key[1] for key in grouped}),
+            )
+            .with_for_update()
+        )
+    }
+
+    updates, inserts = [], []
+    for (incident_id, start), new_points in grouped.items():
+        row = existing.get((incident_id, start))
+        merged = decode_points(row.data, row.point_count) if row else []
+        if merged and new_points[0][0] < merged[-1][0]:
+            merged = sorted(merged + new_points)
+        else:
+            merged.extend(new_points)
+        # as stored, so load_track's `last_ts >= since` agrees with the decoded points
+        last_ts = round(merged[-1][0] * TIME_SCALE) / TIME_SCALE
+        values = {"point_count": len(merged), "last_ts": last_ts, "data": encode_points(merged)}
+        if row:
+            updates.append({"_id": row.id, **values})
+        else:
+            inserts.append({"incident_id": incident_id, "bucket_start": start, **values})
+
+    if updates:
+        conn.execute(
+            update(table)
+            .where(table.c.id == bindparam("_id"))
+            .values(
+                point_count=bindparam("point_count"),
+                last_ts=bindparam("last_ts"),
+                data=bindparam("data"),
+            ),
+            updates,
+        )
+    if inserts:
+        conn.execute(insert(table), inserts)
+
+
+def load_track(db: Session, incident_id: int, since: Optional[float] = None) -> List[Point]:
+    query = db.query(LocationTrackChunk.point_count, LocationTrackChunk.data).filter(
+        LocationTrackChunk.incident_id == incident_id
+    )
+    if since is not None:
+        # buckets that end before `since` are skipped without decoding
+        query = query.filter(LocationTrackChunk.last_ts >= since)
+    points: List[Point] = []
+    for count, data in query.order_by(LocationTrackChunk.bucket_start):
+        points.extend(decode_points(data, count))
+    if since is not None:
+        points = [p for p in points if p[0] >= since]
+    return points
+
+
+# --- downsampling ---
+
+def _project(points: Sequence[Point]) -> List[Tuple[float, float]]:
+    # local equirectangular projection in metres; fine at trail scale
+    lat0 = math.radians(points[0][1])
+    kx = 111_320.0 * math.cos(lat0)
+    ky = 110_540.0
+    return [(p[2] * kx, p[1] * ky) for p in points]
+
+
+def _segment_distance(p, a, b) -> float:
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    if dx == 0 and dy == 0:
+        return math.hypot(p[0] - a[0], p[1] - a[1])
+    t = max(0.0, min(1.0, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / (dx * dx + dy * dy)))
+    return math.hypot(p[0] - (a[0] + t * dx), p[1] - (a[1] + t * dy))
+
+
+def douglas_peucker(points: Sequence[Point], tolerance_m: float) -> List[Point]:
+    """Iterative Douglas-Peucker; keeps endpoints and every point further than
+    `tolerance_m` from the simplified line."""
+    if len(points) < 3:
+        return list(points)
+    xy = _project(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        best, best_index = 0.0, None
+        for i in range(first + 1, last):
+            d = _segment_distance(xy[i], xy[first], xy[last])
+            if d > best:
+                best, best_index = d, i
+        if best_index is not None and best > tolerance_m:
+            keep[best_index] = True
+            stack.append((first, best_index))
+            stack.append((best_index, last))
+    return [p for p, k in zip(points, keep) if k]
+
+
+def downsample(points: Sequence[Point], tolerance_m: float, max_points: int) -> List[Point]:
+    simplified = douglas_peucker(points, tolerance_m)
+    # still too many: coarsen until it fits
+    while len(simplified) > max_points:
+        tolerance_m = max(tolerance_m * 2, 1.0)
+        simplified = douglas_peucker(simplified, tolerance_m)
+    return simplified
@@ -0,0 +1,95 @@
+"""Fan-out latency of ConnectionManager.deliver_local.
+
+Rooms of 1, 10 and 100 subscribers, one of which is artificially slow.
+Reports how long the fast subscribers wait for a message, compared with
+the old sequential send loop.
+
+    python benchmarks/bench_broadcast.py
+"""
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "api"))
+
+from connections import ConnectionManager  # noqa: E402
+
+SLOW_SEND_SECONDS = 0.5
+FAST_SEND_SECONDS = 0.0005
+MESSAGES = 20
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.received = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        await asyncio.sleep(self.delay)
+        self.received.set()
+
+    async def send_json(self, message: dict):
+        await self.send_text("")
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def make_room(size: int):
+    sockets = [FakeWebSocket(FAST_SEND_SECONDS) for _ in range(size - 1)]
+    slow = FakeWebSocket(SLOW_SEND_SECONDS)
+    # slow client first: the worst case for a sequential loop
+    return [slow] + sockets, sockets or [slow]
+
+
+async def time_fast_clients(deliver, fast):
+    for ws in fast:
+        ws.received.clear()
+    start = time.perf_counter()
+    await deliver()
+    await asyncio.gather(*(ws.received.wait() for ws in fast))
+    return time.perf_counter() - start
+
+
+async def bench_manager(size: int):
+    manager = ConnectionManager()
+    sockets, fast = make_room(size)
+    for i, ws in enumerate(sockets):
+        await manager.connect(ws, 1, i)
+
+    samples = []
+    for _ in range(MESSAGES):
+        samples.append(await time_fast_clients(lambda: manager.deliver_local(1, {"message": "hi"}), fast))
+    for ws in sockets:
+        manager.disconnect(ws, 1)
+    return samples
+
+
+async def bench_sequential(size: int):
+    sockets, fast = make_room(size)
+
+    async def deliver():
+        for ws in sockets:
+            await ws.send_json({"message": "hi"})
+
+    return [await time_fast_clients(deliver, fast) for _ in range(3)]
+
+
+def report(name, size, samples):
+    ms = [s * 1000 for s in samples]
+    print(f"{name:<12} room={size:<4} p50={statistics.median(ms):8.2f} ms  max={max(ms):8.2f} ms")
+
+
+async def main():
+    for size in (1, 10, 100):
+        report("sequential", size, await bench_sequential(size))
+        report("concurrent", size, await bench_manager(size))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
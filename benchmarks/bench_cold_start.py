@@ -0,0 +1,119 @@
+"""Cold-start cost of the API.
+
+Measures, in fresh interpreters:
+  * import time of api/index.py (what every serverless cold start pays)
+  * time from process spawn to the first successful HTTP response
+  * the slowest modules in `python -X importtime` (with --modules)
+
+Uses a throwaway SQLite database unless DATABASE_URL is already set.
+
+    python benchmarks/bench_cold_start.py [--runs 5] [--modules]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent / "api"
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import index; "
+    "print('IMPORT_MS', (time.perf_counter() - t) * 1000)"
+)
+
+
+def _env(database_url: str) -> dict:
+    env = dict(os.environ, DATABASE_URL=database_url, PYTHONPATH=str(API_DIR))
+    env.pop("VERCEL", None)
+    return env
+
+
+def measure_import(env: dict) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=API_DIR, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    line = next(l for l in out.splitlines() if l.startswith("IMPORT_MS"))
+    return float(line.split()[1])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_first_response(env: dict, path: str) -> float:
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "index:app", "--port", str(port), "--log-level", "warning"],
+        cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=5) as res:
+                    res.read()
+                    return (time.perf_counter() - start) * 1000
+            except OSError:
+                if proc.poll() is not None:
+                    raise RuntimeError("server exited before answering")
+                time.sleep(0.005)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def slowest_modules(env: dict, top: int = 12):
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import index"], cwd=API_DIR, env=env,
+        capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = [p.strip() for p in line[len("import time:"):].split("|")]
+        rows.append((int(cumulative_us), int(self_us), name))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def summarize(label: str, samples):
+    print(f"{label:<28} p50 {statistics.median(samples):8.1f} ms   "
+          f"min {min(samples):8.1f} ms   max {max(samples):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/api/users/incidents?limit=1")
+    parser.add_argument("--modules", action="store_true", help="show the slowest imports")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = os.environ.get("DATABASE_URL") or f"sqlite:///{tmp}/bench.sqlite"
+        env = _env(database_url)
+        # schema setup is a separate step now; do it once, outside the timings
+        subprocess.run([sys.executable, "migrate.py"], cwd=API_DIR, env=env,
+                       stdout=subprocess.DEVNULL, check=True)
+
+        summarize("import index", [measure_import(env) for _ in range(args.runs)])
+        summarize(f"spawn -> first {args.path.split('?')[0]}",
+                  [measure_first_response(env, args.path) for _ in range(args.runs)])
+
+        if args.modules:
+            print("\nslowest imports (cumulative us, self us):")
+            for cumulative, self_us, name in slowest_modules(env):
+                print(f"  {cumulative:>9} {self_us:>9}  {name}")
+
+
+if __name__ == "__main__":
+    main()
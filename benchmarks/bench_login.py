@@ -0,0 +1,126 @@
+"""Login throughput at different PASSWORD_HASH_ROUNDS.
+
+For each round count a fresh server is started on a throwaway SQLite database,
+one user signs up, then a burst of concurrent logins runs while a probe
+repeatedly hits a cheap GET endpoint. Reports logins/s, login latency, and
+probe latency during the burst (how much hashing starves everything else).
+
+    python benchmarks/bench_login.py [--rounds 5000 29000 100000] [--logins 200] [--concurrency 16]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent / "api"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _post_form(url: str, fields: dict) -> int:
+    data = urllib.parse.urlencode(fields).encode()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=60) as res:
+            res.read()
+            return res.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def _pct(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run(rounds: int, logins: int, concurrency: int, tmp: str):
+    db_url = f"sqlite:///{tmp}/login_{rounds}.sqlite"
+    env = dict(os.environ, DATABASE_URL=db_url, PASSWORD_HASH_ROUNDS=str(rounds))
+    env.pop("VERCEL", None)
+    subprocess.run([sys.executable, "migrate.py"], cwd=API_DIR, env=env,
+                   stdout=subprocess.DEVNULL, check=True)
+
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "index:app", "--port", str(port), "--log-level", "warning"],
+        cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(200):
+            try:
+                urllib.request.urlopen(f"{base}/api/users/incidents?limit=1", timeout=2).read()
+                break
+            except OSError:
+                time.sleep(0.05)
+
+        _post_form(f"{base}/api/users/signup", {
+            "username": "bench", "Mobile": "1", "email": "bench@example.com",
+            "role": "user", "password": "correct horse",
+        })
+
+        probe_ms = []
+        done = threading.Event()
+
+        def probe():
+            while not done.is_set():
+                _, ms = _timed(lambda: urllib.request.urlopen(
+                    f"{base}/api/users/incidents?limit=1", timeout=60).read())
+                probe_ms.append(ms)
+                time.sleep(0.01)
+
+        prober = threading.Thread(target=probe)
+        prober.start()
+
+        login = lambda _: _timed(lambda: _post_form(
+            f"{base}/api/users/login", {"username": "bench", "password": "correct horse"}))
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(login, range(logins)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        prober.join()
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    ok = [ms for status, ms in results if status == 200]
+    busy = sum(1 for status, _ in results if status == 503)
+    print(f"{rounds:>8} {len(ok) / elapsed:10.1f} {statistics.median(ok):10.1f} {_pct(ok, 0.99):10.1f}"
+          f" {busy:6d} {statistics.median(probe_ms):10.1f} {_pct(probe_ms, 0.99):10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, nargs="+", default=[5000, 29000, 100000])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"{'rounds':>8} {'logins/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'503s':>6}"
+          f" {'probe p50':>10} {'probe p99':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rounds in args.rounds:
+            run(rounds, args.logins, args.concurrency, tmp)
+
+
+if __name__ == "__main__":
+    main()
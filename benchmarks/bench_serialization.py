@@ -0,0 +1,144 @@
+"""Incident listing serialization: Pydantic models vs the lean dict path.
+
+Seeds a throwaway SQLite database with N incidents, then times the whole
+listing pipeline (query, build, validate, JSON) both ways:
+
+  model  ORM entities -> IncidentResponse per row -> FastAPI response_model
+         handling (dump each model, validate the list again, dump_json)
+  lean   column tuples -> dicts -> serialization.dumps (orjson when installed)
+
+Reports rows/s for each and checks that both produce the same JSON body.
+
+    python benchmarks/bench_serialization.py [--rows 1000 10000 100000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+TMP = tempfile.mkdtemp(prefix="bench_serialization_")
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP}/bench.sqlite"
+os.environ.pop("VERCEL", None)
+sys.path.append(str(Path(__file__).resolve().parent.parent / "api"))
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import delete, insert, literal  # noqa: E402
+from sqlalchemy.orm import aliased  # noqa: E402
+
+import database  # noqa: E402
+import locations  # noqa: E402
+import migrate  # noqa: E402
+import router  # noqa: E402
+import schemas  # noqa: E402
+import serialization  # noqa: E402
+from models import Incident, User  # noqa: E402
+
+LISTING = TypeAdapter(List[schemas.IncidentResponse])
+
+
+def seed(rows: int):
+    engine = database.get_engine()
+    with engine.begin() as conn:
+        conn.execute(delete(Incident.__table__))
+        conn.execute(delete(User.__table__))
+        conn.execute(insert(User.__table__), [
+            {"id": 1, "username": "reporter", "email": "r@example.com", "role": "user"},
+            {"id": 2, "username": "volunteer", "email": "v@example.com", "role": "volunteer"},
+        ])
+        start = datetime(2024, 1, 1)
+        conn.execute(insert(Incident.__table__), [
+            {
+                "id": i,
+                "title": f"Incident {i}",
+                "full_address": f"{i} Example Street, Chennai",
+                "latitude": 13.0 + i * 1e-5,
+                "longitude": 80.2 + i * 1e-5,
+                "status": "in_progress" if i % 3 == 0 else "reported",
+                "created_at": start + timedelta(seconds=i),
+                "reporter_id": 1,
+                "volunteer_id": 2 if i % 3 == 0 else None,
+                "version": i,
+            }
+            for i in range(1, rows + 1)
+        ])
+
+
+def model_path(db) -> bytes:
+    """The listing as it was: ORM rows, one model per row, response_model on top."""
+    Reporter = aliased(User)
+    Volunteer = aliased(User)
+    rows = (
+        db.query(Incident, Reporter.username, Volunteer.username, literal(0))
+        .outerjoin(Reporter, Incident.reporter_id == Reporter.id)
+        .outerjoin(Volunteer, Incident.volunteer_id == Volunteer.id)
+        .order_by(Incident.created_at.desc(), Incident.id.desc())
+        .all()
+    )
+    items = []
+    for inc, reporter_name, volunteer_name, unread_count in rows:
+        latitude, longitude = locations.buffer.position(inc)
+        items.append(schemas.IncidentResponse(
+            id=inc.id,
+            title=inc.title,
+            full_address=inc.full_address,
+            latitude=latitude,
+            longitude=longitude,
+            status=inc.status,
+            created_at=inc.created_at,
+            reporter_id=inc.reporter_id,
+            volunteer_id=inc.volunteer_id,
+            reporter_name=reporter_name or "Unknown",
+            volunteer_name=volunteer_name or "Waiting...",
+            unread_count=unread_count or 0,
+        ))
+    # what FastAPI does with a response_model: dump, re-validate, serialize
+    validated = LISTING.validate_python([item.model_dump() for item in items])
+    return LISTING.dump_json(validated)
+
+
+def lean_path(db) -> bytes:
+    rows = (
+        router._incident_listing_query(db)
+        .order_by(Incident.created_at.desc(), Incident.id.desc())
+        .all()
+    )
+    return serialization.dumps([router._incident_response(row) for row in rows])
+
+
+def best_of(fn, repeat: int):
+    best, body = None, None
+    for _ in range(repeat):
+        db = database.SessionLocal()
+        try:
+            start = time.perf_counter()
+            body = fn(db)
+            elapsed = time.perf_counter() - start
+        finally:
+            db.close()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, body
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    migrate.upgrade()
+    print(f"JSON encoder: {'orjson' if serialization.orjson else 'stdlib json'}")
+    print(f"{'rows':>8}  {'model rows/s':>13}  {'lean rows/s':>12}  {'speedup':>7}  same body")
+    for rows in args.rows:
+        seed(rows)
+        model_s, model_body = best_of(model_path, args.repeat)
+        lean_s, lean_body = best_of(lean_path, args.repeat)
+        print(f"{rows:>8}  {rows / model_s:>13,.0f}  {rows / lean_s:>12,.0f}  "
+              f"{model_s / lean_s:>6.1f}x  {model_body == lean_body}")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,35 +23,78 @@ function showToast(message, type = "success") {
     }, 4000);
 }
 
-async function fetchAllData() {
-    try {
-        // Fetch Users
-        const userRes = await fetch(`${apiBase}/api/users/users-raw`);
-        const users = await userRes.json();
+// --- CONDITIONAL FETCH (ETag) ---
+// Remembers the last ETag/body per URL; a 304 reuses the cached body.
+const etagCache = {};
 
-        // Fetch Incidents
-        const incidentRes = await fetch(`${apiBase}/api/users/incidents`);
-        const incidents = await incidentRes.json();
+async function fetchIfChanged(url) {
+    const cached = etagCache[url];
+    const headers = cached ? { "If-None-Match": cached.etag } : {};
+    const res = await fetch(url, { headers });
+    if (res.status === 304 && cached) return { ...cached, changed: false };
+    const data = await res.json();
+    const etag = res.headers.get("ETag");
+    const nextCursor = res.headers.get(NEXT_CURSOR_HEADER);
+    if (etag) etagCache[url] = { etag, data, nextCursor };
+    return { data, nextCursor, changed: true };
+}
 
-        // Fetch Complaints
-        const complaintRes = await fetch(`${apiBase}/api/users/complaints`);
-        const complaints = await complaintRes.json();
+// --- INCIDENT PAGES ---
+// One page on load; "Load more" appends the next one. A refresh re-reads
+// only as many rows as are on screen, never the whole table.
+const INCIDENT_PAGE_SIZE = 50;
+const MAX_PAGE_SIZE = 500;  // server cap on ?limit
+let incidents = [];
+let incidentsCursor = null;
+
+function incidentsUrl(limit) {
+    return `${apiBase}/api/users/incidents?limit=${limit}`;
+}
 
-        updateStats(users, incidents, complaints);
-        renderUsers(users);
+async function loadMoreIncidents() {
+    if (!incidentsCursor) return;
+    try {
+        const res = await fetch(withCursor(incidentsUrl(INCIDENT_PAGE_SIZE), incidentsCursor));
+        if (!res.ok) return;
+        const seen = new Set(incidents.map(inc => inc.id));
+        incidents = incidents.concat((await res.json()).filter(inc => !seen.has(inc.id)));
+        incidentsCursor = res.headers.get(NEXT_CURSOR_HEADER);
         renderIncidents(incidents);
-        renderComplaints(complaints);
+    } catch (e) { console.error(e); }
+}
+
+async function fetchAllData() {
+    try {
+        const shown = Math.min(Math.max(incidents.length, INCIDENT_PAGE_SIZE), MAX_PAGE_SIZE);
+        const [summaryRes, usersRes, incidentsRes, complaintsRes] = await Promise.all([
+            fetch(`${apiBase}/api/users/admin/summary`),
+            fetchIfChanged(`${apiBase}/api/users/users-raw`),
+            fetchIfChanged(incidentsUrl(shown)),
+            fetchIfChanged(`${apiBase}/api/users/complaints`),
+        ]);
+        const users = usersRes.data;
+        const complaints = complaintsRes.data;
+
+        if (summaryRes.ok) updateStats(await summaryRes.json());
+        if (usersRes.changed) renderUsers(users);
+        if (incidentsRes.changed) {
+            incidents = incidentsRes.data;
+            incidentsCursor = incidentsRes.nextCursor;
+            renderIncidents(incidents);
+        }
+        if (complaintsRes.changed) renderComplaints(complaints);
     } catch (e) {
         console.error("Admin Load Error:", e);
     }
 }
 
-function updateStats(users, incidents, complaints) {
-    document.getElementById('statTotalUsers').innerText = users.length;
-    document.getElementById('statVolunteers').innerText = users.filter(u => u.role === 'volunteer').length;
-    document.getElementById('statIncidents').innerText = incidents.filter(i => i.status !== 'closed').length;
+// Counts come precomputed from the server (all rows, not just the loaded page)
+function updateStats(summary) {
+    document.getElementById('statTotalUsers').innerText = summary.users.total;
+    document.getElementById('statVolunteers').innerText = summary.users.by_role.volunteer || 0;
+    document.getElementById('statIncidents').innerText = summary.incidents.open;
     if (document.getElementById('statComplaints')) {
-        document.getElementById('statComplaints').innerText = complaints.length;
+        document.getElementById('statComplaints').innerText = summary.complaints.total;
     }
 }
 
@@ -99,6 +142,7 @@ function renderIncidents(incidents) {
             <td><span class="badge badge_${inc.status}">${inc.status}</span></td>
         </tr>
     `).join('');
+    document.getElementById('loadMoreIncidents').classList.toggle('hidden', !incidentsCursor);
 }
 
 function renderComplaints(complaints) {
@@ -224,6 +268,38 @@ async function deleteComplaint(id) {
     finally { isAdminProcessing = false; }
 }
 
+// --- LIVE INCIDENT EVENTS ---
+// Incident changes are pushed; users/complaints still refresh on a slow timer.
+let eventsLive = false;
+let eventsRetryMs = 1000;
+let refreshQueued = false;
+
+function scheduleRefresh() {
+    if (refreshQueued) return;
+    refreshQueued = true;
+    setTimeout(() => { refreshQueued = false; fetchAllData(); }, 200);
+}
+
+function connectIncidentEvents() {
+    const wsBase = (apiBase || window.location.origin).replace(/^http/, "ws");
+    const params = new URLSearchParams({ role: "admin" });
+    if (authToken()) params.set("token", authToken());
+    const ws = new WebSocket(`${wsBase}/ws/incidents?${params}`);
+    ws.onopen = () => { eventsLive = true; eventsRetryMs = 1000; scheduleRefresh(); };
+    ws.onmessage = scheduleRefresh;
+    ws.onclose = () => {
+        eventsLive = false;
+        setTimeout(connectIncidentEvents, eventsRetryMs);
+        eventsRetryMs = Math.min(eventsRetryMs * 2, 30000);
+    };
+}
+
 // Initial Load
 fetchAllData();
-setInterval(fetchAllData, 10000); // Auto refresh every 10s
+connectIncidentEvents();
+let refreshTicks = 0;
+setInterval(() => {
+    // every 10s without the socket, every 60s with it
+    refreshTicks += 1;
+    if (!eventsLive || refreshTicks % 6 === 0) fetchAllData();
+}, 10000);
@@ -0,0 +1,38 @@
+// Access token from login/signup: sent as "Authorization: Bearer ..." on every
+// API call, so the backend knows who is asking without another DB lookup.
+// Load this before the page script (it patches window.fetch).
+function authToken() {
+  return localStorage.getItem("token");
+}
+
+function logout() {
+  localStorage.removeItem("user");
+  localStorage.removeItem("token");
+}
+
+(function () {
+  const nativeFetch = window.fetch.bind(window);
+
+  window.fetch = async (input, init = {}) => {
+    const token = authToken();
+    const url = typeof input === "string" ? input : input.url;
+    if (!token || !url.includes("/api/")) return nativeFetch(input, init);
+
+    const headers = new Headers(init.headers || {});
+    if (!headers.has("Authorization")) headers.set("Authorization", `Bearer ${token}`);
+    const response = await nativeFetch(input, { ...init, headers });
+
+    if (response.status === 401 && response.headers.get("X-Auth-Optional")) {
+      // the route works without a token (e.g. one signed by another instance's
+      // key): drop the token, stay logged in and retry as a legacy request
+      localStorage.removeItem("token");
+      return nativeFetch(input, init);
+    }
+    if (response.status === 401) {
+      // expired or revoked (e.g. account removed): log in again
+      logout();
+      window.location.href = "login.html";
+    }
+    return response;
+  };
+})();
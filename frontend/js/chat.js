@@ -6,12 +6,25 @@ const chat_user = JSON.parse(localStorage.getItem("user"));
 
 let currentChatIncidentId = null;
 let chatPollInterval = null;
-let lastMessageId = 0;
+let shownMessageIds = new Set();
 let isFetchingChat = false;
+let chatEtag = null;
+// History is paged: open with the newest CHAT_PAGE_SIZE messages, then poll
+// for messages committed since (chatSince, a chat-stream position from the
+// server; message ids and timestamps can commit out of order).
+// chatAfterCursor is the newest message shown, sent as the read watermark.
+const CHAT_PAGE_SIZE = 50;
+let chatSince = null;
+let chatAfterCursor = null;
+let chatBeforeCursor = null;
 
 function openChat(incidentId, title, status) {
     currentChatIncidentId = incidentId;
-    lastMessageId = 0; // Reset for new chat
+    shownMessageIds = new Set(); // Reset for new chat
+    chatEtag = null;
+    chatSince = null;
+    chatAfterCursor = null;
+    chatBeforeCursor = null;
 
     document.getElementById("chatTitle").innerHTML = `<i class="fas fa-comments"></i> Chat: ${title}`;
     document.getElementById("chatModal").classList.add("active");
@@ -32,9 +45,8 @@ function openChat(incidentId, title, status) {
     const chatBody = document.getElementById("chatBody");
     chatBody.innerHTML = "<p id='loadingChat' style='text-align:center; color:#64748b; font-size:12px;'>Loading history...</p>";
 
-    // Immediate fetch
+    // Immediate fetch (marks as read once the first page is shown)
     fetchChatHistory();
-    markAsRead(incidentId);
 
     // Start polling every 3 seconds
     if (chatPollInterval) clearInterval(chatPollInterval);
@@ -43,7 +55,9 @@ function openChat(incidentId, title, status) {
 
 async function markAsRead(incidentId) {
     try {
-        await fetch(`${chat_apiBase}/api/users/incidents/${incidentId}/chat/read?user_id=${chat_user.id}`, {
+        const params = new URLSearchParams({ user_id: chat_user.id });
+        if (chatAfterCursor) params.set("up_to", chatAfterCursor); // only what was actually shown
+        await fetch(`${chat_apiBase}/api/users/incidents/${incidentId}/chat/read?${params}`, {
             method: "PUT"
         });
         // We don't call loadRequests/loadIncidents here because they run on intervals
@@ -64,8 +78,20 @@ async function fetchChatHistory() {
 
     isFetchingChat = true;
     try {
-        const res = await fetch(`${chat_apiBase}/api/users/incidents/${currentChatIncidentId}/chat`);
+        const headers = chatEtag ? { "If-None-Match": chatEtag } : {};
+        const params = chatSince
+            ? new URLSearchParams({ since: chatSince, limit: 100 })
+            : new URLSearchParams({ limit: CHAT_PAGE_SIZE });
+        const res = await fetch(`${chat_apiBase}/api/users/incidents/${currentChatIncidentId}/chat?${params}`, { headers });
+        if (res.status === 304) return; // nothing new since the last poll
         if (!res.ok) throw new Error("Failed to fetch chat");
+        chatEtag = res.headers.get("ETag");
+        chatSince = res.headers.get("X-Chat-Since") || chatSince;
+        chatAfterCursor = res.headers.get("X-After-Cursor") || chatAfterCursor;
+        if (chatBeforeCursor === null) {
+            chatBeforeCursor = res.headers.get("X-Before-Cursor") || "";
+            if (res.headers.get("X-Before-Cursor")) showLoadOlder();
+        }
         const messages = await res.json();
 
         const chatBody = document.getElementById("chatBody");
@@ -85,9 +111,8 @@ async function fetchChatHistory() {
 
         let newMessagesFound = false;
         messages.forEach(msg => {
-            if (msg.id > lastMessageId) {
+            if (!shownMessageIds.has(msg.id)) {
                 appendMessage(msg);
-                lastMessageId = msg.id; // Update last processed message ID
                 newMessagesFound = true;
             }
         });
@@ -103,9 +128,36 @@ async function fetchChatHistory() {
     }
 }
 
-function appendMessage(msg) {
+// "Load older" link at the top of the chat, backed by the before cursor
+function showLoadOlder() {
     const chatBody = document.getElementById("chatBody");
+    const link = document.createElement("p");
+    link.id = "loadOlderChat";
+    link.style.cssText = "text-align:center; color:#64748b; font-size:12px; cursor:pointer;";
+    link.textContent = "Load older messages";
+    link.onclick = loadOlderMessages;
+    chatBody.prepend(link);
+}
+
+async function loadOlderMessages() {
+    const link = document.getElementById("loadOlderChat");
+    if (!chatBeforeCursor || !currentChatIncidentId) return;
+    const params = new URLSearchParams({ before: chatBeforeCursor, limit: CHAT_PAGE_SIZE });
+    const res = await fetch(`${chat_apiBase}/api/users/incidents/${currentChatIncidentId}/chat?${params}`);
+    if (!res.ok) return;
+    const older = await res.json();
+    chatBeforeCursor = res.headers.get("X-Before-Cursor") || "";
+    // insert oldest first, each right below the link
+    older.reverse().forEach(msg => link.after(buildMessage(msg)));
+    if (!chatBeforeCursor) link.remove();
+}
+
+function appendMessage(msg) {
+    document.getElementById("chatBody").appendChild(buildMessage(msg));
+}
 
+function buildMessage(msg) {
+    shownMessageIds.add(msg.id);
     const div = document.createElement("div");
     const isMe = String(msg.sender_id) === String(chat_user.id);
 
@@ -114,7 +166,7 @@ function appendMessage(msg) {
         <span class="message_info">${isMe ? 'You' : msg.sender_name}</span>
         ${msg.message}
     `;
-    chatBody.appendChild(div);
+    return div;
 }
 
 function scrollToBottom() {
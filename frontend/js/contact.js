@@ -5,7 +5,7 @@ const loggedUser = JSON.parse(localStorage.getItem("user"));
 if (navLinks) {
     if (loggedUser) {
         navLinks.innerHTML += `
-            <a href="../index.html" class="nav_link" onclick="localStorage.removeItem('user')">Logout</a>
+            <a href="../index.html" class="nav_link" onclick="localStorage.removeItem('user'); localStorage.removeItem('token')">Logout</a>
         `;
     } else {
         navLinks.innerHTML += `
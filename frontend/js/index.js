@@ -9,7 +9,7 @@ const apiBase = isLocal ? `http://${hostname}:8500` : window.location.origin;
 if (navLinks) {
     if (loggedUser) {
         navLinks.innerHTML += `
-            <a href="index.html" class="nav_link" onclick="localStorage.removeItem('user');">Logout</a>
+            <a href="index.html" class="nav_link" onclick="localStorage.removeItem('user'); localStorage.removeItem('token');">Logout</a>
         `;
     } else {
         navLinks.innerHTML += `
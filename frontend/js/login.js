@@ -28,6 +28,9 @@ loginForm.addEventListener("submit", async (e) => {
 
         if (response.ok) {
             localStorage.setItem("user", JSON.stringify(data.user));
+            // no token when the server has no shared signing key
+            if (data.access_token) localStorage.setItem("token", data.access_token);
+            else localStorage.removeItem("token");
 
             if (data.user.role === "admin") {
                 window.location.href = "admin.html";
@@ -0,0 +1,9 @@
+// Keyset-paged listings: the server returns one page at a time and sets
+// X-Next-Cursor while more rows remain. Pages load the first page and fetch
+// the next one (withCursor) only when asked to load more.
+// Load this before the page script.
+const NEXT_CURSOR_HEADER = "X-Next-Cursor";
+
+function withCursor(url, cursor) {
+  return `${url}${url.includes("?") ? "&" : "?"}cursor=${encodeURIComponent(cursor)}`;
+}
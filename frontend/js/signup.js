@@ -129,6 +129,9 @@ signupForm.addEventListener("submit", async (e) => {
     if (response.ok) {
       if (roleValue === "user") {
         localStorage.setItem("user", JSON.stringify(data.user));
+        // no token when the server has no shared signing key
+        if (data.access_token) localStorage.setItem("token", data.access_token);
+        else localStorage.removeItem("token");
         alert("Welcome to SafeTracker! You are now logged in.");
         window.location.href = "user.html";
       } else {
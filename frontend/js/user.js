@@ -61,6 +61,18 @@ let currentLat = null;
 let currentLng = null;
 let editingId = null;
 let activeIncidentIds = [];
+let changeToken = null;
+let requestsById = new Map();
+
+// One page on load; "Load more" appends the next one. A reload re-reads
+// only as many requests as are on screen, never the whole history.
+const REQUEST_PAGE_SIZE = 50;
+const MAX_PAGE_SIZE = 500;  // server cap on ?limit
+let requestsCursor = null;
+
+function requestsUrl(limit) {
+    return `${apiBase}/api/users/incidents/user/${user.id}?limit=${limit}`;
+}
 
 async function reverseGeocode(lat, lng) {
     try {
@@ -142,13 +154,14 @@ function updatePositionData(position) {
 
     reverseGeocode(currentLat, currentLng);
 
-    // Send live location update to DB for active incidents
+    // Send live location for all active incidents in one request
     if (activeIncidentIds && activeIncidentIds.length > 0) {
-        activeIncidentIds.forEach(id => {
-            fetch(`${apiBase}/api/users/incidents/${id}/live-location?lat=${currentLat}&lng=${currentLng}`, {
-                method: 'PUT'
-            }).catch(e => console.error("Live coord update error:", e));
-        });
+        const fixes = activeIncidentIds.map(id => ({ incident_id: id, lat: currentLat, lng: currentLng }));
+        fetch(`${apiBase}/api/users/live-locations`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ fixes })
+        }).catch(e => console.error("Live coord update error:", e));
     }
 }
 
@@ -182,7 +195,12 @@ async function loadRequests() {
             return;
         }
 
-        const response = await fetch(`${apiBase}/api/users/incidents/user/${user.id}`);
+        // Take the change token first so nothing committed during the full load is missed
+        const tokenRes = await fetch(`${apiBase}/api/users/incidents/changes`);
+        if (tokenRes.ok) changeToken = (await tokenRes.json()).token;
+
+        const shown = Math.min(Math.max(requestsById.size, REQUEST_PAGE_SIZE), MAX_PAGE_SIZE);
+        const response = await fetch(requestsUrl(shown));
         if (!response.ok) {
             const errText = await response.text();
             console.error(`DEBUG: Fetch failed for user ${user.id}: Status ${response.status}`, errText);
@@ -191,14 +209,61 @@ async function loadRequests() {
 
         const data = await response.json();
         console.log(`DEBUG FETCH: URL /api/users/incidents/user/${user.id} -> Status ${response.status}`);
-        console.log(`DEBUG FETCH: Data received for user ${user.id}:`, JSON.stringify(data));
-        
+
+        requestsById = new Map(data.map(req => [req.id, req]));
+        requestsCursor = response.headers.get(NEXT_CURSOR_HEADER);
+        renderRequests();
+    } catch (e) {
+        console.error("Error loading requests:", e);
+    }
+}
+
+async function loadMoreRequests() {
+    if (!requestsCursor) return;
+    try {
+        const response = await fetch(withCursor(requestsUrl(REQUEST_PAGE_SIZE), requestsCursor));
+        if (!response.ok) return;
+        // a request the delta poll already added keeps its fresher copy
+        (await response.json()).forEach(req => {
+            if (!requestsById.has(req.id)) requestsById.set(req.id, req);
+        });
+        requestsCursor = response.headers.get(NEXT_CURSOR_HEADER);
+        renderRequests();
+    } catch (e) {
+        console.error("Error loading more requests:", e);
+    }
+}
+
+// Poll only the delta since the last token and patch the local copy
+async function pollChanges() {
+    if (!changeToken) return loadRequests();
+    try {
+        const url = `${apiBase}/api/users/incidents/changes?since=${encodeURIComponent(changeToken)}&user_id=${user.id}&reporter_id=${user.id}`;
+        const response = await fetch(url);
+        if (!response.ok) return;
+
+        const delta = await response.json();
+        changeToken = delta.token;
+        if (delta.changed.length === 0 && delta.deleted.length === 0) return;
+
+        delta.changed.forEach(req => requestsById.set(req.id, req));
+        delta.deleted.forEach(id => requestsById.delete(id));
+        renderRequests();
+    } catch (e) {
+        console.error("Error polling changes:", e);
+    }
+}
+
+function renderRequests() {
+    try {
+        const data = Array.from(requestsById.values());
         const list = document.getElementById("requestList");
         if (!list) {
             console.error("DEBUG: Element #requestList not found!");
             return;
         }
         list.innerHTML = "";
+        document.getElementById("loadMoreRequests").classList.toggle("hidden", !requestsCursor);
         
         if (!Array.isArray(data) || data.length === 0) {
             console.log("DEBUG: Data is empty or not an array");
@@ -290,7 +355,7 @@ async function loadRequests() {
 
         activeIncidentIds = activeIds;
     } catch (e) {
-        console.error("Error loading requests:", e);
+        console.error("Error rendering requests:", e);
     }
 }
 
@@ -435,5 +500,32 @@ async function deleteIncident(id) {
 }
 
 
+// --- LIVE INCIDENT EVENTS ---
+// The server pushes status changes for this user's requests; the delta poll
+// only runs on an event, or on a timer while the socket is down.
+let eventsLive = false;
+let eventsRetryMs = 1000;
+let pollQueued = false;
+
+function schedulePoll() {
+    if (pollQueued) return;
+    pollQueued = true;
+    setTimeout(() => { pollQueued = false; pollChanges(); }, 200);
+}
+
+function connectIncidentEvents() {
+    const params = new URLSearchParams({ role: "user", user_id: user.id });
+    if (authToken()) params.set("token", authToken());
+    const ws = new WebSocket(`${apiBase.replace(/^http/, "ws")}/ws/incidents?${params}`);
+    ws.onopen = () => { eventsLive = true; eventsRetryMs = 1000; schedulePoll(); };
+    ws.onmessage = schedulePoll;
+    ws.onclose = () => {
+        eventsLive = false;
+        setTimeout(connectIncidentEvents, eventsRetryMs);
+        eventsRetryMs = Math.min(eventsRetryMs * 2, 30000);
+    };
+}
+
 loadRequests();
-setInterval(loadRequests, 5000);
+connectIncidentEvents();
+setInterval(() => { if (!eventsLive) pollChanges(); }, 5000);
@@ -68,22 +68,90 @@ function getDistance(lat1, lon1, lat2, lon2) {
 }
 
 
-async function loadIncidents() {
+let changeToken = null;
+
+// Cheap delta poll; the full (filtered) reload only runs when something changed
+async function pollChanges() {
   try {
-    const url = `${apiBase}/api/users/incidents?user_id=${user.id}`;
+    const url = changeToken
+      ? `${apiBase}/api/users/incidents/changes?since=${encodeURIComponent(changeToken)}&user_id=${user.id}`
+      : `${apiBase}/api/users/incidents/changes`;
     const response = await fetch(url);
-    if (!response.ok) {
-      console.error("Failed to fetch incidents:", response.status);
-      return;
+    if (!response.ok) return;
+    const delta = await response.json();
+    const isFirst = changeToken === null;
+    changeToken = delta.token;
+    if (isFirst || delta.changed.length > 0 || delta.deleted.length > 0) {
+      loadIncidents();
     }
-    const data = await response.json();
-    
-    // Check if data is identical to previous load to prevent jumpy UI
-    const dataHash = JSON.stringify(data);
-    if (window.lastIncidentsHash === dataHash) {
-        return; 
+  } catch (error) {
+    console.error("Error polling changes:", error);
+  }
+}
+
+// One page per list on load; "Load more" appends the next page. A reload
+// re-reads only as many rows as are on screen, never every incident.
+const INCIDENT_PAGE_SIZE = 50;
+const MAX_PAGE_SIZE = 500;  // server cap on ?limit
+const incidentLists = {
+  open: { rows: [], cursor: null, button: "loadMoreOpen" },
+  mine: { rows: [], cursor: null, button: "loadMoreMine" },
+};
+
+// Open requests and this volunteer's own incidents, filtered server-side.
+// Once GPS is known, open requests come from the nearby search (nearest first, with distance).
+function incidentListUrl(name, limit) {
+  if (name === "mine") {
+    return `${apiBase}/api/users/incidents?user_id=${user.id}&volunteer_id=${user.id}&limit=${limit}`;
+  }
+  return (vLat && vLng)
+    ? `${apiBase}/api/users/incidents/nearby?lat=${vLat}&lng=${vLng}&radius_km=50&limit=${limit}&user_id=${user.id}`
+    : `${apiBase}/api/users/incidents?user_id=${user.id}&status=reported,pending&limit=${limit}`;
+}
+
+async function loadIncidents() {
+  try {
+    const names = Object.keys(incidentLists);
+    const responses = await Promise.all(names.map(name => {
+      const shown = Math.min(Math.max(incidentLists[name].rows.length, INCIDENT_PAGE_SIZE), MAX_PAGE_SIZE);
+      return fetch(incidentListUrl(name, shown));
+    }));
+    if (responses.some(res => !res.ok)) {
+      console.error("Failed to fetch incidents:", ...responses.map(res => res.status));
+      return;
     }
-    window.lastIncidentsHash = dataHash;
+    const pages = await Promise.all(responses.map(res => res.json()));
+    names.forEach((name, i) => {
+      incidentLists[name].rows = pages[i];
+      incidentLists[name].cursor = responses[i].headers.get(NEXT_CURSOR_HEADER);
+    });
+    renderIncidents();
+  } catch (error) {
+    console.error("Error loading incidents:", error);
+  }
+}
+
+async function loadMoreIncidents(name) {
+  const list = incidentLists[name];
+  if (!list.cursor) return;
+  try {
+    const res = await fetch(withCursor(incidentListUrl(name, INCIDENT_PAGE_SIZE), list.cursor));
+    if (!res.ok) return;
+    const seen = new Set(list.rows.map(inc => inc.id));
+    list.rows = list.rows.concat((await res.json()).filter(inc => !seen.has(inc.id)));
+    list.cursor = res.headers.get(NEXT_CURSOR_HEADER);
+    renderIncidents();
+  } catch (error) {
+    console.error("Error loading more incidents:", error);
+  }
+}
+
+function renderIncidents() {
+  try {
+    const openData = incidentLists.open.rows;
+    const mineData = incidentLists.mine.rows;
+    const seen = new Set(mineData.map(inc => inc.id));
+    const data = mineData.concat(openData.filter(inc => !seen.has(inc.id)));
 
     const liveList = document.getElementById("live_list");
     const historyList = document.getElementById("history_list");
@@ -115,6 +183,7 @@ async function loadIncidents() {
         const pA = getPriority(a);
         const pB = getPriority(b);
         if (pA !== pB) return pA - pB;
+        if (a.distance_km != null && b.distance_km != null) return a.distance_km - b.distance_km;
         return new Date(b.created_at) - new Date(a.created_at);
     });
 
@@ -131,7 +200,9 @@ async function loadIncidents() {
       if ((incident.status === "reported" || incident.status === "pending") && !incident.volunteer_id) {
         console.log(`DEBUG: Incident ${incident.id} MATCHES filter. Appending to liveList.`);
         
-        const nearbyBadge = ""; // Logic for nearby removed to show all requests as requested by user previously
+        const nearbyBadge = incident.distance_km != null
+          ? `<span style="color:#059669; font-size:13px;">📍 ${incident.distance_km.toFixed(1)} km · </span>`
+          : "";
 
         const div = document.createElement("div");
         div.className = "request";
@@ -251,8 +322,11 @@ async function loadIncidents() {
     if (liveList) liveList.scrollTop = liveScroll;
     if (historyList) historyList.scrollTop = historyScroll;
 
+    for (const list of Object.values(incidentLists)) {
+      document.getElementById(list.button).classList.toggle("hidden", !list.cursor);
+    }
   } catch (error) {
-    console.error("Error loading incidents:", error);
+    console.error("Error rendering incidents:", error);
   }
 }
 
@@ -279,5 +353,37 @@ async function updateStatus(incidentId, action) {
 }
 
 
-loadIncidents();
-setInterval(loadIncidents, 5000);
+// --- LIVE INCIDENT EVENTS ---
+// Pushed events for nearby open requests and this volunteer's assignments;
+// the delta poll only runs on an event, or on a timer while the socket is down.
+let eventsLive = false;
+let eventsRetryMs = 1000;
+let pollQueued = false;
+
+function schedulePoll() {
+  if (pollQueued) return;
+  pollQueued = true;
+  setTimeout(() => { pollQueued = false; pollChanges(); }, 200);
+}
+
+function connectIncidentEvents() {
+  const params = new URLSearchParams({ role: "volunteer", user_id: user.id });
+  if (authToken()) params.set("token", authToken());
+  if (vLat && vLng) {
+    params.set("lat", vLat);
+    params.set("lng", vLng);
+    params.set("radius_km", 50);
+  }
+  const ws = new WebSocket(`${apiBase.replace(/^http/, "ws")}/ws/incidents?${params}`);
+  ws.onopen = () => { eventsLive = true; eventsRetryMs = 1000; schedulePoll(); };
+  ws.onmessage = schedulePoll;
+  ws.onclose = () => {
+    eventsLive = false;
+    setTimeout(connectIncidentEvents, eventsRetryMs);
+    eventsRetryMs = Math.min(eventsRetryMs * 2, 30000);
+  };
+}
+
+pollChanges();
+connectIncidentEvents();
+setInterval(() => { if (!eventsLive) pollChanges(); }, 5000);
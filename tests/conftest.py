@@ -0,0 +1,43 @@
+"""Shared test setup: every module runs against a throwaway SQLite file.
+
+The DATABASE_URL exported in the shell is always replaced, and empty_db
+refuses to wipe anything that is not SQLite.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+TMP = tempfile.mkdtemp(prefix="safetracker_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP}/test.sqlite"
+os.environ.pop("VERCEL", None)
+sys.path.append(str(Path(__file__).resolve().parent.parent / "api"))
+
+import pytest  # noqa: E402
+from sqlalchemy import delete  # noqa: E402
+
+import auth  # noqa: E402
+import changes  # noqa: E402
+import database  # noqa: E402
+import locations  # noqa: E402
+import migrate  # noqa: E402
+import models  # noqa: E402
+import response_cache  # noqa: E402
+
+
+@pytest.fixture
+def empty_db():
+    engine = database.get_engine()
+    if engine.url.get_backend_name() != "sqlite":
+        pytest.exit(f"refusing to wipe {engine.url!r}: tests only run on sqlite", returncode=2)
+    migrate.upgrade()
+    with engine.begin() as conn:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            if table.name != models.SchemaVersion.__tablename__:
+                conn.execute(delete(table))
+    # per-process state built from the rows just deleted
+    response_cache.cache.clear()
+    auth.principal_cache._entries.clear()
+    changes.head_cache.invalidate()
+    locations.buffer = locations.LocationBuffer(interval=locations.buffer.interval)
+    return engine
@@ -0,0 +1,183 @@
+"""Access tokens, admin-only routes and the principal cache.
+
+    python -m pytest tests
+"""
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from sqlalchemy import insert
+
+import auth
+import index
+from models import Incident, User
+
+ADMIN = auth.SUPERADMIN_ID
+REPORTER_ID = 1
+VOLUNTEER_ID = 2
+
+
+@pytest.fixture
+def signing_key(monkeypatch):
+    monkeypatch.setenv("AUTH_SECRET_KEY", "test-secret")
+    monkeypatch.setattr(auth, "_secret", None)
+    yield
+    auth._secret = None
+
+
+@pytest.fixture
+def client(empty_db, signing_key):
+    with empty_db.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {"id": REPORTER_ID, "username": "reporter", "email": "r@example.com", "role": "user",
+             "is_approved": True},
+            {"id": VOLUNTEER_ID, "username": "volunteer", "email": "v@example.com", "role": "volunteer",
+             "is_approved": False},
+        ])
+        conn.execute(insert(Incident.__table__), [
+            {"id": 1, "title": "Incident", "status": "reported", "reporter_id": REPORTER_ID},
+        ])
+    with TestClient(index.app) as client:
+        yield client
+
+
+def bearer(user_id: int, role: str) -> dict:
+    return {"Authorization": f"Bearer {auth.create_access_token(user_id, role)}"}
+
+
+def b64(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+
+def rejected(token: str) -> str:
+    with pytest.raises(HTTPException) as raised:
+        auth.decode_access_token(token)
+    assert raised.value.status_code == 401
+    return raised.value.detail
+
+
+# --- tokens ---
+
+def test_token_round_trip(signing_key):
+    claims = auth.decode_access_token(auth.create_access_token(7, "volunteer"))
+    assert claims["sub"] == "7" and claims["role"] == "volunteer"
+
+
+def test_tampered_payload_is_rejected(signing_key):
+    header, _, signature = auth.create_access_token(7, "user").split(".")
+    forged = b64({"sub": "0", "role": "admin", "exp": 2**40})
+    assert rejected(f"{header}.{forged}.{signature}") == "Invalid token"
+
+
+def test_tampered_signature_is_rejected(signing_key):
+    token = auth.create_access_token(7, "user")
+    flipped = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+    assert rejected(flipped) == "Invalid token"
+
+
+def test_other_key_is_rejected(signing_key, monkeypatch):
+    token = auth.create_access_token(7, "user")
+    monkeypatch.setenv("AUTH_SECRET_KEY", "another-instance")
+    monkeypatch.setattr(auth, "_secret", None)
+    assert rejected(token) == "Invalid token"
+
+
+def test_wrong_header_is_rejected(signing_key):
+    _, payload, signature = auth.create_access_token(7, "user").split(".")
+    assert rejected(f"{b64({'alg': 'none', 'typ': 'JWT'})}.{payload}.{signature}") == "Invalid token"
+    assert rejected("not-a-token") == "Invalid token"
+
+
+def test_expired_token_is_rejected(signing_key, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_TOKEN_TTL_SECONDS", -1)
+    assert rejected(auth.create_access_token(7, "user")) == "Token expired"
+
+
+# --- configuration ---
+
+def test_no_key_means_no_tokens(monkeypatch):
+    monkeypatch.delenv("AUTH_SECRET_KEY", raising=False)
+    monkeypatch.delenv("AUTH_REQUIRED", raising=False)
+    monkeypatch.setattr(auth, "_secret", None)
+    assert not auth.tokens_enabled()
+    auth.check_configuration()  # logs, but starts
+    with pytest.raises(RuntimeError):
+        auth.create_access_token(7, "user")
+
+    monkeypatch.setenv("AUTH_REQUIRED", "1")
+    with pytest.raises(RuntimeError):
+        auth.check_configuration()
+
+
+@pytest.mark.parametrize("env", [{"VERCEL": "1"}, {"WEB_CONCURRENCY": "4"}])
+def test_random_dev_key_only_for_one_local_process(monkeypatch, env):
+    monkeypatch.delenv("AUTH_SECRET_KEY", raising=False)
+    monkeypatch.setenv("AUTH_RANDOM_DEV_KEY", "1")
+    assert auth.tokens_enabled()
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    assert not auth.tokens_enabled()
+
+
+# --- routes ---
+
+def test_bad_token_on_optional_route_is_marked_optional(client, monkeypatch):
+    monkeypatch.delenv("AUTH_REQUIRED", raising=False)
+    url = f"/api/users/incidents/user/{REPORTER_ID}"
+    assert client.get(url).status_code == 200
+
+    # what auth.js does: drop the token on X-Auth-Optional and retry without it
+    response = client.get(url, headers={"Authorization": "Bearer bad.token.here"})
+    assert response.status_code == 401
+    assert response.headers.get(auth.AUTH_OPTIONAL_HEADER) == "1"
+    assert client.get(url).status_code == 200
+
+    monkeypatch.setenv("AUTH_REQUIRED", "1")
+    response = client.get(url, headers={"Authorization": "Bearer bad.token.here"})
+    assert response.status_code == 401
+    assert auth.AUTH_OPTIONAL_HEADER not in response.headers
+
+
+def test_admin_routes_need_an_admin_token(client, monkeypatch):
+    monkeypatch.delenv("AUTH_REQUIRED", raising=False)
+    url = "/api/users/admin/summary"
+    assert client.get(url).status_code == 401
+    bad = client.get(url, headers={"Authorization": "Bearer bad.token.here"})
+    assert bad.status_code == 401 and auth.AUTH_OPTIONAL_HEADER not in bad.headers
+    assert client.get(url, headers=bearer(REPORTER_ID, "user")).status_code == 403
+    assert client.get(url, headers=bearer(ADMIN, "admin")).status_code == 200
+    assert client.delete(f"/api/users/admin/user/{REPORTER_ID}").status_code == 401
+
+
+def test_admin_socket_needs_an_admin_token(client, monkeypatch):
+    monkeypatch.delenv("AUTH_REQUIRED", raising=False)
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect("/ws/incidents?role=admin"):
+            pass
+    assert closed.value.code == 1008
+    with client.websocket_connect(f"/ws/incidents?role=admin&token={auth.create_access_token(ADMIN, 'admin')}"):
+        pass
+
+
+def test_approval_takes_effect_for_a_cached_principal(client):
+    volunteer = bearer(VOLUNTEER_ID, "volunteer")
+    accept = f"/api/users/incidents/1/accept?volunteer_id={VOLUNTEER_ID}"
+    assert client.put(accept, headers=volunteer).status_code == 403  # pending; now cached
+
+    assert client.put(f"/api/users/admin/approve/{VOLUNTEER_ID}", headers=bearer(ADMIN, "admin")).status_code == 200
+    assert client.put(accept, headers=volunteer).status_code == 200
+
+
+def test_deleted_user_token_is_rejected(client):
+    reporter = bearer(REPORTER_ID, "user")
+    url = f"/api/users/incidents/user/{REPORTER_ID}"
+    assert client.get(url, headers=reporter).status_code == 200  # principal now cached
+
+    assert client.delete(f"/api/users/admin/user/{REPORTER_ID}", headers=bearer(ADMIN, "admin")).status_code == 200
+    response = client.get(url, headers=reporter)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "User no longer exists"
+
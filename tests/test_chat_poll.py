@@ -0,0 +1,103 @@
+"""Chat polls must not skip a message that commits behind the newest one shown.
+
+Runs the real chat route through TestClient against a throwaway SQLite
+database.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+TMP = tempfile.mkdtemp(prefix="test_chat_poll_")
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP}/test.sqlite"
+os.environ.pop("VERCEL", None)
+sys.path.append(str(Path(__file__).resolve().parent.parent / "api"))
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import delete, insert  # noqa: E402
+
+import database  # noqa: E402
+import index  # noqa: E402
+import migrate  # noqa: E402
+from models import ChatMessage, ChatReadMark, Incident, User  # noqa: E402
+
+INCIDENT_ID = 1
+REPORTER_ID = 1
+VOLUNTEER_ID = 2
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture(scope="module")
+def client():
+    migrate.upgrade()
+    with TestClient(index.app) as client:
+        yield client
+
+
+@pytest.fixture
+def incident():
+    # wipes tables: never against anything but a throwaway sqlite file
+    assert str(database.get_engine().url).startswith("sqlite:"), "tests must run on sqlite"
+    with database.get_engine().begin() as conn:
+        for model in (ChatReadMark, ChatMessage, Incident, User):
+            conn.execute(delete(model.__table__))
+        conn.execute(insert(User.__table__), [
+            {"id": REPORTER_ID, "username": "reporter", "email": "r@example.com", "role": "user"},
+            {"id": VOLUNTEER_ID, "username": "volunteer", "email": "v@example.com", "role": "volunteer"},
+        ])
+        conn.execute(insert(Incident.__table__), [{
+            "id": INCIDENT_ID, "title": "Incident", "status": "in_progress",
+            "reporter_id": REPORTER_ID, "volunteer_id": VOLUNTEER_ID,
+        }])
+    return INCIDENT_ID
+
+
+def send(text: str, timestamp: datetime):
+    # through the ORM, so the message takes its chat-stream version on commit
+    db = database.SessionLocal()
+    try:
+        db.add(ChatMessage(incident_id=INCIDENT_ID, sender_id=VOLUNTEER_ID, message=text, timestamp=timestamp))
+        db.commit()
+    finally:
+        db.close()
+
+
+def get(client, **params):
+    response = client.get(f"/api/users/incidents/{INCIDENT_ID}/chat", params=params)
+    assert response.status_code == 200, response.text
+    return response
+
+
+def test_poll_returns_a_message_stamped_before_the_newest_shown(client, incident):
+    send("first", START + timedelta(seconds=10))
+    opened = get(client, limit=50)
+    assert [m["message"] for m in opened.json()] == ["first"]
+    since = opened.headers["X-Chat-Since"]
+
+    # stamped earlier than "first" but committed after the page was read,
+    # as with a slow transaction or another worker
+    send("late", START + timedelta(seconds=5))
+    polled = get(client, since=since, limit=100)
+    assert [m["message"] for m in polled.json()] == ["late"]
+
+    # nothing comes back twice once the position has moved on
+    idle = get(client, since=polled.headers["X-Chat-Since"], limit=100)
+    assert idle.json() == []
+
+
+def test_poll_pages_resume_where_they_stopped(client, incident):
+    opened = get(client, limit=50)
+    since = opened.headers["X-Chat-Since"]
+    for i in range(5):
+        send(f"m{i}", START + timedelta(seconds=i))
+
+    seen = []
+    for _ in range(5):
+        polled = get(client, since=since, limit=2)
+        since = polled.headers["X-Chat-Since"]
+        seen.extend(m["message"] for m in polled.json())
+    assert seen == [f"m{i}" for i in range(5)]
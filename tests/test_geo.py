@@ -0,0 +1,152 @@
+"""Nearby search: geohash cells, covering blocks and distance ranking.
+
+The pure helpers run on their own; /incidents/nearby runs through
+TestClient against the shared throwaway SQLite database (conftest.py).
+
+    python -m pytest tests
+"""
+import math
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+import geo
+import index
+from models import Incident, User
+
+REPORTER_ID = 1
+# at lat 0 a 10 km search uses precision-4 cells; one of their edges runs along
+# this meridian (360 / 2**10 degrees of longitude per cell)
+CELL_EDGE_LNG = 360 / 2 ** 10
+
+
+def offset(lat: float, lng: float, km_north: float, km_east: float):
+    """A point roughly `km` away (small offsets; wraps across the antimeridian)."""
+    d_lat = km_north / geo.KM_PER_DEGREE
+    d_lng = km_east / (geo.KM_PER_DEGREE * math.cos(math.radians(lat)))
+    return lat + d_lat, (lng + d_lng + 180.0) % 360.0 - 180.0
+
+
+def covered(cells, lat: float, lng: float) -> bool:
+    return any(geo.encode_geohash(lat, lng).startswith(cell) for cell in cells)
+
+
+# --- cells ---
+
+def test_geohash_for():
+    assert geo.encode_geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geo.geohash_for(57.64911, 10.40744) == "u4pruydqq"
+    assert geo.geohash_for(None, 10.0) is None and geo.geohash_for(10.0, None) is None
+    min_lat, min_lng, max_lat, max_lng = geo.decode_bbox(geo.geohash_for(13.0827, 80.2707))
+    assert min_lat <= 13.0827 <= max_lat and min_lng <= 80.2707 <= max_lng
+
+
+@pytest.mark.parametrize("lat, lng", [
+    (0.1, CELL_EDGE_LNG + 1e-6),   # just east of a cell edge
+    (0.1, CELL_EDGE_LNG - 1e-6),   # just west of it
+    (0.0, 0.0),                    # four cells meet
+    (13.0827, 80.2707),
+    (60.0, -150.0),                # narrow cells far from the equator
+    (0.0, 179.99),                 # antimeridian, both sides
+    (0.0, -179.99),
+])
+@pytest.mark.parametrize("radius_km", [0.5, 10.0, 50.0])
+def test_covering_cells_hold_every_point_in_the_radius(lat, lng, radius_km):
+    cells = geo.covering_cells(lat, lng, radius_km)
+    rng = random.Random(f"{lat},{lng},{radius_km}")
+    for _ in range(200):
+        km = radius_km * rng.random() ** 0.5
+        bearing = rng.uniform(0, 2 * math.pi)
+        point = offset(lat, lng, km * math.cos(bearing), km * math.sin(bearing))
+        if geo.haversine_km(lat, lng, *point) <= radius_km:
+            assert covered(cells, *point), (point, cells)
+
+
+def test_covering_cells_cross_the_antimeridian():
+    east = geo.covering_cells(0.0, 179.99, 10.0)
+    assert covered(east, 0.0, -179.98)
+    assert any(cell < "8" for cell in east) and any(cell >= "8" for cell in east)  # western and eastern hemispheres
+
+
+def test_rank_by_distance():
+    here = (13.0, 80.0)
+    points = {
+        "far": offset(*here, 0, 9.0),
+        "near": offset(*here, 1.0, 0),
+        "outside": offset(*here, 0, 11.0),
+        "mid": offset(*here, -5.0, 0),
+        "unknown": (None, None),
+    }
+    ranked = geo.rank_by_distance(points.items(), *here, 10.0, 10, position=lambda item: item[1])
+    assert [name for (name, _), _ in ranked] == ["near", "mid", "far"]
+    assert [round(d) for _, d in ranked] == [1, 5, 9]
+    assert len(geo.rank_by_distance(points.items(), *here, 10.0, 2, position=lambda item: item[1])) == 2
+
+
+def test_in_memory_index_matches_a_full_scan():
+    rng = random.Random(7)
+    index_ = geo.InMemoryGeoIndex()
+    points = {}
+    for key in range(500):
+        points[key] = (rng.uniform(12.5, 13.5), rng.uniform(79.5, 80.5))
+        index_.upsert(key, *points[key])
+    for key in range(0, 500, 5):
+        points[key] = (rng.uniform(12.5, 13.5), rng.uniform(79.5, 80.5))  # moved
+        index_.upsert(key, *points[key])
+    for key in range(1, 500, 7):
+        del points[key]
+        index_.remove(key)
+    assert len(index_) == len(points)
+
+    for radius_km in (1.0, 5.0, 25.0):
+        expected = geo.rank_by_distance(points.items(), 13.0, 80.0, radius_km, 50, position=lambda item: item[1])
+        assert index_.nearby(13.0, 80.0, radius_km, 50) == [(key, d) for (key, _), d in expected]
+
+
+# --- route ---
+
+@pytest.fixture
+def client(empty_db):
+    with empty_db.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {"id": REPORTER_ID, "username": "reporter", "email": "r@example.com", "role": "user"},
+        ])
+    with TestClient(index.app) as client:
+        yield client
+
+
+def place(engine, incidents):
+    with engine.begin() as conn:
+        conn.execute(insert(Incident.__table__), [
+            {"id": i, "title": f"Incident {i}", "status": "reported", "reporter_id": REPORTER_ID,
+             "latitude": lat, "longitude": lng, "geohash": geo.geohash_for(lat, lng)}
+            for i, (lat, lng) in incidents.items()
+        ])
+
+
+def nearby(client, lat: float, lng: float, radius_km: float):
+    response = client.get("/api/users/incidents/nearby",
+                          params={"lat": lat, "lng": lng, "radius_km": radius_km, "limit": 50})
+    assert response.status_code == 200, response.text
+    return {row["id"]: row["distance_km"] for row in response.json()}
+
+
+def test_nearby_includes_the_radius_across_a_cell_edge(client, empty_db):
+    here = (0.1, CELL_EDGE_LNG + 0.001)
+    place(empty_db, {
+        1: offset(*here, 0, -9.9),    # other side of the cell edge, inside
+        2: offset(*here, 0, -10.1),   # other side, just outside
+        3: offset(*here, 9.9, 0),
+        4: offset(*here, 0, 10.1),
+    })
+    found = nearby(client, *here, 10.0)
+    assert set(found) == {1, 3}
+    assert all(distance <= 10.0 for distance in found.values())
+
+
+def test_nearby_across_the_antimeridian(client, empty_db):
+    place(empty_db, {1: (0.0, -179.98), 2: (0.0, 179.0)})
+    assert set(nearby(client, 0.0, 179.99, 10.0)) == {1}
+    assert set(nearby(client, 0.0, -179.99, 10.0)) == {1}
@@ -0,0 +1,59 @@
+"""HeadCache must keep settling Postgres stream heads while writers stay open.
+
+Drives HeadCache._settled_heads with a stand-in session that returns
+scripted sequence heads and snapshot bounds, so no Postgres is needed.
+
+    python -m pytest tests
+"""
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "api"))
+
+import changes  # noqa: E402
+
+
+class ScriptedSession:
+    """Answers the two queries of one refresh: the sequence heads, then (xmin, xmax)."""
+
+    def __init__(self):
+        self.answers = []
+
+    def execute(self, statement):
+        answer = self.answers.pop(0)
+        return type("Result", (), {"one": lambda self: answer})()
+
+
+def refresh(cache, db, heads, xmin, xmax):
+    db.answers = [heads, (xmin, xmax)]
+    return cache._settled_heads(db)
+
+
+def test_heads_settle_behind_a_held_open_writer():
+    cache = changes.HeadCache()
+    db = ScriptedSession()
+    writer_xid = 100
+
+    # far more refreshes than MAX_UNSETTLED_HEADS while the writer keeps xmin pinned
+    for i in range(1, 3 * changes.MAX_UNSETTLED_HEADS):
+        assert refresh(cache, db, (i, i), writer_xid, writer_xid + i) == (0, 0)
+
+    # writer commits: nothing older is running, so everything read so far settles
+    done = writer_xid + 3 * changes.MAX_UNSETTLED_HEADS
+    assert refresh(cache, db, (500, 500), done, done) == (500, 500)
+
+
+def test_heads_keep_moving_under_overlapping_long_writers():
+    cache = changes.HeadCache()
+    db = ScriptedSession()
+    lifetime = changes.MAX_UNSETTLED_HEADS + 8  # refreshes each writer stays open
+
+    settled = []
+    for i in range(1, 10 * lifetime):
+        # one writer starts per refresh and commits `lifetime` refreshes later,
+        # so the oldest running xid always trails the snapshot xmax
+        settled.append(refresh(cache, db, (i, i), max(1, i - lifetime), i + 1))
+
+    assert settled[-1] > (0, 0)
+    # and they keep advancing rather than freezing at one value
+    assert settled[-1] > settled[-lifetime]
@@ -0,0 +1,94 @@
+"""Incident events are published without holding up the write that caused them.
+
+Drives a private IncidentEventHub on its own event loop, with emit() called
+from a worker thread as the sync routes do; no database involved.
+
+    python -m pytest tests
+"""
+import asyncio
+import time
+
+import pytest
+
+import incident_events
+from broadcast import BroadcastBackend
+from incident_events import IncidentEventHub
+
+EVENT = {"type": "incident", "action": "started", "id": 1, "status": "in_progress",
+         "reporter_id": 1, "volunteer_id": 2, "geohash": None}
+
+
+class StalledBackend(BroadcastBackend):
+    """A NOTIFY that takes as long as the test wants, or fails."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.release = None
+        self.published = []
+
+    async def start(self, handler):
+        self.release = asyncio.Event()
+
+    async def publish(self, room, message):
+        await self.release.wait()
+        if self.fail:
+            raise ConnectionError("NOTIFY failed")
+        self.published.append(message)
+
+
+def run_with_hub(monkeypatch, backend, scenario):
+    hub = IncidentEventHub(backend)
+    monkeypatch.setattr(incident_events, "hub", hub)
+
+    async def main():
+        await hub.start()
+        await scenario(hub)
+
+    asyncio.run(main())
+
+
+async def emit_from_worker_thread() -> float:
+    started = time.monotonic()
+    await asyncio.to_thread(incident_events.emit, EVENT)
+    return time.monotonic() - started
+
+
+async def settle(condition):
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("publish never completed")
+
+
+def test_emit_does_not_wait_for_the_publish(monkeypatch):
+    backend = StalledBackend()
+
+    async def scenario(hub):
+        assert await emit_from_worker_thread() < 0.5
+        assert backend.published == []  # still stalled, the route has long returned
+        backend.release.set()
+        await settle(lambda: backend.published == [EVENT])
+
+    run_with_hub(monkeypatch, backend, scenario)
+
+
+def test_a_failing_publish_never_reaches_the_route(monkeypatch, caplog):
+    backend = StalledBackend(fail=True)
+
+    async def scenario(hub):
+        await emit_from_worker_thread()  # no exception here
+        backend.release.set()
+        await settle(lambda: "incident event publish failed" in caplog.text)
+
+    run_with_hub(monkeypatch, backend, scenario)
+
+
+@pytest.mark.parametrize("loop", [None, "closed"])
+def test_emit_outside_a_running_app_is_a_no_op(monkeypatch, loop):
+    hub = IncidentEventHub(StalledBackend())
+    if loop == "closed":
+        hub._loop = asyncio.new_event_loop()
+        hub._loop.close()
+    monkeypatch.setattr(incident_events, "hub", hub)
+    incident_events.emit(EVENT)
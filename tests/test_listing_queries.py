@@ -0,0 +1,118 @@
+"""Incident listings must cost the same number of SQL statements for 1 or N incidents.
+
+Runs the real routes through TestClient against a throwaway SQLite
+database and counts cursor executions per request.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+TMP = tempfile.mkdtemp(prefix="test_listing_queries_")
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP}/test.sqlite"
+os.environ.pop("VERCEL", None)
+sys.path.append(str(Path(__file__).resolve().parent.parent / "api"))
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import delete, event, insert  # noqa: E402
+
+import changes  # noqa: E402
+import database  # noqa: E402
+import index  # noqa: E402
+import locations  # noqa: E402
+import migrate  # noqa: E402
+from models import ChatMessage, Incident, User  # noqa: E402
+
+REPORTER_ID = 1
+VOLUNTEER_ID = 2
+
+
+@pytest.fixture(scope="module")
+def client():
+    migrate.upgrade()
+    with TestClient(index.app) as client:
+        yield client
+
+
+def seed(incidents: int):
+    with database.get_engine().begin() as conn:
+        conn.execute(delete(ChatMessage.__table__))
+        conn.execute(delete(Incident.__table__))
+        conn.execute(delete(User.__table__))
+        conn.execute(insert(User.__table__), [
+            {"id": REPORTER_ID, "username": "reporter", "email": "r@example.com", "role": "user"},
+            {"id": VOLUNTEER_ID, "username": "volunteer", "email": "v@example.com", "role": "volunteer"},
+        ])
+        start = datetime(2024, 1, 1)
+        conn.execute(insert(Incident.__table__), [
+            {
+                "id": i,
+                "title": f"Incident {i}",
+                "full_address": f"{i} Example Street",
+                "latitude": 13.0,
+                "longitude": 80.2,
+                "status": "in_progress",
+                "created_at": start + timedelta(seconds=i),
+                "reporter_id": REPORTER_ID,
+                "volunteer_id": VOLUNTEER_ID,
+            }
+            for i in range(1, incidents + 1)
+        ])
+        conn.execute(insert(ChatMessage.__table__), [
+            {"incident_id": i, "sender_id": VOLUNTEER_ID, "message": "on my way",
+             "timestamp": start + timedelta(seconds=i)}
+            for i in range(1, incidents + 1)
+        ])
+
+
+def statements_for(client, url: str, expected_rows: int) -> int:
+    changes.head_cache.invalidate()  # same cold start for every run
+    executed = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    engine = database.get_engine()
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert len(body) == expected_rows
+    assert all(row["unread_count"] == 1 for row in body)
+    return len(executed)
+
+
+@pytest.mark.parametrize("url", [
+    f"/api/users/incidents?user_id={REPORTER_ID}",
+    f"/api/users/incidents/user/{REPORTER_ID}",
+    f"/api/users/incidents?user_id={REPORTER_ID}&limit=100",
+])
+def test_listing_query_count_is_constant(client, url):
+    seed(1)
+    one = statements_for(client, url, 1)
+    seed(50)
+    many = statements_for(client, url, 50)
+    assert one == many
+
+
+def test_buffered_fix_changes_the_listing_etag(client, monkeypatch):
+    seed(1)
+    monkeypatch.setattr(locations, "buffer", locations.LocationBuffer(interval=3600))
+    url = f"/api/users/incidents?user_id={REPORTER_ID}"
+    first = client.get(url)
+    etag = first.headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    # buffered, not flushed: no stream head moves, but the listing shows the fix
+    locations.buffer.put({1: (13.5, 80.5)})
+    moved = client.get(url, headers={"If-None-Match": etag})
+    assert moved.status_code == 200
+    assert (moved.json()[0]["latitude"], moved.json()[0]["longitude"]) == (13.5, 80.5)
+    assert client.get(url, headers={"If-None-Match": moved.headers["ETag"]}).status_code == 304
@@ -0,0 +1,164 @@
+"""Live-location buffer: coalescing, retries, drops, inline writes, known ids.
+
+write_positions is swapped for a recorder that can fail on demand, so the
+buffer logic runs without touching the database except where noted
+(reporters, the live-location route), which use the shared throwaway SQLite
+database (conftest.py).
+
+    python -m pytest tests
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+import index
+import locations
+from models import Incident, User
+
+AT = 1_700_000_000.0
+
+
+class Writer:
+    """Stands in for locations.write_positions."""
+
+    def __init__(self):
+        self.calls = []
+        self.fail = False
+        self.during = None  # run inside the write, e.g. a put racing the flush
+
+    def __call__(self, fixes, trail=None):
+        self.calls.append((dict(fixes), {i: list(p) for i, p in (trail or {}).items()}))
+        if self.during:
+            self.during()
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        return set()
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    writer = Writer()
+    monkeypatch.setattr(locations, "write_positions", writer)
+    return writer
+
+
+@pytest.fixture
+def buffer(monkeypatch):
+    buffer = locations.LocationBuffer(interval=3600)
+    monkeypatch.setattr(buffer, "_ensure_thread", lambda: None)  # flushed by hand
+    return buffer
+
+
+def test_fixes_coalesce_but_every_point_is_kept(buffer, writer):
+    buffer.put({1: (13.0, 80.0)}, at=AT)
+    buffer.put({1: (13.1, 80.1), 2: (12.0, 79.0)}, at=AT + 1)
+    assert buffer.coalesced == 1
+    assert buffer.latest(1) == (13.1, 80.1)
+
+    assert buffer.flush() == 2
+    fixes, trail = writer.calls[0]
+    assert fixes == {1: (13.1, 80.1), 2: (12.0, 79.0)}
+    assert trail[1] == [(AT, 13.0, 80.0), (AT + 1, 13.1, 80.1)]
+    assert buffer.flush() == 0 and len(writer.calls) == 1
+
+
+def test_failed_flush_is_requeued_and_newer_fixes_win(buffer, writer):
+    buffer.put({1: (13.0, 80.0), 2: (12.0, 79.0)}, at=AT)
+    writer.fail = True
+    writer.during = lambda: buffer.put({1: (13.5, 80.5)}, at=AT + 1)
+    buffer.flush()
+    assert buffer.failures == 1
+    # still served while retried; the newer fix for 1 replaced the failed one
+    assert buffer.latest(1) == (13.5, 80.5) and buffer.latest(2) == (12.0, 79.0)
+    assert buffer.unflushed_track(1) == [(AT, 13.0, 80.0), (AT + 1, 13.5, 80.5)]
+
+    writer.fail, writer.during = False, None
+    buffer.flush()
+    assert buffer.failures == 0 and buffer.flushed == 2
+    fixes, trail = writer.calls[-1]
+    assert fixes == {1: (13.5, 80.5), 2: (12.0, 79.0)}
+    assert trail[1] == [(AT, 13.0, 80.0), (AT + 1, 13.5, 80.5)]
+    assert buffer.latest(1) is None and buffer.unflushed_track(1) == []
+
+
+def test_requeued_trail_is_bounded(buffer, writer, monkeypatch):
+    monkeypatch.setattr(locations, "MAX_BUFFERED_TRACK_POINTS", 3)
+    for i in range(5):
+        buffer.put({1: (13.0 + i, 80.0)}, at=AT + i)
+    writer.fail = True
+    buffer.flush()
+    assert [p[0] for p in buffer.unflushed_track(1)] == [AT + 2, AT + 3, AT + 4]  # newest kept
+
+
+def test_batch_is_dropped_after_the_retries(buffer, writer, monkeypatch):
+    monkeypatch.setattr(locations, "LOCATION_FLUSH_MAX_RETRIES", 2)
+    buffer.put({1: (13.0, 80.0), 2: (12.0, 79.0)}, at=AT)
+    writer.fail = True
+    buffer.flush()
+    buffer.flush()
+    generation = buffer.generation
+    # a fix lands while the last attempt is failing
+    writer.during = lambda: buffer.put({1: (13.5, 80.5), 3: (11.0, 78.0)}, at=AT + 1)
+    buffer.flush()
+
+    assert buffer.dropped == 2 and buffer.failures == 0
+    assert buffer.generation > generation
+    # everything buffered for the dropped incidents is gone, fixes and trail alike
+    assert buffer.latest(1) is None and buffer.unflushed_track(1) == []
+    assert buffer.latest(2) is None and buffer.unflushed_track(2) == []
+    # an incident that was not in the batch keeps its fix and gets fresh retries
+    assert buffer.latest(3) == (11.0, 78.0)
+    writer.fail, writer.during = False, None
+    buffer.flush()
+    assert writer.calls[-1] == ({3: (11.0, 78.0)}, {3: [(AT + 1, 11.0, 78.0)]})
+
+
+def test_forget_drops_buffered_state(buffer, writer):
+    buffer.put({1: (13.0, 80.0)}, at=AT)
+    generation = buffer.generation
+    buffer.forget(1)
+    assert buffer.latest(1) is None and buffer.unflushed_track(1) == []
+    assert buffer.generation > generation
+    assert buffer.flush() == 0
+
+
+# --- against the database ---
+
+@pytest.fixture
+def incidents(empty_db):
+    with empty_db.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {"id": 1, "username": "reporter", "email": "r@example.com", "role": "user"},
+        ])
+        conn.execute(insert(Incident.__table__), [
+            {"id": i, "title": f"Incident {i}", "status": "reported", "reporter_id": 1} for i in range(1, 6)
+        ])
+    return empty_db
+
+
+def test_inline_write_failure_is_a_503(incidents, writer, monkeypatch):
+    monkeypatch.setattr(locations, "buffer", locations.LocationBuffer(interval=0))
+    with TestClient(index.app) as client:
+        url = "/api/users/incidents/1/live-location?lat=13.0&lng=80.0"
+        writer.fail = True
+        response = client.put(url)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        # nothing was kept back: the client's retry is the only copy
+        assert locations.buffer.latest(1) is None
+
+        writer.fail = False
+        assert client.put(url).status_code == 200
+        fixes, trail = writer.calls[-1]
+        assert fixes == {1: (13.0, 80.0)} and [p[1:] for p in trail[1]] == [(13.0, 80.0)]
+        assert locations.buffer.latest(1) is None  # written, not buffered
+
+
+def test_known_ids_are_bounded_least_recently_used_first(incidents, buffer, monkeypatch):
+    monkeypatch.setattr(locations, "MAX_KNOWN_IDS", 3)
+    assert buffer.reporters([1, 2, 3]) == {1: 1, 2: 1, 3: 1}
+    buffer.reporters([1])      # 1 is now the most recently used
+    buffer.reporters([4])      # evicts 2, the least recently used
+    assert list(buffer._known_ids) == [3, 1, 4]
+    assert buffer.reporters([99]) == {}  # unknown ids are never cached
+    assert len(buffer._known_ids) == 3
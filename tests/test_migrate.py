@@ -0,0 +1,103 @@
+"""Schema migrations: idempotent reruns, partial upgrades, pre-runner databases.
+
+Each test migrates its own SQLite file, apart from the shared test database.
+
+    python -m pytest tests
+"""
+import pytest
+from sqlalchemy import create_engine, func, insert, inspect, select, text
+
+import migrate
+import summary
+from models import Incident, SchemaVersion, SummaryCounter, User
+
+ALL_VERSIONS = [m.version for m in migrate.MIGRATIONS]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/migrate.sqlite")
+    yield engine
+    engine.dispose()
+
+
+def schema(engine) -> dict:
+    inspector = inspect(engine)
+    return {
+        table: (
+            sorted(c["name"] for c in inspector.get_columns(table)),
+            sorted(i["name"] for i in inspector.get_indexes(table)),
+        )
+        for table in inspector.get_table_names()
+    }
+
+
+def recorded_versions(engine) -> list:
+    with engine.connect() as conn:
+        return [v for (v,) in conn.execute(select(SchemaVersion.version).order_by(SchemaVersion.version))]
+
+
+def test_upgrade_twice_is_idempotent(engine):
+    assert migrate.schema_status(engine)["up_to_date"] is False
+    assert migrate.upgrade(engine) == ALL_VERSIONS
+    status = migrate.schema_status(engine)
+    assert status["up_to_date"] and status["current"] == migrate.LATEST_VERSION
+    before = schema(engine)
+
+    assert migrate.upgrade(engine) == []
+    assert migrate.schema_status(engine)["up_to_date"]
+    assert schema(engine) == before
+    assert recorded_versions(engine) == ALL_VERSIONS  # each recorded once
+
+
+def test_every_step_can_rerun_over_existing_data(engine):
+    migrate.upgrade(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {"id": 1, "username": "r", "email": "r@example.com", "role": "user"},
+        ])
+        conn.execute(insert(Incident.__table__), [
+            {"id": 1, "title": "Incident", "status": "reported", "reporter_id": 1,
+             "latitude": 13.0, "longitude": 80.0},
+        ])
+        summary.recount(conn)
+    before = schema(engine)
+
+    # what a database half-created before the runner existed looks like to each step
+    with engine.begin() as conn:
+        for m in migrate.MIGRATIONS:
+            m.apply(conn)
+
+    assert schema(engine) == before
+    with engine.connect() as conn:
+        counters = dict(conn.execute(
+            select(SummaryCounter.name, func.sum(SummaryCounter.value)).group_by(SummaryCounter.name)
+        ).all())
+        assert counters["incidents.total"] == 1 and counters["users.total"] == 1
+        assert conn.execute(select(Incident.geohash)).scalar() is not None
+
+
+def test_upgrade_stops_at_a_target_and_resumes(engine):
+    assert migrate.upgrade(engine, target=5) == [1, 2, 3, 4, 5]
+    status = migrate.schema_status(engine)
+    assert status["current"] == 5 and not status["up_to_date"]
+    assert migrate.upgrade(engine) == ALL_VERSIONS[5:]
+    assert migrate.schema_status(engine)["up_to_date"]
+
+
+def test_summary_counters_gain_their_slot_column(engine):
+    # a database migrated before counters were split into slots
+    migrate.upgrade(engine, target=11)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE summary_counters"))
+        conn.execute(text("CREATE TABLE summary_counters (name VARCHAR PRIMARY KEY, value BIGINT NOT NULL)"))
+        conn.execute(text("INSERT INTO summary_counters VALUES ('users.total', 1)"))
+        conn.execute(insert(User.__table__), [{"id": 1, "username": "r", "email": "r@example.com", "role": "user"}])
+
+    assert migrate.upgrade(engine) == ALL_VERSIONS[11:]
+    columns = {c["name"] for c in inspect(engine).get_columns("summary_counters")}
+    assert "slot" in columns
+    with engine.connect() as conn:
+        assert dict(conn.execute(select(SummaryCounter.name, SummaryCounter.value)).all()) == {
+            "users.total": 1, "users.role.user": 1, "complaints.total": 0,  # recounted from the tables
+        }
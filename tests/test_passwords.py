@@ -0,0 +1,81 @@
+"""Login hashing: a bounded queue that sheds load, and transparent rehashing.
+
+Runs the real login route through TestClient against the shared throwaway
+SQLite database (conftest.py).
+
+    python -m pytest tests
+"""
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from passlib.hash import pbkdf2_sha256
+from sqlalchemy import insert, select
+
+import index
+import passwords
+from models import User
+
+USER_ID = 1
+PASSWORD = "correct horse"
+
+
+@pytest.fixture
+def client(empty_db):
+    with TestClient(index.app) as client:
+        yield client
+
+
+def add_user(engine, hashed: str):
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {"id": USER_ID, "username": "reporter", "email": "r@example.com", "mobile": "9999999999",
+             "role": "user", "password": hashed, "is_approved": True},
+        ])
+
+
+def stored_hash(engine) -> str:
+    with engine.connect() as conn:
+        return conn.execute(select(User.password).where(User.id == USER_ID)).scalar_one()
+
+
+def login(client, password: str = PASSWORD):
+    return client.post("/api/users/login", data={"username": "reporter", "password": password})
+
+
+def test_saturated_hash_queue_answers_503(client, empty_db, monkeypatch):
+    add_user(empty_db, passwords.get_pwd_context().hash(PASSWORD))
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(passwords, "_slots", slots)
+
+    slots.acquire()  # the only slot is taken by a hash still running
+    response = login(client)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    slots.release()
+    assert login(client).status_code == 200
+    assert slots.acquire(blocking=False)  # the slot came back once the hash finished
+
+
+def test_login_upgrades_a_weaker_hash(client, empty_db):
+    weak = pbkdf2_sha256.using(rounds=1000).hash(PASSWORD)
+    add_user(empty_db, weak)
+    assert passwords.needs_update(weak)
+
+    assert login(client).status_code == 200
+    upgraded = stored_hash(empty_db)
+    assert upgraded != weak
+    assert not passwords.needs_update(upgraded)
+    assert pbkdf2_sha256.verify(PASSWORD, upgraded)
+
+    # current hashes are left alone
+    assert login(client).status_code == 200
+    assert stored_hash(empty_db) == upgraded
+
+
+def test_wrong_password_keeps_the_stored_hash(client, empty_db):
+    weak = pbkdf2_sha256.using(rounds=1000).hash(PASSWORD)
+    add_user(empty_db, weak)
+    assert login(client, "wrong").status_code == 400
+    assert stored_hash(empty_db) == weak
@@ -0,0 +1,104 @@
+"""Response cache: the epoch guard, tag invalidation, listeners and bounds.
+
+Drives a private ResponseCache directly; no database or app involved.
+
+    python -m pytest tests
+"""
+import asyncio
+
+import pytest
+
+import response_cache
+from response_cache import ResponseCache, incident_tag
+
+BODY = b'{"ok": true}'
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(ttl=60, max_entries=100, max_bytes=1 << 20)
+
+
+def fill(cache, key, *tags, body=BODY):
+    return cache.put(key, body, tags, cache.epoch)
+
+
+def test_fill_racing_an_invalidation_is_not_stored(cache):
+    epoch = cache.epoch          # the route reads the epoch, then queries
+    cache.invalidate("incidents")  # a write commits meanwhile
+    entry = cache.put("/incidents", BODY, ["incidents"], epoch)
+    assert entry.body == BODY    # still answers this request...
+    assert cache.get("/incidents") is None  # ...but is not served to the next one
+
+    # any invalidation counts, whatever its tags: the guard can't know what the query read
+    epoch = cache.epoch
+    cache.invalidate(incident_tag(99))
+    cache.put("/incidents", BODY, ["incidents"], epoch)
+    assert cache.get("/incidents") is None
+
+    epoch = cache.epoch
+    cache.clear()
+    cache.put("/incidents", BODY, ["incidents"], epoch)
+    assert cache.get("/incidents") is None
+
+    fill(cache, "/incidents", "incidents")
+    assert cache.get("/incidents").body == BODY
+
+
+def test_invalidation_evicts_only_tagged_entries(cache):
+    fill(cache, "/incidents", response_cache.INCIDENTS_TAG, incident_tag(1), incident_tag(2))
+    fill(cache, "/incidents/1/status", incident_tag(1))
+    fill(cache, "/incidents/2/status", incident_tag(2))
+    fill(cache, "/complaints", response_cache.COMPLAINTS_TAG)
+
+    assert cache.invalidate_local([incident_tag(1)]) == 2
+    assert cache.get("/incidents") is None
+    assert cache.get("/incidents/1/status") is None
+    assert cache.get("/incidents/2/status") is not None
+    assert cache.get("/complaints") is not None
+    # no tag index entry still points at an evicted key
+    assert cache._by_tag[incident_tag(2)] == {"/incidents/2/status"}
+    assert incident_tag(1) not in cache._by_tag and response_cache.INCIDENTS_TAG not in cache._by_tag
+
+    assert cache.invalidate_local(["unknown"]) == 0
+    assert cache.stats()["entries"] == 2 and cache.invalidations == 2
+
+
+def test_listeners_hear_local_and_remote_invalidations(cache):
+    heard = []
+    cache.on_invalidate(heard.append)
+
+    cache.invalidate("incidents", "", incident_tag(3))
+    cache.invalidate()  # nothing to say: no call
+    asyncio.run(cache._on_remote(0, {"tags": ["complaints"], "origin": "another-worker"}))
+    asyncio.run(cache._on_remote(0, {"tags": ["echo"], "origin": cache._origin}))  # our own message
+    assert heard == [["incidents", incident_tag(3)], ["complaints"]]
+
+    fill(cache, "/complaints", "complaints")
+    asyncio.run(cache._on_remote(0, {"tags": ["complaints"], "origin": "another-worker"}))
+    assert cache.get("/complaints") is None
+
+
+def test_entries_are_bounded_and_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache = ResponseCache(ttl=10, max_entries=2, max_bytes=3 * (len(BODY) + response_cache.ENTRY_OVERHEAD_BYTES))
+
+    fill(cache, "a", "t")
+    fill(cache, "b", "t")
+    cache.get("a")          # a is now the most recently used
+    fill(cache, "c", "t")   # evicts b
+    assert cache.get("b") is None and cache.get("a") and cache.get("c")
+    assert cache.evictions == 1
+
+    big = b"x" * (cache.max_bytes + 1)
+    assert cache.put("big", big, ["t"], cache.epoch).body == big
+    assert cache.get("big") is None  # never cached, nothing evicted for it
+    assert cache.evictions == 1
+
+    now[0] += 10
+    assert cache.get("a") is None and cache.expirations == 1
+
+    disabled = ResponseCache(ttl=0)
+    disabled.put("a", BODY, ["t"], disabled.epoch)
+    assert disabled.get("a") is None
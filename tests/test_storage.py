@@ -0,0 +1,139 @@
+"""Content-addressed uploads: reference counts, garbage collection, size cap.
+
+A LocalStorage rooted in a temporary directory stands in for the backend;
+stored_objects lives in the shared throwaway SQLite database (conftest.py).
+
+    python -m pytest tests
+"""
+import io
+import os
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+import database
+import storage
+from models import StoredObject
+
+DOCUMENT = b"%PDF-1.4 identity document"
+
+
+class Crash(BaseException):
+    """The process dying mid-collect (not an Exception collect could catch)."""
+
+
+@pytest.fixture
+def backend(empty_db, tmp_path, monkeypatch):
+    backend = storage.LocalStorage(tmp_path / "uploads")
+    monkeypatch.setattr(storage, "backend_named", lambda name: backend)
+    return backend
+
+
+def upload(data: bytes = DOCUMENT):
+    return SimpleNamespace(file=io.BytesIO(data), content_type="application/pdf")
+
+
+def signup(backend, data: bytes = DOCUMENT) -> storage.PendingUpload:
+    """What /signup does: spool, take a reference in the user's transaction, transfer."""
+    pending = storage.receive(upload(data), backend)
+    db = database.SessionLocal()
+    try:
+        url = storage.acquire(db, pending)
+        db.commit()
+    finally:
+        db.close()
+    assert url == pending.url
+    if pending.needs_transfer:
+        assert storage.transfer(pending) == url
+    else:
+        pending.discard()
+    return pending
+
+
+def release(url: str):
+    """What the admin user delete does: drop the reference, collect after commit."""
+    db = database.SessionLocal()
+    try:
+        orphan = storage.release(db, url)
+        db.commit()
+    finally:
+        db.close()
+    if orphan:
+        storage.collect(orphan)
+
+
+def row(sha256: str):
+    with database.get_engine().connect() as conn:
+        table = StoredObject.__table__
+        return conn.execute(select(table).where(table.c.sha256 == sha256)).first()
+
+
+def test_duplicate_uploads_share_one_object(backend):
+    first = signup(backend)
+    second = signup(backend)
+    assert first.needs_transfer and not second.needs_transfer
+    assert second.url == first.url
+    assert row(first.sha256).ref_count == 2
+    blob = backend.root / first.key
+    assert blob.read_bytes() == DOCUMENT
+
+    release(first.url)
+    assert row(first.sha256).ref_count == 1
+    assert blob.exists()  # still referenced: collect() left it alone
+
+    release(second.url)
+    assert row(first.sha256) is None
+    assert not blob.exists()
+    assert not blob.parent.exists()  # empty shard directories go too
+
+
+def test_crash_between_blob_delete_and_commit(backend, monkeypatch):
+    pending = signup(backend)
+    blob = backend.root / pending.key
+    delete = backend.delete
+
+    def delete_then_die(key):
+        delete(key)
+        raise Crash()
+
+    monkeypatch.setattr(backend, "delete", delete_then_die)
+    with pytest.raises(Crash):
+        release(pending.url)
+    # the row's delete rolled back with the crash; the blob is gone
+    assert row(pending.sha256).ref_count == 0
+    assert not blob.exists()
+
+    # the same document uploaded again must be stored again, not trusted to exist
+    monkeypatch.setattr(backend, "delete", delete)
+    again = signup(backend)
+    assert again.needs_transfer
+    assert blob.read_bytes() == DOCUMENT
+    assert row(pending.sha256).ref_count == 1 and row(pending.sha256).stored
+
+    # and collected normally once released
+    release(again.url)
+    assert row(pending.sha256) is None and not blob.exists()
+
+
+def test_receive_enforces_the_size_cap(backend, monkeypatch):
+    spooled = []
+    mkstemp = storage.tempfile.mkstemp
+
+    def recording_mkstemp(*args, **kwargs):
+        fd, path = mkstemp(*args, **kwargs)
+        spooled.append(path)
+        return fd, path
+
+    monkeypatch.setattr(storage.tempfile, "mkstemp", recording_mkstemp)
+    monkeypatch.setattr(storage, "UPLOAD_CHUNK_BYTES", 4)  # several chunks per upload
+
+    at_cap = storage.receive(upload(b"x" * 10), backend, max_bytes=10)
+    assert at_cap.size == 10
+    at_cap.discard()
+
+    with pytest.raises(HTTPException) as raised:
+        storage.receive(upload(b"x" * 11), backend, max_bytes=10)
+    assert raised.value.status_code == 413
+    assert not any(os.path.exists(path) for path in spooled)  # no spool file left behind
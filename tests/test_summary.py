@@ -0,0 +1,111 @@
+"""Admin summary counters must always agree with a full recount.
+
+Writes go through the ORM and the real admin routes against the shared
+throwaway SQLite database (conftest.py); every adjustment lands in its own
+counter slot, so the sums on read are exercised too.
+
+    python -m pytest tests
+"""
+import itertools
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+import auth
+import database
+import index
+import summary
+from models import Complaint, Incident, SummaryCounter, User
+
+
+@pytest.fixture
+def client(empty_db, monkeypatch):
+    monkeypatch.setenv("AUTH_SECRET_KEY", "test-secret")
+    monkeypatch.setattr(auth, "_secret", None)
+    slots = itertools.count()
+    monkeypatch.setattr(summary, "_slot", lambda connection: next(slots) % summary.SUMMARY_COUNTER_SLOTS)
+    with TestClient(index.app) as client:
+        yield client
+    auth._secret = None
+
+
+def admin():
+    return {"Authorization": f"Bearer {auth.create_access_token(auth.SUPERADMIN_ID, 'admin')}"}
+
+
+def counters() -> dict:
+    db = database.SessionLocal()
+    try:
+        return {name: value for name, value in summary.read_counters(db).items() if value}
+    finally:
+        db.close()
+
+
+def recounted() -> dict:
+    with database.get_engine().connect() as conn:
+        with conn.begin() as transaction:
+            summary.recount(conn)
+            counts = dict(conn.execute(select(SummaryCounter.name, SummaryCounter.value)).all())
+            transaction.rollback()
+    return {name: value for name, value in counts.items() if value}
+
+
+def write(*objects):
+    db = database.SessionLocal()
+    try:
+        db.add_all(objects)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_counters_follow_every_write(client):
+    write(
+        User(id=1, username="reporter", email="r@example.com", role="user"),
+        User(id=2, username="volunteer", email="v@example.com", role="volunteer", is_approved=False),
+        Complaint(name="n", email="n@example.com", subject="s", message="m"),
+    )
+    write(*(Incident(id=i, title=f"Incident {i}", status="reported", reporter_id=1, volunteer_id=None)
+            for i in range(1, 6)))
+    assert counters() == recounted()
+    assert counters()["incidents.status.reported"] == 5
+    assert counters()["users.pending_volunteers"] == 1
+    with database.get_engine().connect() as conn:
+        assert conn.execute(select(SummaryCounter.slot).distinct()).all()[1:]  # spread over slots
+
+    # approval and status changes through the ORM
+    assert client.put("/api/users/admin/approve/2", headers=admin()).status_code == 200
+    db = database.SessionLocal()
+    try:
+        for incident in db.query(Incident).filter(Incident.id <= 3):
+            incident.volunteer_id, incident.status = 2, "in_progress"
+        db.commit()
+    finally:
+        db.close()
+    assert counters() == recounted()
+    assert counters()["incidents.status.in_progress"] == 3
+    assert "users.pending_volunteers" not in counters()
+
+    # bulk statements: the volunteer's incidents go back to reported, the reporter's are deleted
+    assert client.delete("/api/users/admin/user/2", headers=admin()).status_code == 200
+    assert counters() == recounted()
+    assert counters()["incidents.status.reported"] == 5
+    assert client.delete("/api/users/admin/user/1", headers=admin()).status_code == 200
+    assert counters() == recounted() == {"complaints.total": 1}
+
+
+def test_rolled_back_writes_leave_the_counters_alone(client):
+    write(User(id=1, username="reporter", email="r@example.com", role="user"))
+    before = counters()
+
+    db = database.SessionLocal()
+    try:
+        db.add(Incident(id=1, title="Incident", status="reported", reporter_id=1))
+        db.add(User(id=2, username="volunteer", email="v@example.com", role="volunteer", is_approved=False))
+        db.flush()  # the deltas are written here...
+        assert db.query(SummaryCounter).count() > len(before)
+        db.rollback()  # ...and undone with the rest of the transaction
+    finally:
+        db.close()
+    assert counters() == before == recounted()
@@ -0,0 +1,148 @@
+"""Track store: the delta + zlib codec, bucket rewrites and downsampling.
+
+append_points/load_track run against the shared throwaway SQLite database
+(conftest.py); the codec and downsampling are pure.
+
+    python -m pytest tests
+"""
+import random
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+import tracks
+from models import Incident, LocationTrackChunk, User
+
+INCIDENT_ID = 1
+START = 1_700_000_000.0 - 1_700_000_000.0 % tracks.TRACK_BUCKET_SECONDS  # a bucket boundary
+
+
+def random_track(rng: random.Random, n: int, lat: float, lng: float, start: float = START):
+    points, ts = [], start
+    for _ in range(n):
+        ts += rng.uniform(0.2, 5.0)
+        lat += rng.gauss(0, 1e-4)   # deltas of either sign
+        lng += rng.gauss(0, 1e-4)
+        points.append((ts, lat, lng))
+    return points
+
+
+def assert_close(decoded, points):
+    assert len(decoded) == len(points)
+    for (t1, lat1, lng1), (t2, lat2, lng2) in zip(decoded, points):
+        assert abs(t1 - t2) <= 0.5 / tracks.TIME_SCALE + 1e-9
+        assert abs(lat1 - lat2) <= 0.5 / tracks.COORD_SCALE + 1e-12
+        assert abs(lng1 - lng2) <= 0.5 / tracks.COORD_SCALE + 1e-12
+
+
+# --- codec ---
+
+@pytest.mark.parametrize("seed, origin", [
+    (1, (13.0827, 80.2707)),
+    (2, (-33.8688, 151.2093)),
+    (3, (40.7128, -74.0060)),
+    (4, (-0.00001, -179.99999)),  # signs flip on the first step
+])
+def test_codec_round_trip_keeps_storage_precision(seed, origin):
+    rng = random.Random(seed)
+    points = random_track(rng, 1000, *origin)
+    decoded = tracks.decode_points(tracks.encode_points(points), len(points))
+    assert_close(decoded, points)
+    # re-encoding what was decoded is lossless
+    assert tracks.decode_points(tracks.encode_points(decoded), len(decoded)) == decoded
+
+
+def test_codec_handles_backwards_steps_and_edge_values():
+    points = [
+        (START + 10, 89.9999999, 179.9999999), (START, -90.0, -180.0), (START + 5, 0.0, 0.0), (0.0, 0.0, 0.0),
+    ]
+    assert_close(tracks.decode_points(tracks.encode_points(points), len(points)), points)
+    assert tracks.decode_points(tracks.encode_points([]), 0) == []
+
+
+def test_codec_compresses_a_steady_track():
+    points = [(START + i, 13.0 + i * 1e-5, 80.0 + i * 1e-5) for i in range(600)]
+    assert len(tracks.encode_points(points)) < len(points) * 3  # a few bytes per fix, not 24
+
+
+# --- storage ---
+
+@pytest.fixture
+def conn(empty_db):
+    with empty_db.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {"id": 1, "username": "reporter", "email": "r@example.com", "role": "user"},
+        ])
+        conn.execute(insert(Incident.__table__), [
+            {"id": INCIDENT_ID, "title": "Incident", "status": "reported", "reporter_id": 1},
+        ])
+    with empty_db.begin() as conn:
+        yield conn
+
+
+def chunks(conn):
+    table = LocationTrackChunk.__table__
+    return conn.execute(select(table).order_by(table.c.bucket_start)).all()
+
+
+def load(conn, since=None):
+    return tracks.load_track(Session(bind=conn), INCIDENT_ID, since)
+
+
+def test_append_points_rolls_over_and_rewrites_buckets(conn):
+    rng = random.Random(5)
+    track = random_track(rng, 400, 13.0, 80.0, start=START + tracks.TRACK_BUCKET_SECONDS - 500)
+    first, second = track[:250], track[250:]
+    assert tracks.bucket_start(first[0][0]) != tracks.bucket_start(track[-1][0])  # spans a boundary
+
+    tracks.append_points(conn, {INCIDENT_ID: first})
+    tracks.append_points(conn, {INCIDENT_ID: second})  # rewrites the open bucket, starts the next
+
+    rows = chunks(conn)
+    assert len(rows) == len({tracks.bucket_start(p[0]) for p in track})
+    assert sum(row.point_count for row in rows) == len(track)
+    for row in rows:
+        points = tracks.decode_points(row.data, row.point_count)
+        assert {tracks.bucket_start(p[0]) for p in points} == {row.bucket_start}
+        assert row.last_ts == points[-1][0]
+    assert_close(load(conn), track)
+
+    since = load(conn)[300][0]  # a stored (millisecond) time
+    assert_close(load(conn, since), track[300:])
+
+
+def test_late_points_are_merged_in_time_order(conn):
+    track = [(START + i, 13.0 + i * 1e-5, 80.0) for i in range(10)]
+    tracks.append_points(conn, {INCIDENT_ID: track[5:]})
+    tracks.append_points(conn, {INCIDENT_ID: track[:5]})  # arrive after newer ones (retried flush)
+    assert_close(load(conn), track)
+    assert [row.last_ts for row in chunks(conn)] == [track[-1][0]]
+
+
+# --- downsampling ---
+
+def distance_to_line(point, line):
+    xy = tracks._project([line[0], point, *line])
+    p, path = xy[1], xy[2:]
+    return min(tracks._segment_distance(p, a, b) for a, b in zip(path, path[1:]))
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_downsample_keeps_endpoints_within_tolerance(seed):
+    points = random_track(random.Random(seed), 500, 13.0, 80.0)
+    tolerance = tracks.DEFAULT_TOLERANCE_M
+    simplified = tracks.downsample(points, tolerance, max_points=len(points))
+
+    assert simplified[0] == points[0] and simplified[-1] == points[-1]
+    assert len(simplified) < len(points)
+    assert all(a[0] < b[0] for a, b in zip(simplified, simplified[1:]))  # a subsequence, in order
+    assert max(distance_to_line(p, simplified) for p in points) <= tolerance + 1e-6
+
+
+def test_downsample_fits_max_points():
+    points = random_track(random.Random(9), 2000, 13.0, 80.0)
+    simplified = tracks.downsample(points, 0.0, max_points=50)
+    assert len(simplified) <= 50
+    assert simplified[0] == points[0] and simplified[-1] == points[-1]
+    assert tracks.downsample(points[:2], 5.0, max_points=50) == points[:2]